@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import io
+import json
+from typing import Iterator
+
+import numpy as np
+from pydantic import TypeAdapter, ValidationError
+
+from Api.app.schemas import ClientFeatures
+
+JSON_CONTENT_TYPE = "application/json"
+NPY_CONTENT_TYPE = "application/x-npy"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+_clients_adapter = TypeAdapter(list[ClientFeatures])
+
+
+class BatchDecodeError(ValueError):
+    """Raised when a batch body cannot be turned into a feature matrix."""
+
+
+def _require_numeric(dtype: np.dtype, what: str) -> None:
+    # Booleans, integers and floats only: strings, objects and records are rejected.
+    if dtype.kind not in "biuf":
+        raise BatchDecodeError(f"{what} must be numeric, got dtype {dtype}")
+
+
+def _decode_json(body: bytes) -> tuple[np.ndarray, np.ndarray]:
+    try:
+        clients = _clients_adapter.validate_json(body)
+    except ValidationError as exc:
+        raise BatchDecodeError(str(exc)) from exc
+    if not clients:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0))
+    widths = {len(client.features) for client in clients}
+    if len(widths) > 1:
+        raise BatchDecodeError(
+            f"All feature vectors must have the same length, got {sorted(widths)}"
+        )
+    client_ids = np.fromiter(
+        (client.client_id for client in clients), dtype=np.int64, count=len(clients)
+    )
+    matrix = np.array([client.features for client in clients], dtype=np.float64)
+    return client_ids, matrix
+
+
+def _decode_npy(body: bytes) -> tuple[np.ndarray, np.ndarray]:
+    try:
+        matrix = np.load(io.BytesIO(body), allow_pickle=False)
+    except ValueError as exc:
+        raise BatchDecodeError(f"Invalid NPY payload: {exc}") from exc
+    if matrix.ndim != 2:
+        raise BatchDecodeError(
+            f"NPY payload must be a 2-D matrix, got shape {matrix.shape}"
+        )
+    _require_numeric(matrix.dtype, "NPY payload")
+    if matrix.dtype not in (np.float32, np.float64):
+        matrix = matrix.astype(np.float64)
+    # NPY carries no ids: rows are identified by their position in the batch.
+    return np.arange(len(matrix), dtype=np.int64), matrix
+
+
+def _decode_arrow(body: bytes) -> tuple[np.ndarray, np.ndarray]:
+    try:
+        import pyarrow as pa
+    except ImportError as exc:  # pragma: no cover - depends on the deployment image
+        raise BatchDecodeError(
+            "Arrow payloads require pyarrow to be installed"
+        ) from exc
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as exc:
+        raise BatchDecodeError(f"Invalid Arrow IPC payload: {exc}") from exc
+    if "client_id" in table.column_names:
+        client_ids = table.column("client_id").to_numpy(zero_copy_only=False)
+        _require_numeric(client_ids.dtype, "Arrow column 'client_id'")
+        client_ids = client_ids.astype(np.int64)
+        table = table.drop(["client_id"])
+    else:
+        client_ids = np.arange(table.num_rows, dtype=np.int64)
+    columns = [column.to_numpy(zero_copy_only=False) for column in table.columns]
+    for name, column in zip(table.column_names, columns):
+        _require_numeric(column.dtype, f"Arrow column {name!r}")
+    dtype = (
+        np.result_type(*[column.dtype for column in columns]) if columns else np.float64
+    )
+    if dtype not in (np.float32, np.float64):
+        dtype = np.float64
+    matrix = np.empty((table.num_rows, len(columns)), dtype=dtype)
+    for index, column in enumerate(columns):
+        matrix[:, index] = column
+    return client_ids, matrix
+
+
+_DECODERS = {
+    JSON_CONTENT_TYPE: _decode_json,
+    NPY_CONTENT_TYPE: _decode_npy,
+    ARROW_CONTENT_TYPE: _decode_arrow,
+}
+
+
+def decode_batch(
+    body: bytes, content_type: str | None
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``(client_ids, X)`` with ``X`` a C-contiguous float32/float64 matrix."""
+    media_type = (content_type or JSON_CONTENT_TYPE).split(";")[0].strip().lower()
+    decoder = _DECODERS.get(media_type)
+    if decoder is None:
+        raise BatchDecodeError(
+            f"Unsupported content type {media_type!r}, "
+            f"expected one of {sorted(_DECODERS)}"
+        )
+    client_ids, matrix = decoder(body)
+    return client_ids, np.ascontiguousarray(matrix)
+
+
+def iter_ndjson(
+    client_ids: np.ndarray,
+    proba: np.ndarray,
+    decision: np.ndarray,
+    threshold: float,
+    chunk_rows: int,
+) -> Iterator[bytes]:
+    """Serialise scores as newline-delimited JSON, ``chunk_rows`` lines per chunk."""
+    for start in range(0, len(client_ids), chunk_rows):
+        stop = start + chunk_rows
+        lines = [
+            json.dumps(
+                {
+                    "client_id": cid,
+                    "probability": p,
+                    "decision": d,
+                    "threshold": threshold,
+                }
+            )
+            for cid, p, d in zip(
+                client_ids[start:stop].tolist(),
+                proba[start:stop].tolist(),
+                decision[start:stop].tolist(),
+            )
+        ]
+        yield ("\n".join(lines) + "\n").encode()
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from Api.app import config
+from Api.app.dependencies import ModelBundle, ModelRegistry, registry
+from Api.app.metrics import metrics
+
+
+@dataclass
+class _Pending:
+    row: np.ndarray
+    future: asyncio.Future
+    enqueued_at: float
+
+
+@dataclass
+class BatcherStats:
+    batches: int = 0
+    rows: int = 0
+    max_batch_size: int = 0
+    queue_delay_total_ms: float = 0.0
+    queue_delay_max_ms: float = 0.0
+    predict_total_ms: float = 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        batches = max(self.batches, 1)
+        rows = max(self.rows, 1)
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / batches,
+            "max_batch_size": self.max_batch_size,
+            "mean_queue_delay_ms": self.queue_delay_total_ms / rows,
+            "max_queue_delay_ms": self.queue_delay_max_ms,
+            "mean_predict_ms": self.predict_total_ms / batches,
+        }
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row scoring calls into one ``predict_proba``.
+
+    A batch is flushed as soon as ``max_rows`` rows are waiting or the oldest
+    row has waited ``max_wait_ms``. Scoring runs in a worker thread so the event
+    loop keeps accepting requests, which then form the next batch.
+    """
+
+    def __init__(
+        self,
+        model_registry: ModelRegistry,
+        max_rows: int = 64,
+        max_wait_ms: float = 2.0,
+    ) -> None:
+        self.registry = model_registry
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000
+        self.stats = BatcherStats()
+        self._queue: asyncio.Queue[_Pending] | None = None
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self.stats = BatcherStats()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._worker
+        self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            pending = self._queue.get_nowait()
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError("Micro-batcher stopped"))
+
+    async def submit(self, row: np.ndarray) -> tuple[float, ModelBundle]:
+        """Queue one feature vector; return its probability and the scoring bundle."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(
+            _Pending(row=row, future=future, enqueued_at=time.perf_counter())
+        )
+        return await future
+
+    async def _collect(self) -> list[_Pending]:
+        batch = [await self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_rows:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                while len(batch) < self.max_rows and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            bundle = self.registry.current
+            for group in self._split_by_width(batch, bundle):
+                await self._score(group, bundle)
+
+    @staticmethod
+    def _split_by_width(
+        batch: list[_Pending], bundle: ModelBundle
+    ) -> list[list[_Pending]]:
+        """Group rows by width so one malformed row cannot fail its neighbours.
+
+        Rows that do not match the model's known width fail on their own;
+        without a known width, each group is scored separately.
+        """
+        groups: dict[int, list[_Pending]] = {}
+        for pending in batch:
+            width = pending.row.shape[-1]
+            if bundle.n_features is not None and width != bundle.n_features:
+                if not pending.future.done():
+                    pending.future.set_exception(
+                        ValueError(
+                            f"Expected {bundle.n_features} features, got {width}"
+                        )
+                    )
+                continue
+            groups.setdefault(width, []).append(pending)
+        return list(groups.values())
+
+    async def _score(self, batch: list[_Pending], bundle: ModelBundle) -> None:
+        started = time.perf_counter()
+        try:
+            X = np.vstack([pending.row for pending in batch])
+            proba = await asyncio.to_thread(bundle.predict_proba, X)
+        except Exception as exc:  # noqa: BLE001
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            return
+        finished = time.perf_counter()
+        for pending, value in zip(batch, proba.tolist()):
+            if not pending.future.done():
+                pending.future.set_result((value, bundle))
+        self._record(batch, started, finished)
+
+    def _record(self, batch: list[_Pending], started: float, finished: float) -> None:
+        stats = self.stats
+        delays = [(started - pending.enqueued_at) * 1000 for pending in batch]
+        metrics.observe_batch("microbatch", len(batch))
+        stats.batches += 1
+        stats.rows += len(batch)
+        stats.max_batch_size = max(stats.max_batch_size, len(batch))
+        stats.queue_delay_total_ms += sum(delays)
+        stats.queue_delay_max_ms = max(stats.queue_delay_max_ms, max(delays))
+        stats.predict_total_ms += (finished - started) * 1000
+
+
+batcher = MicroBatcher(
+    registry,
+    max_rows=config.MICROBATCH_MAX_ROWS,
+    max_wait_ms=config.MICROBATCH_MAX_WAIT_MS,
+)
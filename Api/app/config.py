@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+# A ``.npz`` path selects the compiled NumPy engine (see Src/inference/tree_engine.py);
+# a directory exported by the same tool is memory-mapped and shared by all workers.
+MODEL_PATH = Path(os.getenv("MODEL_PATH", "models/lgbm_model_final.pkl"))
+THRESHOLD_PATH = Path(os.getenv("THRESHOLD_PATH", "models/optimal_threshold.pkl"))
+DEFAULT_THRESHOLD = float(os.getenv("DEFAULT_THRESHOLD", "0.5"))
+# Fitted ColumnTransformer saved by Src/features/feature_engineering.py; enables
+# /predict/raw.
+PREPROCESSOR_PATH = Path(
+    os.getenv("PREPROCESSOR_PATH", "artifacts/preprocessor.joblib")
+)
+
+# Seconds between two artifact checks by the background watcher (0 disables it).
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+
+# Upper bound on the number of rows accepted by /predict/batch in one request.
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "50000"))
+# Rows serialised per chunk when streaming batch results back.
+BATCH_STREAM_CHUNK = int(os.getenv("BATCH_STREAM_CHUNK", "5000"))
+
+# Opt-in coalescing of concurrent /predict calls into one model call.
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+MICROBATCH_MAX_ROWS = int(os.getenv("MICROBATCH_MAX_ROWS", "64"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+
+# Optional background sample (.npy) for interventional TreeSHAP; without it
+# the explainer uses the tree covers recorded at training time.
+SHAP_BACKGROUND_PATH = Path(
+    os.getenv("SHAP_BACKGROUND_PATH", "models/shap_background.npy")
+)
+# Tree model handed to SHAP when MODEL_PATH points to a compiled ``.npz`` forest.
+EXPLAIN_MODEL_PATH = Path(
+    os.getenv("EXPLAIN_MODEL_PATH", "models/lgbm_model_final.pkl")
+)
+MAX_EXPLAIN_BATCH_SIZE = int(os.getenv("MAX_EXPLAIN_BATCH_SIZE", "1000"))
+# Build the SHAP explainer at startup and after reloads. Off by default: shap (and
+# the tree model behind the explainer) is then only imported on the first /explain,
+# which keeps cold starts short for scoring traffic.
+EXPLAINER_PRELOAD = os.getenv("EXPLAINER_PRELOAD", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+
+# Opt-in log of served predictions (features, score, decision, model version,
+# latency) written to rotating Parquet files for drift monitoring.
+PREDICTION_LOG_ENABLED = os.getenv("PREDICTION_LOG_ENABLED", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+PREDICTION_LOG_DIR = Path(os.getenv("PREDICTION_LOG_DIR", "Monitoring/predictions"))
+# Rows held in memory at most; beyond that the oldest rows are dropped and counted.
+PREDICTION_LOG_CAPACITY = int(os.getenv("PREDICTION_LOG_CAPACITY", "100000"))
+PREDICTION_LOG_FLUSH_ROWS = int(os.getenv("PREDICTION_LOG_FLUSH_ROWS", "10000"))
+PREDICTION_LOG_FLUSH_INTERVAL = float(os.getenv("PREDICTION_LOG_FLUSH_INTERVAL", "5"))
+PREDICTION_LOG_MAX_FILES = int(os.getenv("PREDICTION_LOG_MAX_FILES", "1000"))
+
+# Opt-in LRU of results for repeated feature vectors, keyed by model version.
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "100000"))
+PREDICTION_CACHE_MAX_BYTES = int(
+    os.getenv("PREDICTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+# Seconds an entry stays valid (0 keeps entries until evicted or the model reloads).
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "600"))
+
+# Latency, phase and batch-size histograms served on GET /metrics (Prometheus text).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in {"1", "true", "yes"}
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+
+from Api.app import config
+from Src.features.compiled_preprocessor import (
+    CompiledPreprocessor,
+    load_compiled_preprocessor,
+)
+from Src.inference.tree_engine import METADATA_FILENAME, CompiledForest
+
+
+def _file_fingerprint(path: Path) -> tuple[int, int] | None:
+    if path.is_dir():
+        # Memory-mapped forests are saved as a directory swapped in whole; its
+        # metadata file is rewritten on every export.
+        path = path / METADATA_FILENAME
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    files = sorted(path.iterdir()) if path.is_dir() else [path] if path.exists() else []
+    for file in files:
+        with file.open("rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def read_threshold(path: Path, default: float) -> float:
+    """Read the business threshold, stored as a float or as ``{"threshold": x}``."""
+    try:
+        if path.exists():
+            value = joblib.load(path)
+            if isinstance(value, dict):
+                value = value["threshold"]
+            return float(value)
+    except Exception:  # noqa: BLE001
+        pass  # Fallback to default if load fails
+    return default
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """Everything a request needs to score, loaded together and never mutated."""
+
+    model: Any
+    threshold: float
+    n_features: int | None
+    feature_names: list[str]
+    version: str
+    loaded_at: float
+    load_seconds: float
+    fingerprints: tuple = field(repr=False)
+    preprocessor: CompiledPreprocessor | None = field(default=None, repr=False)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        if hasattr(self.model, "predict_proba"):
+            return self.model.predict_proba(X)[:, 1]
+        return np.asarray(self.model.predict(X), dtype=float)
+
+
+class ModelRegistry:
+    """Holds the current :class:`ModelBundle` and swaps it atomically on reload.
+
+    Readers only ever dereference ``current``; a reload builds a complete new
+    bundle before replacing the reference, so in-flight requests keep scoring
+    with the bundle they started with.
+    """
+
+    def __init__(
+        self,
+        model_path: Path,
+        threshold_path: Path,
+        default_threshold: float = 0.5,
+        preprocessor_path: Path | None = None,
+    ) -> None:
+        self.model_path = Path(model_path)
+        self.threshold_path = Path(threshold_path)
+        self.default_threshold = default_threshold
+        self.preprocessor_path = (
+            Path(preprocessor_path) if preprocessor_path is not None else None
+        )
+        self._bundle: ModelBundle | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._bundle is not None
+
+    @property
+    def current(self) -> ModelBundle:
+        bundle = self._bundle
+        if bundle is None:
+            bundle = self.reload()
+        return bundle
+
+    def _fingerprints(self) -> tuple:
+        fingerprints = _file_fingerprint(self.model_path), _file_fingerprint(
+            self.threshold_path
+        )
+        if self.preprocessor_path is not None:
+            fingerprints += (_file_fingerprint(self.preprocessor_path),)
+        return fingerprints
+
+    def _version(self) -> str:
+        model_digest = _file_digest(self.model_path)[:12]
+        version = f"{model_digest}-{_file_digest(self.threshold_path)[:8]}"
+        if self.preprocessor_path is not None and self.preprocessor_path.exists():
+            version += f"-{_file_digest(self.preprocessor_path)[:8]}"
+        return version
+
+    def _load(self) -> ModelBundle:
+        if not self.model_path.exists():
+            raise FileNotFoundError(f"Model file not found at {self.model_path}")
+        start = time.perf_counter()
+        fingerprints = self._fingerprints()
+        if self.model_path.suffix == ".npz" or self.model_path.is_dir():
+            # Exported by Src/inference/tree_engine.py: NumPy-only scoring, no LightGBM.
+            # A directory is memory-mapped: API workers share one copy of the arrays.
+            model = CompiledForest.load(self.model_path)
+        else:
+            model = joblib.load(self.model_path)
+        threshold = read_threshold(self.threshold_path, self.default_threshold)
+        feature_names = list(
+            getattr(model, "feature_name_", None)
+            or getattr(model, "feature_names_in_", [])
+        )
+        n_features = getattr(model, "n_features_in_", None)
+        preprocessor = None
+        if self.preprocessor_path is not None and self.preprocessor_path.exists():
+            # Compiled once per bundle: /predict/raw never calls sklearn per request.
+            preprocessor = load_compiled_preprocessor(self.preprocessor_path)
+        bundle = ModelBundle(
+            model=model,
+            threshold=threshold,
+            n_features=int(n_features) if n_features is not None else None,
+            feature_names=feature_names,
+            version=self._version(),
+            loaded_at=time.time(),
+            load_seconds=0.0,
+            fingerprints=fingerprints,
+            preprocessor=preprocessor,
+        )
+        if bundle.n_features is not None:
+            # Warm-up before publishing: the first predict of a freshly loaded model
+            # pays one-off initialisation that would otherwise land on a request.
+            bundle.predict_proba(np.zeros((1, bundle.n_features)))
+        return replace(bundle, load_seconds=time.perf_counter() - start)
+
+    def reload(self) -> ModelBundle:
+        """Unconditionally load the artifacts and publish them as the new bundle."""
+        with self._lock:
+            bundle = self._load()
+            self._bundle = bundle
+            return bundle
+
+    def reload_if_changed(self) -> bool:
+        """Reload when the artifacts on disk differ from the loaded ones.
+
+        ``stat`` is checked first; content hashes are only computed when the
+        mtime or size moved, so touching a file without changing it is a no-op.
+        """
+        bundle = self._bundle
+        if bundle is None:
+            self.reload()
+            return True
+        if self._fingerprints() == bundle.fingerprints:
+            return False
+        with self._lock:
+            bundle = self._bundle
+            fingerprints = self._fingerprints()
+            if fingerprints == bundle.fingerprints:
+                return False
+            if self._version() == bundle.version:
+                self._bundle = replace(bundle, fingerprints=fingerprints)
+                return False
+            self._bundle = self._load()
+            return True
+
+
+registry = ModelRegistry(
+    config.MODEL_PATH,
+    config.THRESHOLD_PATH,
+    config.DEFAULT_THRESHOLD,
+    preprocessor_path=config.PREPROCESSOR_PATH,
+)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+
+from Api.app import config
+from Api.app.dependencies import ModelBundle
+from Src.inference.tree_engine import CompiledForest
+
+
+@dataclass(frozen=True)
+class CachedExplainer:
+    version: str
+    explainer: Any
+    base_value: float
+
+    def shap_values(self, X: np.ndarray) -> np.ndarray:
+        values = self.explainer.shap_values(X)
+        if isinstance(values, list):
+            # LightGBM binary models return [class 0, class 1]; keep the positive class.
+            values = values[-1]
+        return np.asarray(values).reshape(len(X), -1)
+
+
+def build_explainer(
+    bundle: ModelBundle,
+    background_path: Path | None = None,
+    tree_model_path: Path | None = None,
+) -> CachedExplainer:
+    """Build a TreeExplainer for the bundle's model.
+
+    With a background sample on disk the explainer is interventional against
+    it; otherwise it uses the path-dependent algorithm, whose expected value
+    comes from the node covers recorded on the training data. A compiled forest
+    is explained through the original tree model at ``tree_model_path``.
+    """
+    # Imported here: shap pulls in matplotlib and numba, which /predict never needs.
+    import shap
+
+    model = bundle.model
+    if isinstance(model, CompiledForest):
+        model = joblib.load(tree_model_path)
+    if background_path is not None and background_path.exists():
+        background = np.load(background_path)
+        explainer = shap.TreeExplainer(
+            model,
+            data=background,
+            feature_perturbation="interventional",
+            model_output="raw",
+        )
+    else:
+        explainer = shap.TreeExplainer(model)
+    base_value = np.ravel(explainer.expected_value)[-1]
+    return CachedExplainer(
+        version=bundle.version, explainer=explainer, base_value=float(base_value)
+    )
+
+
+class ExplainerCache:
+    """Keeps one explainer per loaded model version and rebuilds it after a reload."""
+
+    def __init__(
+        self, background_path: Path | None = None, tree_model_path: Path | None = None
+    ) -> None:
+        self.background_path = background_path
+        self.tree_model_path = tree_model_path
+        self._cached: CachedExplainer | None = None
+        self._lock = threading.Lock()
+
+    def get(self, bundle: ModelBundle) -> CachedExplainer:
+        cached = self._cached
+        if cached is not None and cached.version == bundle.version:
+            return cached
+        with self._lock:
+            cached = self._cached
+            if cached is None or cached.version != bundle.version:
+                cached = build_explainer(
+                    bundle, self.background_path, self.tree_model_path
+                )
+                self._cached = cached
+            return cached
+
+
+def top_contributions(
+    shap_row: np.ndarray,
+    features: np.ndarray,
+    feature_names: list[str],
+    top_k: int,
+) -> list[dict[str, Any]]:
+    """Return the ``top_k`` contributions of one row, strongest absolute value first."""
+    top_k = min(top_k, len(shap_row))
+    magnitude = np.abs(shap_row)
+    candidates = np.argpartition(-magnitude, top_k - 1)[:top_k]
+    ordered = candidates[np.argsort(-magnitude[candidates], kind="stable")]
+    return [
+        {
+            "feature": (
+                feature_names[index]
+                if index < len(feature_names)
+                else f"feature_{index}"
+            ),
+            "value": float(features[index]),
+            "shap_value": float(shap_row[index]),
+        }
+        for index in ordered
+    ]
+
+
+def format_explanations(
+    client_ids: np.ndarray,
+    X: np.ndarray,
+    shap_values: np.ndarray,
+    base_value: float,
+    feature_names: list[str],
+    top_k: int | None,
+) -> list[dict[str, Any]]:
+    explanations = []
+    for client_id, row, values in zip(client_ids.tolist(), X, shap_values):
+        explanation: dict[str, Any] = {"client_id": client_id, "base_value": base_value}
+        if top_k:
+            explanation["contributions"] = top_contributions(
+                values, row, feature_names, top_k
+            )
+        else:
+            explanation["shap_values"] = values.tolist()
+        explanations.append(explanation)
+    return explanations
+
+
+explainers = ExplainerCache(config.SHAP_BACKGROUND_PATH, config.EXPLAIN_MODEL_PATH)
@@ -1,72 +1,464 @@
 from __future__ import annotations
 
-import json
-from pathlib import Path
+import asyncio
+import contextlib
+import logging
+import time
+from contextlib import asynccontextmanager
 from typing import Any
 
-import mlflow
 import numpy as np
-import shap
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
-MODEL_PATH = Path("models/lgbm_model_final.pkl")
-THRESHOLD_PATH = Path("models/optimal_threshold.pkl")  # Fixed: Use pickle file in models/
+from Api.app import config
+from Api.app.batch import (
+    NDJSON_CONTENT_TYPE,
+    BatchDecodeError,
+    decode_batch,
+    iter_ndjson,
+)
+from Api.app.batching import batcher
+from Api.app.dependencies import ModelBundle, registry
+from Api.app.explain import CachedExplainer, explainers, format_explanations
+from Api.app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from Api.app.metrics import MetricsMiddleware, metrics, sample_lines
+from Api.app.prediction_cache import feature_digest, prediction_cache
+from Api.app.prediction_log import prediction_log
+from Api.app.schemas import ClientFeatures, ClientRecord
+
+logger = logging.getLogger(__name__)
+
+
+async def watch_artifacts(interval: float) -> None:
+    """Poll the model/threshold files and hot-swap the bundle when they change."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await asyncio.to_thread(registry.reload_if_changed):
+                prediction_cache.invalidate(registry.current.version)
+                if config.EXPLAINER_PRELOAD:
+                    await asyncio.to_thread(explainers.get, registry.current)
+        except Exception:  # noqa: BLE001
+            # Keep the previous bundle: a broken artifact must not take the API down.
+            logger.exception("Model reload failed, keeping the current model")
 
-# Define app FIRST before usage
-app = FastAPI(title="Credit Scoring API", version="1.0.0")
 
-class ClientFeatures(BaseModel):
-    client_id: int = Field(..., description="Identifiant client")
-    features: list[float] = Field(..., description="Vecteur de features déjà transformé")
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    with contextlib.suppress(FileNotFoundError):
+        bundle = await asyncio.to_thread(registry.reload)
+        if config.EXPLAINER_PRELOAD:
+            await asyncio.to_thread(explainers.get, bundle)
+    watcher = None
+    if config.MODEL_RELOAD_INTERVAL > 0:
+        watcher = asyncio.create_task(watch_artifacts(config.MODEL_RELOAD_INTERVAL))
+    if config.MICROBATCH_ENABLED:
+        await batcher.start()
+    if config.PREDICTION_LOG_ENABLED:
+        await prediction_log.start()
+    yield
+    await batcher.stop()
+    await prediction_log.stop()
+    if watcher is not None:
+        watcher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await watcher
+
+
+# Define app FIRST before usage
+app = FastAPI(title="Credit Scoring API", version="1.0.0", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
 
 
-def load_model():
+def load_model() -> ModelBundle:
     try:
-        if not MODEL_PATH.exists():
-            raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
-        # Load directly from file since MLflow server is not available on Render
-        return joblib.load(MODEL_PATH)
+        # The registry loads the bundle from disk on first access.
+        return registry.current
     except Exception as exc:  # noqa: BLE001
-        raise HTTPException(status_code=503, detail=f"Model loading failed: {exc}") from exc
+        raise HTTPException(
+            status_code=503, detail=f"Model loading failed: {exc}"
+        ) from exc
 
 
-def load_threshold(default: float = 0.5) -> float:
+def check_width(bundle: ModelBundle, n_columns: int) -> None:
+    if bundle.n_features is not None and n_columns != bundle.n_features:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Expected {bundle.n_features} features, got {n_columns}",
+        )
+
+
+def transform_records(bundle: ModelBundle, records: list[dict[str, Any]]) -> np.ndarray:
+    """Apply the compiled preprocessor of ``bundle`` to raw ``joined_clients`` rows."""
+    preprocessor = bundle.preprocessor
+    if preprocessor is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"No preprocessor loaded from {config.PREPROCESSOR_PATH}",
+        )
+    if bundle.n_features is not None and preprocessor.n_features != bundle.n_features:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Preprocessor produces {preprocessor.n_features} features, "
+            f"model expects {bundle.n_features}",
+        )
     try:
-        if THRESHOLD_PATH.exists():
-            return float(joblib.load(THRESHOLD_PATH))
-    except Exception:
-        pass  # Fallback to default if load fails
-    return default
+        return preprocessor.transform_records(records)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=422, detail=f"Invalid raw record: {exc}"
+        ) from exc
+
+
+def score_records(
+    bundle: ModelBundle, records: list[dict[str, Any]], timer
+) -> tuple[np.ndarray, np.ndarray]:
+    """Preprocess raw records and score them, in the calling (worker) thread."""
+    X = transform_records(bundle, records)
+    timer.mark("array")
+    return X, bundle.predict_proba(X)
+
+
+def log_predictions(
+    bundle: ModelBundle, client_ids, X: np.ndarray, proba, decision, started: float
+) -> None:
+    """Hand the served rows to the prediction log; a no-op when it is disabled."""
+    if prediction_log.running:
+        latency_ms = (time.perf_counter() - started) * 1000
+        prediction_log.record(bundle, client_ids, X, proba, decision, latency_ms)
+
+
+def explain_rows(
+    bundle: ModelBundle, cached: CachedExplainer, X: np.ndarray
+) -> np.ndarray:
+    """SHAP values of ``X``, computing only the rows the prediction cache lacks."""
+    if not prediction_cache.enabled:
+        return cached.shap_values(X)
+    digests = [feature_digest(row) for row in X]
+    rows = [prediction_cache.get(bundle.version, "shap", digest) for digest in digests]
+    missing = [index for index, row in enumerate(rows) if row is None]
+    if missing:
+        for index, values in zip(missing, cached.shap_values(X[missing])):
+            rows[index] = values.copy()
+            prediction_cache.put(bundle.version, "shap", digests[index], rows[index])
+    return np.vstack(rows)
 
 
 @app.get("/health")
 async def health() -> dict[str, Any]:
-    return {"status": "ok", "model_stage": "Production"}
+    bundle = registry.current if registry.loaded else None
+    return {
+        "status": "ok",
+        "model_stage": "Production",
+        "model_loaded": bundle is not None,
+        "model_version": bundle.version if bundle else None,
+    }
+
+
+@app.post("/admin/reload")
+async def reload_model() -> dict[str, Any]:
+    try:
+        bundle = await asyncio.to_thread(registry.reload)
+        prediction_cache.invalidate(bundle.version)
+        if config.EXPLAINER_PRELOAD:
+            await asyncio.to_thread(explainers.get, bundle)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(
+            status_code=503, detail=f"Model loading failed: {exc}"
+        ) from exc
+    return {
+        "model_version": bundle.version,
+        "threshold": bundle.threshold,
+        "load_seconds": bundle.load_seconds,
+    }
+
+
+@app.get("/admin/batcher")
+async def batcher_stats() -> dict[str, Any]:
+    return {
+        "enabled": batcher.running,
+        "max_rows": batcher.max_rows,
+        "max_wait_ms": batcher.max_wait * 1000,
+        **batcher.stats.as_dict(),
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics() -> PlainTextResponse:
+    """Latency/phase/batch histograms and model gauges in the Prometheus text format."""
+    if not metrics.enabled:
+        raise HTTPException(
+            status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false)"
+        )
+    samples = []
+    if registry.loaded:
+        bundle = registry.current
+        samples += [
+            (
+                "api_model_info",
+                "gauge",
+                "Loaded model version (file hashes).",
+                1,
+                {"version": bundle.version},
+            ),
+            (
+                "api_model_load_seconds",
+                "gauge",
+                "Time taken to load the current bundle.",
+                bundle.load_seconds,
+            ),
+            (
+                "api_model_loaded_timestamp_seconds",
+                "gauge",
+                "Unix time of the current bundle load.",
+                bundle.loaded_at,
+            ),
+            (
+                "api_model_threshold",
+                "gauge",
+                "Decision threshold of the current bundle.",
+                bundle.threshold,
+            ),
+        ]
+    cache, log = prediction_cache.stats, prediction_log.stats
+    samples += [
+        (
+            "api_prediction_cache_hits_total",
+            "counter",
+            "Prediction cache hits.",
+            cache.hits,
+        ),
+        (
+            "api_prediction_cache_misses_total",
+            "counter",
+            "Prediction cache misses.",
+            cache.misses,
+        ),
+        (
+            "api_prediction_cache_evictions_total",
+            "counter",
+            "Prediction cache evictions.",
+            cache.evictions,
+        ),
+        (
+            "api_prediction_log_dropped_rows_total",
+            "counter",
+            "Logged rows dropped on overflow.",
+            log.dropped_rows,
+        ),
+    ]
+    lines = metrics.render()
+    for sample in samples:
+        lines += sample_lines(*sample)
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/admin/prediction-cache")
+async def prediction_cache_stats() -> dict[str, Any]:
+    return {
+        "enabled": prediction_cache.enabled,
+        "entries": prediction_cache.n_entries,
+        "bytes": prediction_cache.n_bytes,
+        "max_entries": prediction_cache.max_entries,
+        "max_bytes": prediction_cache.max_bytes,
+        "ttl_seconds": prediction_cache.ttl,
+        **prediction_cache.stats.as_dict(),
+    }
+
+
+@app.get("/admin/prediction-log")
+async def prediction_log_stats() -> dict[str, Any]:
+    return {
+        "enabled": prediction_log.running,
+        "directory": str(prediction_log.directory),
+        "capacity": prediction_log.capacity,
+        "buffered_rows": prediction_log.buffered_rows,
+        **prediction_log.stats.as_dict(),
+    }
 
 
 @app.post("/predict")
 async def predict(payload: ClientFeatures) -> dict[str, Any]:
-    model = load_model()
-    threshold = load_threshold()
+    started = time.perf_counter()
+    timer = metrics.timer("/predict")
+    timer.mark("validation")
+    bundle = load_model()
+    check_width(bundle, len(payload.features))
     array = np.array(payload.features, dtype=float).reshape(1, -1)
-    proba = float(model.predict(array)[0])
-    decision = int(proba >= threshold)
+    timer.mark("array")
+    digest = feature_digest(array) if prediction_cache.enabled else b""
+    cached = prediction_cache.get(bundle.version, "predict", digest)
+    if cached is not None:
+        proba, decision = cached
+        timer.mark("cache")
+    else:
+        if batcher.running:
+            proba, bundle = await batcher.submit(array)
+        else:
+            proba = float(bundle.predict_proba(array)[0])
+        timer.mark("predict")
+        decision = int(proba >= bundle.threshold)
+        prediction_cache.put(bundle.version, "predict", digest, (proba, decision))
+        timer.mark("threshold")
+    log_predictions(bundle, [payload.client_id], array, [proba], [decision], started)
     return {
         "client_id": payload.client_id,
         "probability": proba,
         "decision": decision,
-        "threshold": threshold,
+        "threshold": bundle.threshold,
     }
 
 
-@app.post("/explain")
-async def explain(payload: ClientFeatures) -> dict[str, Any]:
-    model = load_model()
-    background = np.zeros((10, len(payload.features)))
-    explainer = shap.KernelExplainer(model.predict, background)
-    shap_values = explainer.shap_values(np.array(payload.features).reshape(1, -1))
+@app.post("/predict/raw")
+async def predict_raw(payload: ClientRecord) -> dict[str, Any]:
+    """Score one client from its raw ``joined_clients`` columns."""
+    started = time.perf_counter()
+    timer = metrics.timer("/predict/raw")
+    timer.mark("validation")
+    bundle = load_model()
+    array = transform_records(bundle, [payload.record])
+    timer.mark("array")
+    proba = float(bundle.predict_proba(array)[0])
+    timer.mark("predict")
+    decision = int(proba >= bundle.threshold)
+    timer.mark("threshold")
+    log_predictions(bundle, [payload.client_id], array, [proba], [decision], started)
     return {
         "client_id": payload.client_id,
-        "shap_values": shap_values.tolist(),
+        "probability": proba,
+        "decision": decision,
+        "threshold": bundle.threshold,
     }
+
+
+@app.post("/predict/raw/batch")
+async def predict_raw_batch(payload: list[ClientRecord]) -> StreamingResponse:
+    """Score many raw records with one preprocessing pass and one model call.
+
+    Streams NDJSON like ``/predict/batch``.
+    """
+    started = time.perf_counter()
+    timer = metrics.timer("/predict/raw/batch")
+    timer.mark("validation")
+    bundle = load_model()
+    if len(payload) > config.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(payload)} rows exceeds "
+            f"MAX_BATCH_SIZE={config.MAX_BATCH_SIZE}",
+        )
+    client_ids = np.array([item.client_id for item in payload], dtype=np.int64)
+    metrics.observe_batch("/predict/raw/batch", len(payload))
+    if payload:
+        records = [item.record for item in payload]
+        # The per-record preprocessing loop runs off the event loop too.
+        X, proba = await asyncio.to_thread(score_records, bundle, records, timer)
+        timer.mark("predict")
+        decision = (proba >= bundle.threshold).astype(np.int8)
+        timer.mark("threshold")
+        log_predictions(bundle, client_ids, X, proba, decision, started)
+    else:
+        proba = np.empty(0)
+        decision = np.empty(0, dtype=np.int8)
+    chunks = iter_ndjson(
+        client_ids, proba, decision, bundle.threshold, config.BATCH_STREAM_CHUNK
+    )
+    return StreamingResponse(chunks, media_type=NDJSON_CONTENT_TYPE)
+
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request) -> StreamingResponse:
+    """Score many clients in one model call.
+
+    Accepts a JSON array of ``ClientFeatures``, a 2-D ``.npy`` matrix
+    (``application/x-npy``) or an Arrow IPC stream with one column per feature
+    and an optional ``client_id`` column. Results are streamed as NDJSON.
+    """
+    started = time.perf_counter()
+    timer = metrics.timer("/predict/batch")
+    bundle = load_model()
+    body = await request.body()
+    timer.mark("validation")
+    try:
+        client_ids, X = decode_batch(body, request.headers.get("content-type"))
+    except BatchDecodeError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    timer.mark("array")
+    metrics.observe_batch("/predict/batch", len(X))
+    if len(X) > config.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(X)} rows exceeds "
+            f"MAX_BATCH_SIZE={config.MAX_BATCH_SIZE}",
+        )
+    if len(X):
+        check_width(bundle, X.shape[1])
+        proba = await asyncio.to_thread(bundle.predict_proba, X)
+        timer.mark("predict")
+        decision = (proba >= bundle.threshold).astype(np.int8)
+        timer.mark("threshold")
+        log_predictions(bundle, client_ids, X, proba, decision, started)
+    else:
+        proba = np.empty(0)
+        decision = np.empty(0, dtype=np.int8)
+    chunks = iter_ndjson(
+        client_ids, proba, decision, bundle.threshold, config.BATCH_STREAM_CHUNK
+    )
+    return StreamingResponse(chunks, media_type=NDJSON_CONTENT_TYPE)
+
+
+@app.post("/explain")
+async def explain(
+    payload: ClientFeatures, top_k: int | None = Query(None, ge=1)
+) -> dict[str, Any]:
+    timer = metrics.timer("/explain")
+    timer.mark("validation")
+    bundle = load_model()
+    check_width(bundle, len(payload.features))
+    # The first call after a start or reload imports shap and builds the explainer.
+    cached = await asyncio.to_thread(explainers.get, bundle)
+    X = np.array(payload.features, dtype=float).reshape(1, -1)
+    timer.mark("array")
+    shap_values = explain_rows(bundle, cached, X)
+    timer.mark("shap")
+    return format_explanations(
+        np.array([payload.client_id]),
+        X,
+        shap_values,
+        cached.base_value,
+        bundle.feature_names,
+        top_k,
+    )[0]
+
+
+@app.post("/explain/batch")
+async def explain_batch(
+    request: Request, top_k: int | None = Query(None, ge=1)
+) -> list[dict[str, Any]]:
+    """Explain many clients in one TreeSHAP pass; same bodies as ``/predict/batch``."""
+    timer = metrics.timer("/explain/batch")
+    bundle = load_model()
+    body = await request.body()
+    timer.mark("validation")
+    try:
+        client_ids, X = decode_batch(body, request.headers.get("content-type"))
+    except BatchDecodeError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    timer.mark("array")
+    metrics.observe_batch("/explain/batch", len(X))
+    if len(X) > config.MAX_EXPLAIN_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(X)} rows exceeds "
+            f"MAX_EXPLAIN_BATCH_SIZE={config.MAX_EXPLAIN_BATCH_SIZE}",
+        )
+    if not len(X):
+        return []
+    check_width(bundle, X.shape[1])
+    cached = await asyncio.to_thread(explainers.get, bundle)
+    shap_values = await asyncio.to_thread(explain_rows, bundle, cached, X)
+    timer.mark("shap")
+    return format_explanations(
+        client_ids, X, shap_values, cached.base_value, bundle.feature_names, top_k
+    )
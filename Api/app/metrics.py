@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Iterable
+
+from Api.app import config
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+BATCH_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 50000)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# perf_counter() at which the current HTTP request entered the middleware.
+_request_started: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "request_started", default=None
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def sample_lines(
+    name: str,
+    kind: str,
+    documentation: str,
+    value: float,
+    labels: dict[str, Any] | None = None,
+) -> list[str]:
+    """One gauge or counter in the Prometheus text exposition format."""
+    labels = labels or {}
+    return [
+        f"# HELP {name} {documentation}",
+        f"# TYPE {name} {kind}",
+        f"{name}{_labels(labels.keys(), labels.values())} {float(value)!r}",
+    ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format.
+
+    ``observe`` is one bisect and two additions under an uncontended lock;
+    buckets are only accumulated when the endpoint is scraped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Iterable[float],
+        labelnames: tuple[str, ...],
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._series: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self, *labels: str) -> tuple[list[int], float]:
+        with self._lock:
+            counts, total = self._series.get(
+                labels, [[0] * (len(self.buckets) + 1), 0.0]
+            )
+            return list(counts), total
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in self._series.items()
+            ]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket_labels = _labels((*self.labelnames, "le"), (*labels, bound))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{series_labels} {total!r}")
+            lines.append(f"{self.name}_count{series_labels} {cumulative}")
+        return lines
+
+
+class PhaseTimer:
+    """Splits one request's latency into named phases, each ending at ``mark``."""
+
+    __slots__ = ("_metrics", "_endpoint", "_last")
+
+    def __init__(self, metrics: ApiMetrics, endpoint: str, started: float) -> None:
+        self._metrics = metrics
+        self._endpoint = endpoint
+        self._last = started
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self._metrics.phase_seconds.observe(now - self._last, self._endpoint, phase)
+        self._last = now
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def mark(self, phase: str) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class ApiMetrics:
+    """Request, phase and batch-size histograms for ``GET /metrics``.
+
+    With ``enabled`` false, timers are a shared no-op object and the
+    middleware passes requests straight through.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.request_seconds = Histogram(
+            "api_request_duration_seconds",
+            "End-to-end request latency, including response streaming.",
+            LATENCY_BUCKETS,
+            ("endpoint", "status"),
+        )
+        self.phase_seconds = Histogram(
+            "api_request_phase_seconds",
+            "Time spent in each phase of a request "
+            "(validation, array, predict, threshold, shap, cache).",
+            LATENCY_BUCKETS,
+            ("endpoint", "phase"),
+        )
+        self.batch_rows = Histogram(
+            "api_batch_rows",
+            "Rows scored or explained per request, and per micro-batch.",
+            BATCH_BUCKETS,
+            ("endpoint",),
+        )
+
+    def timer(self, endpoint: str) -> PhaseTimer | _NullTimer:
+        """Phase timer starting when the request reached the middleware (or now)."""
+        if not self.enabled:
+            return _NULL_TIMER
+        started = _request_started.get()
+        return PhaseTimer(
+            self, endpoint, started if started is not None else time.perf_counter()
+        )
+
+    def observe_batch(self, endpoint: str, n_rows: int) -> None:
+        if self.enabled:
+            self.batch_rows.observe(n_rows, endpoint)
+
+    def render(self) -> list[str]:
+        return [
+            *self.request_seconds.render(),
+            *self.phase_seconds.render(),
+            *self.batch_rows.render(),
+        ]
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by route and status code."""
+
+    def __init__(self, app, metrics: ApiMetrics) -> None:
+        self.app = app
+        self.metrics = metrics
+        self._paths: set[str] | None = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self.metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+        if self._paths is None:
+            self._paths = {
+                route.path for route in scope["app"].routes if hasattr(route, "path")
+            }
+        # Unknown paths share one label so scanners cannot grow the series set.
+        endpoint = scope["path"] if scope["path"] in self._paths else "other"
+        started = time.perf_counter()
+        token = _request_started.set(started)
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_started.reset(token)
+            self.metrics.request_seconds.observe(
+                time.perf_counter() - started, endpoint, str(status)
+            )
+
+
+metrics = ApiMetrics(enabled=config.METRICS_ENABLED)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from Api.app import config
+
+# Rough per-entry cost of the key, the tuple and the dict slot, on top of the value.
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def feature_digest(row: np.ndarray) -> bytes:
+    """128-bit BLAKE2b digest of one feature vector, as float64 bytes."""
+    row = np.ascontiguousarray(row, dtype=np.float64)
+    return hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+
+
+def _value_nbytes(value: Any) -> int:
+    if isinstance(value, tuple):
+        return sum(_value_nbytes(item) for item in value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return 8
+
+
+@dataclass
+class PredictionCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {**self.__dict__, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+class PredictionCache:
+    """Bounded LRU of per-row results for identical feature vectors.
+
+    Keys are ``(kind, feature_digest(row))`` and every entry belongs to the
+    model version it was computed with: the bundle version hashes the model
+    and threshold files, so the first lookup with a new version empties the
+    cache, and results computed by an older bundle are never stored. Entries
+    are evicted least recently used first once ``max_entries`` or
+    ``max_bytes`` is exceeded, and expire ``ttl`` seconds after insertion.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 600.0,
+        enabled: bool = True,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self.stats = PredictionCacheStats()
+        self._entries: OrderedDict[tuple[str, bytes], tuple[Any, float, int]] = (
+            OrderedDict()
+        )
+        self._version: str | None = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def n_entries(self) -> int:
+        return len(self._entries)
+
+    @property
+    def n_bytes(self) -> int:
+        return self._bytes
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def invalidate(self, version: str | None = None) -> None:
+        """Drop every entry; later lookups must come with ``version`` to be served."""
+        with self._lock:
+            if self._entries:
+                self.stats.invalidations += 1
+            self._clear()
+            self._version = version
+
+    def get(self, version: str, kind: str, digest: bytes) -> Any | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.stats.invalidations += 1
+                self._clear()
+                self._version = version
+            entry = self._entries.get((kind, digest))
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            value, expires_at, nbytes = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._entries[(kind, digest)]
+                self._bytes -= nbytes
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end((kind, digest))
+            self.stats.hits += 1
+            return value
+
+    def put(self, version: str, kind: str, digest: bytes, value: Any) -> None:
+        if not self.enabled:
+            return
+        nbytes = _value_nbytes(value) + ENTRY_OVERHEAD_BYTES
+        if nbytes > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else 0.0
+        with self._lock:
+            if version != self._version:
+                # Computed by a bundle that has been replaced since the lookup.
+                return
+            previous = self._entries.pop((kind, digest), None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[(kind, digest)] = (value, expires_at, nbytes)
+            self._bytes += nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.stats.evictions += 1
+
+
+prediction_cache = PredictionCache(
+    max_entries=config.PREDICTION_CACHE_MAX_ENTRIES,
+    max_bytes=config.PREDICTION_CACHE_MAX_BYTES,
+    ttl=config.PREDICTION_CACHE_TTL,
+    enabled=config.PREDICTION_CACHE_ENABLED,
+)
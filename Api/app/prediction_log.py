@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from Api.app import config
+from Api.app.dependencies import ModelBundle
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Block:
+    """Rows scored by one request, kept as arrays until the next flush."""
+
+    client_ids: np.ndarray
+    X: np.ndarray
+    proba: np.ndarray
+    decision: np.ndarray
+    threshold: float
+    model_version: str
+    feature_names: tuple[str, ...]
+    latency_ms: float
+    logged_at: float
+
+    def __len__(self) -> int:
+        return len(self.client_ids)
+
+
+@dataclass
+class PredictionLogStats:
+    enqueued_rows: int = 0
+    dropped_rows: int = 0
+    flushed_rows: int = 0
+    files_written: int = 0
+    flush_errors: int = 0
+    lost_rows: int = 0
+    rotation_errors: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(self.__dict__)
+
+
+class PredictionLog:
+    """Non-blocking log of served predictions, flushed to Parquet in the background.
+
+    ``record`` only appends array references to an in-memory ring buffer of at
+    most ``capacity`` rows; when it is full the oldest rows are dropped and
+    counted, so a slow disk can never slow requests or grow memory. A
+    background task writes the buffer every ``flush_interval`` seconds (or as
+    soon as ``flush_rows`` rows are waiting) to one Parquet file per flush under
+    ``<directory>/date=YYYY-MM-DD/``, keeping the newest ``max_files`` files.
+    ``record`` must be called from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        capacity: int = 100_000,
+        flush_rows: int = 10_000,
+        flush_interval: float = 5.0,
+        max_files: int = 1_000,
+    ) -> None:
+        self.directory = Path(directory)
+        self.capacity = capacity
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_files = max_files
+        self.stats = PredictionLogStats()
+        self._blocks: deque[_Block] = deque()
+        self._buffered_rows = 0
+        self._sequence = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    @property
+    def buffered_rows(self) -> int:
+        return self._buffered_rows
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self.stats = PredictionLogStats()
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._worker
+        self._worker = None
+        await asyncio.to_thread(self._write_blocks, self._drain())
+
+    def record(
+        self,
+        bundle: ModelBundle,
+        client_ids: np.ndarray,
+        X: np.ndarray,
+        proba: np.ndarray,
+        decision: np.ndarray,
+        latency_ms: float,
+    ) -> None:
+        """Buffer one request's rows; never blocks and never raises on overflow."""
+        block = _Block(
+            client_ids=np.asarray(client_ids, dtype=np.int64),
+            X=X,
+            proba=np.asarray(proba, dtype=float),
+            decision=np.asarray(decision, dtype=np.int8),
+            threshold=bundle.threshold,
+            model_version=bundle.version,
+            feature_names=tuple(bundle.feature_names)
+            or tuple(f"f{i}" for i in range(X.shape[1])),
+            latency_ms=latency_ms,
+            logged_at=time.time(),
+        )
+        if len(block) > self.capacity:
+            self.stats.dropped_rows += len(block) - self.capacity
+            block = self._tail(block, self.capacity)
+        while self._buffered_rows + len(block) > self.capacity:
+            dropped = self._blocks.popleft()
+            self._buffered_rows -= len(dropped)
+            self.stats.dropped_rows += len(dropped)
+        self._blocks.append(block)
+        self._buffered_rows += len(block)
+        self.stats.enqueued_rows += len(block)
+        if self._wakeup is not None and self._buffered_rows >= self.flush_rows:
+            self._wakeup.set()
+
+    @staticmethod
+    def _tail(block: _Block, n_rows: int) -> _Block:
+        return _Block(
+            client_ids=block.client_ids[-n_rows:],
+            X=block.X[-n_rows:],
+            proba=block.proba[-n_rows:],
+            decision=block.decision[-n_rows:],
+            threshold=block.threshold,
+            model_version=block.model_version,
+            feature_names=block.feature_names,
+            latency_ms=block.latency_ms,
+            logged_at=block.logged_at,
+        )
+
+    def _drain(self) -> list[_Block]:
+        blocks = []
+        while self._blocks:
+            block = self._blocks.popleft()
+            self._buffered_rows -= len(block)
+            blocks.append(block)
+        return blocks
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written."""
+        return self._write_blocks(self._drain())
+
+    def _write_blocks(self, blocks: list[_Block]) -> int:
+        # Runs in a worker thread: it only touches the drained blocks and the
+        # writer-side counters, never the buffer that ``record`` appends to.
+        written = 0
+        groups: dict[tuple, list[_Block]] = {}
+        for block in blocks:
+            groups.setdefault((block.model_version, block.feature_names), []).append(
+                block
+            )
+        for (model_version, feature_names), group in groups.items():
+            try:
+                self._write(group, model_version, feature_names)
+            except Exception:  # noqa: BLE001
+                # Losing a log batch must not take the API down.
+                self.stats.flush_errors += 1
+                self.stats.lost_rows += sum(len(block) for block in group)
+                logger.exception("Prediction log flush failed")
+                continue
+            written += sum(len(block) for block in group)
+        self.stats.flushed_rows += written
+        if written:
+            try:
+                self._rotate()
+            except Exception:  # noqa: BLE001
+                # The rows are on disk: a failed cleanup is not a lost batch.
+                self.stats.rotation_errors += 1
+                logger.exception("Prediction log rotation failed")
+        return written
+
+    def _write(
+        self, blocks: list[_Block], model_version: str, feature_names: tuple[str, ...]
+    ) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        X = np.vstack([block.X for block in blocks])
+        repeat = [len(block) for block in blocks]
+        columns = {
+            "logged_at": pa.array(
+                np.repeat([block.logged_at for block in blocks], repeat), pa.float64()
+            ),
+            "client_id": np.concatenate([block.client_ids for block in blocks]),
+            "probability": np.concatenate([block.proba for block in blocks]),
+            "decision": np.concatenate([block.decision for block in blocks]),
+            "threshold": np.repeat([block.threshold for block in blocks], repeat),
+            "latency_ms": np.repeat([block.latency_ms for block in blocks], repeat),
+            "model_version": pa.array(
+                [model_version] * len(X), pa.dictionary(pa.int32(), pa.string())
+            ),
+        }
+        columns.update({name: X[:, index] for index, name in enumerate(feature_names)})
+        table = pa.table(columns)
+        partition = (
+            self.directory
+            / f"date={time.strftime('%Y-%m-%d', time.gmtime(blocks[0].logged_at))}"
+        )
+        partition.mkdir(parents=True, exist_ok=True)
+        # The pid keeps names unique when several API workers share the directory.
+        stamp = time.strftime("%H%M%S", time.gmtime())
+        name = f"part-{stamp}-{os.getpid()}-{next(self._sequence)}.parquet"
+        tmp_path = partition / f".{name}.tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        tmp_path.rename(partition / name)
+        self.stats.files_written += 1
+
+    def _rotate(self) -> None:
+        # Other workers rotate the same directory: files may vanish while listed.
+        files = []
+        for path in self.directory.glob("date=*/part-*.parquet"):
+            try:
+                files.append((path.stat().st_mtime_ns, path))
+            except FileNotFoundError:
+                continue
+        files.sort()
+        for _, stale in files[: max(len(files) - self.max_files, 0)]:
+            stale.unlink(missing_ok=True)
+
+    async def _run(self) -> None:
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            self._wakeup.clear()
+            if self._blocks:
+                # Drained on the event loop, the thread that ``record`` runs on.
+                await asyncio.to_thread(self._write_blocks, self._drain())
+
+
+prediction_log = PredictionLog(
+    config.PREDICTION_LOG_DIR,
+    capacity=config.PREDICTION_LOG_CAPACITY,
+    flush_rows=config.PREDICTION_LOG_FLUSH_ROWS,
+    flush_interval=config.PREDICTION_LOG_FLUSH_INTERVAL,
+    max_files=config.PREDICTION_LOG_MAX_FILES,
+)
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Union
+
+from pydantic import BaseModel, Field
+
+
+class ClientFeatures(BaseModel):
+    client_id: int = Field(..., description="Identifiant client")
+    features: list[float] = Field(
+        ..., description="Vecteur de features déjà transformé"
+    )
+
+
+class ClientRecord(BaseModel):
+    client_id: int = Field(..., description="Identifiant client")
+    record: dict[str, Union[float, str, None]] = Field(
+        ...,
+        description=(
+            "Colonnes brutes de joined_clients "
+            "(valeurs manquantes : null ou absentes)"
+        ),
+    )
@@ -0,0 +1,148 @@
+"""Stream rows through the saved preprocessor in fixed-size blocks.
+
+Blocks are transformed across a process pool (the preprocessor is unpickled
+once per worker) and written to Parquet as one row group per block, in input
+order. At most ``2 * n_jobs`` blocks are in flight, so memory stays bounded by
+the block size whatever the size of the input.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from Src.features.feature_engineering import PREPROCESSOR_PATH
+
+_worker_preprocessor = None
+
+
+def iter_input_chunks(source, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Yield ``chunk_rows``-row frames from a DataFrame, a Parquet or a CSV file."""
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start : start + chunk_rows]
+        return
+    path = Path(source)
+    if path.suffix == ".parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif path.suffix == ".csv":
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+    else:
+        raise ValueError(f"Unsupported input format: {path.suffix}")
+
+
+def _init_worker(preprocessor_path: Path) -> None:
+    global _worker_preprocessor
+    _worker_preprocessor = joblib.load(preprocessor_path)
+
+
+def _transform_chunk(frame: pd.DataFrame, preprocessor=None) -> np.ndarray:
+    preprocessor = preprocessor if preprocessor is not None else _worker_preprocessor
+    transformed = preprocessor.transform(frame)
+    if hasattr(transformed, "toarray"):
+        transformed = transformed.toarray()
+    return np.asarray(transformed, dtype=np.float64)
+
+
+def _to_record_batch(
+    matrix: np.ndarray, frame: pd.DataFrame, feature_names, passthrough
+) -> pa.RecordBatch:
+    arrays = [pa.array(frame[column].to_numpy()) for column in passthrough]
+    arrays += [pa.array(matrix[:, index]) for index in range(matrix.shape[1])]
+    return pa.RecordBatch.from_arrays(arrays, names=[*passthrough, *feature_names])
+
+
+def transform_in_chunks(
+    source,
+    output_path: Path,
+    preprocessor_path: Path = PREPROCESSOR_PATH,
+    chunk_rows: int = 100_000,
+    n_jobs: int | None = None,
+    passthrough: Sequence[str] = (),
+) -> tuple[int, int]:
+    """Transform ``source`` block by block into ``output_path`` and return its shape.
+
+    ``passthrough`` columns (e.g. ``client_id``) are copied untouched in front
+    of the features so scored rows can be joined back to their source.
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    preprocessor = joblib.load(preprocessor_path)
+    feature_names = [str(name) for name in preprocessor.get_feature_names_out()]
+    passthrough = list(passthrough)
+    output_path = Path(output_path)
+    tmp_path = output_path.with_suffix(".tmp")
+    writer = None
+    n_rows = 0
+
+    def write(matrix: np.ndarray, frame: pd.DataFrame) -> None:
+        nonlocal writer, n_rows
+        batch = _to_record_batch(matrix, frame, feature_names, passthrough)
+        if writer is None:
+            writer = pq.ParquetWriter(tmp_path, batch.schema, compression="zstd")
+        writer.write_table(pa.Table.from_batches([batch]), row_group_size=len(frame))
+        n_rows += len(frame)
+
+    try:
+        if n_jobs == 1:
+            for frame in iter_input_chunks(source, chunk_rows):
+                write(_transform_chunk(frame, preprocessor), frame)
+        else:
+            in_flight: deque = deque()
+            with ProcessPoolExecutor(
+                n_jobs, initializer=_init_worker, initargs=(preprocessor_path,)
+            ) as pool:
+                for frame in iter_input_chunks(source, chunk_rows):
+                    in_flight.append(
+                        (pool.submit(_transform_chunk, frame), frame[passthrough])
+                    )
+                    if len(in_flight) >= 2 * n_jobs:
+                        future, kept = in_flight.popleft()
+                        write(future.result(), kept)
+                while in_flight:
+                    future, kept = in_flight.popleft()
+                    write(future.result(), kept)
+        if writer is None:
+            empty = pd.DataFrame(columns=passthrough)
+            write(np.empty((0, len(feature_names))), empty)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, output_path)
+    return n_rows, len(feature_names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Transform a large table through the saved preprocessor."
+    )
+    parser.add_argument(
+        "input_path",
+        type=Path,
+        help="Parquet or CSV file with the joined_clients columns.",
+    )
+    parser.add_argument("output_path", type=Path)
+    parser.add_argument("--preprocessor", type=Path, default=PREPROCESSOR_PATH)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--passthrough", nargs="*", default=["client_id"])
+    args = parser.parse_args()
+    shape = transform_in_chunks(
+        args.input_path,
+        args.output_path,
+        preprocessor_path=args.preprocessor,
+        chunk_rows=args.chunk_rows,
+        n_jobs=args.jobs,
+        passthrough=args.passthrough,
+    )
+    print(f"Wrote {shape} to {args.output_path}")
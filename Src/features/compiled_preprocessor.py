@@ -0,0 +1,190 @@
+"""Array/dict version of the fitted ``build_feature_pipeline`` ColumnTransformer.
+
+``ColumnTransformer.transform`` needs a DataFrame and walks several sklearn
+objects per call, which dominates the latency of scoring a handful of raw
+records. Compiling keeps only what the fitted transformer actually uses:
+the imputation fills of each block and, for one-hot blocks, a
+``category -> output column`` dict. Records (plain dicts of
+``joined_clients`` columns) are then transformed with a few NumPy operations.
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Mapping, Sequence
+
+import joblib
+import numpy as np
+
+if TYPE_CHECKING:
+    # Only needed to compile; the API imports this module to serve the result.
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder
+
+
+@dataclass(frozen=True)
+class NumericBlock:
+    """Imputed numeric columns, copied through."""
+
+    columns: tuple[str, ...]
+    fill: np.ndarray
+
+
+@dataclass(frozen=True)
+class OneHotBlock:
+    """Imputed categorical columns, each expanded to its fitted categories."""
+
+    columns: tuple[str, ...]
+    fill: tuple[Any, ...]
+    lookups: tuple[dict[Any, int], ...]
+    offsets: tuple[int, ...]
+    width: int
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+@dataclass(frozen=True)
+class CompiledPreprocessor:
+    blocks: tuple[NumericBlock | OneHotBlock, ...]
+    feature_names: tuple[str, ...]
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+    @property
+    def input_columns(self) -> list[str]:
+        return [column for block in self.blocks for column in block.columns]
+
+    def transform_records(self, records: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        """Transform raw records.
+
+        Absent keys count as missing values, unknown categories encode as all-zero.
+        """
+        out = np.zeros((len(records), self.n_features))
+        start = 0
+        for block in self.blocks:
+            if isinstance(block, NumericBlock):
+                values = np.array(
+                    [
+                        [record.get(column) for column in block.columns]
+                        for record in records
+                    ],
+                    dtype=float,
+                ).reshape(len(records), len(block.columns))
+                out[:, start : start + len(block.columns)] = np.where(
+                    np.isnan(values), block.fill, values
+                )
+                start += len(block.columns)
+                continue
+            for column, fill, lookup, offset in zip(
+                block.columns, block.fill, block.lookups, block.offsets
+            ):
+                for row, record in enumerate(records):
+                    value = record.get(column)
+                    index = lookup.get(fill if _is_missing(value) else value)
+                    if index is not None:
+                        out[row, start + offset + index] = 1.0
+            start += block.width
+        return out
+
+
+def _split_steps(transformer) -> tuple[SimpleImputer | None, Any]:
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+
+    steps = (
+        [step for _, step in transformer.steps]
+        if isinstance(transformer, Pipeline)
+        else [transformer]
+    )
+    imputer = steps[0] if isinstance(steps[0], SimpleImputer) else None
+    rest = steps[1:] if imputer is not None else steps
+    if len(rest) > 1:
+        raise TypeError(f"Unsupported pipeline steps: {steps}")
+    return imputer, rest[0] if rest else None
+
+
+def _numeric_block(columns: list[str], imputer: SimpleImputer | None) -> NumericBlock:
+    if imputer is None:
+        return NumericBlock(tuple(columns), np.full(len(columns), np.nan))
+    fill = np.asarray(imputer.statistics_, dtype=float)
+    # SimpleImputer drops columns that were entirely missing at fit time.
+    kept = ~np.isnan(fill) | getattr(imputer, "keep_empty_features", False)
+    return NumericBlock(tuple(np.asarray(columns)[kept]), fill[kept])
+
+
+def _one_hot_block(
+    columns: list[str], imputer: SimpleImputer | None, encoder: OneHotEncoder
+) -> OneHotBlock:
+    if encoder.drop_idx_ is not None or getattr(encoder, "_infrequent_enabled", False):
+        raise TypeError(
+            "Only OneHotEncoder(drop=None) without infrequent categories "
+            "can be compiled"
+        )
+    if encoder.handle_unknown != "ignore":
+        raise TypeError("OneHotEncoder must use handle_unknown='ignore' to be compiled")
+    fill = tuple(imputer.statistics_) if imputer is not None else (None,) * len(columns)
+    lookups = tuple(
+        {value: index for index, value in enumerate(categories)}
+        for categories in encoder.categories_
+    )
+    offsets = tuple(
+        np.concatenate([[0], np.cumsum([len(c) for c in encoder.categories_])[:-1]])
+        .astype(int)
+        .tolist()
+    )
+    return OneHotBlock(
+        tuple(columns), fill, lookups, offsets, sum(len(c) for c in encoder.categories_)
+    )
+
+
+def compile_preprocessor(preprocessor: ColumnTransformer) -> CompiledPreprocessor:
+    """Compile a fitted ColumnTransformer made of imputers and one-hot encoders."""
+    from sklearn.preprocessing import OneHotEncoder
+
+    blocks = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == "remainder":
+            if transformer != "drop":
+                raise TypeError("Only remainder='drop' can be compiled")
+            continue
+        imputer, encoder = _split_steps(transformer)
+        if encoder is None:
+            blocks.append(_numeric_block(list(columns), imputer))
+        elif isinstance(encoder, OneHotEncoder):
+            blocks.append(_one_hot_block(list(columns), imputer, encoder))
+        else:
+            raise TypeError(f"Unsupported transformer in block {name!r}: {encoder!r}")
+    feature_names = tuple(str(name) for name in preprocessor.get_feature_names_out())
+    compiled = CompiledPreprocessor(tuple(blocks), feature_names)
+    width = sum(
+        len(b.columns) if isinstance(b, NumericBlock) else b.width for b in blocks
+    )
+    if width != compiled.n_features:
+        raise ValueError(
+            f"Compiled width {width} does not match "
+            f"the {compiled.n_features} fitted features"
+        )
+    return compiled
+
+
+def load_compiled_preprocessor(path: Path) -> CompiledPreprocessor:
+    return compile_preprocessor(joblib.load(path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check that a saved preprocessor can be compiled."
+    )
+    parser.add_argument("preprocessor_path", type=Path)
+    args = parser.parse_args()
+    compiled = load_compiled_preprocessor(args.preprocessor_path)
+    print(
+        f"{len(compiled.input_columns)} input columns -> {compiled.n_features} features"
+    )
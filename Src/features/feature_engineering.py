@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import argparse
+import json
+import os
 from pathlib import Path
 from typing import Dict, Tuple
 
 import joblib
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import sparse
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.model_selection import train_test_split
@@ -18,13 +25,53 @@ ARTIFACTS_DIR = Path(__file__).resolve().parents[2] / "artifacts"
 OUTPUT_DIR = ARTIFACTS_DIR / "features"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 PREPROCESSOR_PATH = ARTIFACTS_DIR / "preprocessor.joblib"
+FEATURE_NAMES_FILENAME = "feature_names.json"
+SPLITS = ("train", "valid", "test")
+# Rows converted per block when writing ``.npy`` files, to bound memory.
+NPY_CHUNK_ROWS = 50_000
 
 
-def load_joined_dataset() -> pd.DataFrame:
-    dataset_path = DATA_DIR / "joined_clients.csv"
-    if not dataset_path.exists():
-        raise FileNotFoundError(f"{dataset_path} not found. Run Src/pipelines/join_datasets.py first.")
-    dataset = pd.read_csv(dataset_path)
+def _latest_mtime_ns(path: Path) -> int | None:
+    if path.is_dir():
+        return max(
+            (part.stat().st_mtime_ns for part in path.glob("*.parquet")), default=None
+        )
+    return path.stat().st_mtime_ns if path.exists() else None
+
+
+def load_joined_dataset(columns: list[str] | None = None) -> pd.DataFrame:
+    """Read the joined table, only materialising ``columns`` when given.
+
+    The Parquet output of join_datasets keeps dtypes and is read column-wise.
+    When both exist, the most recently written of ``joined_clients.parquet``
+    (full join) and ``joined_clients/`` (incremental mode) is used; a legacy
+    ``joined_clients.csv`` is the last resort.
+
+    Rows are sorted by ``client_id`` whatever the source, so ``split_data``
+    draws the same splits from the full and the partitioned output.
+    """
+    dataset_path = DATA_DIR / "joined_clients.parquet"
+    partitioned_path = DATA_DIR / "joined_clients"
+    read_columns = columns
+    if columns is not None and "client_id" not in columns:
+        read_columns = [*columns, "client_id"]
+    full_mtime = _latest_mtime_ns(dataset_path)
+    partitioned_mtime = _latest_mtime_ns(partitioned_path)
+    if partitioned_mtime is not None and (
+        full_mtime is None or partitioned_mtime > full_mtime
+    ):
+        dataset = pd.read_parquet(partitioned_path, columns=read_columns)
+    elif full_mtime is not None:
+        dataset = pd.read_parquet(dataset_path, columns=read_columns)
+    elif (DATA_DIR / "joined_clients.csv").exists():
+        dataset = pd.read_csv(DATA_DIR / "joined_clients.csv", usecols=read_columns)
+    else:
+        raise FileNotFoundError(
+            f"{dataset_path} not found. Run Src/pipelines/join_datasets.py first."
+        )
+    dataset = dataset.sort_values("client_id", ignore_index=True)
+    if columns is not None:
+        dataset = dataset[columns]
     print(f"Dataset loaded with shape {dataset.shape}")
     return dataset
 
@@ -49,7 +96,11 @@ def split_data(df: pd.DataFrame) -> Tuple[Tuple[pd.DataFrame, pd.Series], ...]:
     return (X_train, y_train), (X_valid, y_valid), (X_test, y_test)
 
 
-def build_feature_pipeline(categorical_cols: list[str], numeric_cols: list[str]) -> ColumnTransformer:
+def build_feature_pipeline(
+    categorical_cols: list[str],
+    numeric_cols: list[str],
+    sparse_output: bool = False,
+) -> ColumnTransformer:
     numeric_transformer = Pipeline(
         steps=[
             ("imputer", SimpleImputer(strategy="median")),
@@ -66,6 +117,8 @@ def build_feature_pipeline(categorical_cols: list[str], numeric_cols: list[str])
             ("num", numeric_transformer, numeric_cols),
             ("cat", categorical_transformer, categorical_cols),
         ],
+        # 1.0 keeps the one-hot block sparse whatever the overall density.
+        sparse_threshold=1.0 if sparse_output else 0.3,
     )
     return preprocessor
 
@@ -81,42 +134,238 @@ def _to_dataframe(matrix, feature_names) -> pd.DataFrame:
     return pd.DataFrame(matrix, columns=feature_names)
 
 
-def materialize_datasets(preprocessor: ColumnTransformer, splits: Dict[str, Tuple[pd.DataFrame, pd.Series]]) -> None:
+def _matrix_nbytes(matrix) -> int:
+    if sparse.issparse(matrix):
+        return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    return np.asarray(matrix).nbytes
+
+
+def _write_npy(matrix, path: Path) -> None:
+    """Write ``matrix`` as a C-contiguous float32 ``.npy`` that can be memory-mapped."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    out = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.float32, shape=matrix.shape
+    )
+    for start in range(0, matrix.shape[0], NPY_CHUNK_ROWS):
+        block = matrix[start : start + NPY_CHUNK_ROWS]
+        out[start : start + block.shape[0]] = (
+            block.toarray() if sparse.issparse(block) else block
+        )
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+
+
+def _write_parquet(matrix, feature_names, path: Path) -> None:
+    """Write ``matrix`` as dense Parquet, ``NPY_CHUNK_ROWS`` rows at a time."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    writer = None
+    for start in range(0, max(matrix.shape[0], 1), NPY_CHUNK_ROWS):
+        block = _to_dataframe(matrix[start : start + NPY_CHUNK_ROWS], feature_names)
+        table = pa.Table.from_pandas(block, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(tmp_path, table.schema)
+        writer.write_table(table)
+    writer.close()
+    os.replace(tmp_path, path)
+
+
+def _write_features(
+    matrix,
+    feature_names,
+    split_name: str,
+    sparse_output: bool,
+    npy_output: bool = False,
+) -> None:
+    """Write one split as dense Parquet, plus CSR ``.npz`` or float32 ``.npy``.
+
+    ``X_<split>.parquet`` is always written: the drift monitor reads it by
+    default. A stale ``.npz``/``.npy`` of another format is removed, since
+    ``train_model.load_matrix`` prefers them over Parquet.
+    """
+    paths = {
+        suffix: OUTPUT_DIR / f"X_{split_name}.{suffix}" for suffix in ("npz", "npy")
+    }
+    _write_parquet(matrix, feature_names, OUTPUT_DIR / f"X_{split_name}.parquet")
+    written = None
+    if sparse_output:
+        written = "npz"
+        sparse.save_npz(paths["npz"], sparse.csr_matrix(matrix), compressed=True)
+    elif npy_output:
+        written = "npy"
+        _write_npy(matrix, paths["npy"])
+    for suffix, path in paths.items():
+        if suffix != written:
+            path.unlink(missing_ok=True)
+
+
+def export_npy(split_name: str) -> Path:
+    """Convert ``X_<split>.parquet`` to float32 ``X_<split>.npy`` one block at a time.
+
+    The Parquet file is kept: the drift monitor reads it by default.
+    """
+    parquet_path = OUTPUT_DIR / f"X_{split_name}.parquet"
+    npy_path = OUTPUT_DIR / f"X_{split_name}.npy"
+    parquet_file = pq.ParquetFile(parquet_path)
+    shape = (parquet_file.metadata.num_rows, len(parquet_file.schema_arrow))
+    tmp_path = npy_path.with_name(npy_path.name + ".tmp")
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=shape)
+    start = 0
+    for batch in parquet_file.iter_batches(batch_size=NPY_CHUNK_ROWS):
+        block = np.column_stack(
+            [column.to_numpy(zero_copy_only=False) for column in batch.columns]
+        )
+        out[start : start + batch.num_rows] = block
+        start += batch.num_rows
+    out.flush()
+    del out
+    os.replace(tmp_path, npy_path)
+    return npy_path
+
+
+def materialize_datasets(
+    preprocessor: ColumnTransformer,
+    splits: Dict[str, Tuple[pd.DataFrame, pd.Series]],
+    sparse_output: bool = False,
+    chunk_rows: int | None = None,
+    n_jobs: int | None = None,
+    npy_output: bool = False,
+) -> None:
+    """Fit on ``train``, transform every split and write features, targets and weights.
+
+    With ``sparse_output`` the transformed matrices stay CSR end to end and are
+    saved as ``X_<split>.npz`` (feature names in ``feature_names.json``).
+    With ``npy_output`` they are saved as float32 ``X_<split>.npy`` for
+    training on memory maps. ``X_<split>.parquet`` is written in every mode.
+    With ``chunk_rows`` the dense valid/test splits are streamed through the
+    saved preprocessor by ``chunked_transform`` across ``n_jobs`` processes.
+    """
+    if sparse_output and npy_output:
+        raise ValueError(
+            "Choose either sparse (.npz) or memory-mappable (.npy) features, not both."
+        )
     feature_names = None
     for split_name, (X_split, y_split) in splits.items():
         if split_name == "train":
             transformed = preprocessor.fit_transform(X_split)
             feature_names = preprocessor.get_feature_names_out()
             joblib.dump(preprocessor, PREPROCESSOR_PATH)
+            (OUTPUT_DIR / FEATURE_NAMES_FILENAME).write_text(
+                json.dumps(feature_names.tolist())
+            )
+        elif feature_names is None:
+            raise RuntimeError(
+                "Feature names unavailable. Ensure training split is processed first."
+            )
+        elif chunk_rows and not sparse_output:
+            from Src.features.chunked_transform import transform_in_chunks
+
+            shape = transform_in_chunks(
+                X_split,
+                OUTPUT_DIR / f"X_{split_name}.parquet",
+                preprocessor_path=PREPROCESSOR_PATH,
+                chunk_rows=chunk_rows,
+                n_jobs=n_jobs,
+            )
+            (OUTPUT_DIR / f"X_{split_name}.npz").unlink(missing_ok=True)
+            (OUTPUT_DIR / f"X_{split_name}.npy").unlink(missing_ok=True)
+            if npy_output:
+                export_npy(split_name)
+            y_split.to_frame("target").to_parquet(
+                OUTPUT_DIR / f"y_{split_name}.parquet", index=False
+            )
+            print(f"Wrote {split_name} split: {shape} in blocks of {chunk_rows} rows")
+            continue
         else:
             transformed = preprocessor.transform(X_split)
-        if feature_names is None:
-            raise RuntimeError("Feature names unavailable. Ensure training split is processed first.")
-        X_frame = _to_dataframe(transformed, feature_names)
-        X_path = OUTPUT_DIR / f"X_{split_name}.parquet"
+        _write_features(
+            transformed, feature_names, split_name, sparse_output, npy_output
+        )
         y_path = OUTPUT_DIR / f"y_{split_name}.parquet"
-        X_frame.to_parquet(X_path, index=False)
         y_split.to_frame("target").to_parquet(y_path, index=False)
         if split_name == "train":
             weights = add_sample_weights(y_split)
-            weights.to_parquet(OUTPUT_DIR / "sample_weights_train.parquet", index=False)
-        print(f"Wrote {split_name} split: {X_frame.shape}")
+            weights.to_frame().to_parquet(
+                OUTPUT_DIR / "sample_weights_train.parquet", index=False
+            )
+        dense_mb = transformed.shape[0] * transformed.shape[1] * 8 / 1e6
+        print(
+            f"Wrote {split_name} split: {transformed.shape} "
+            f"({_matrix_nbytes(transformed) / 1e6:.1f} MB in memory, "
+            f"dense float64 would be {dense_mb:.1f} MB)",
+        )
 
 
-def run_feature_engineering() -> None:
+def run_feature_engineering(
+    sparse_output: bool = False,
+    chunk_rows: int | None = None,
+    n_jobs: int | None = None,
+    npy_output: bool = False,
+) -> None:
     df = load_joined_dataset()
     (X_train, y_train), (X_valid, y_valid), (X_test, y_test) = split_data(df)
     categorical_cols = X_train.select_dtypes(include=["object"]).columns.tolist()
     numeric_cols = X_train.select_dtypes(exclude=["object"]).columns.tolist()
-    preprocessor = build_feature_pipeline(categorical_cols, numeric_cols)
+    preprocessor = build_feature_pipeline(
+        categorical_cols, numeric_cols, sparse_output=sparse_output
+    )
     splits = {
         "train": (X_train, y_train),
         "valid": (X_valid, y_valid),
         "test": (X_test, y_test),
     }
-    materialize_datasets(preprocessor, splits)
+    materialize_datasets(
+        preprocessor,
+        splits,
+        sparse_output=sparse_output,
+        chunk_rows=chunk_rows,
+        n_jobs=n_jobs,
+        npy_output=npy_output,
+    )
     print(f"Preprocessor saved to {PREPROCESSOR_PATH}")
 
 
 if __name__ == "__main__":
-    run_feature_engineering()
+    parser = argparse.ArgumentParser(
+        description="Split, transform and write the feature matrices."
+    )
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help="Keep the one-hot block sparse and write CSR .npz files.",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=None,
+        help="Transform valid/test in blocks of this many rows.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Worker processes for the chunked transform.",
+    )
+    parser.add_argument(
+        "--npy",
+        action="store_true",
+        help="Write float32 X_<split>.npy files for memory-mapped training.",
+    )
+    parser.add_argument(
+        "--export-npy",
+        action="store_true",
+        help="Only convert the existing X_<split>.parquet files to .npy, "
+        "without refitting.",
+    )
+
+    args = parser.parse_args()
+    if args.export_npy:
+        for split in SPLITS:
+            print(f"Wrote {export_npy(split)}")
+    else:
+        run_feature_engineering(
+            sparse_output=args.sparse,
+            chunk_rows=args.chunk_rows,
+            n_jobs=args.jobs,
+            npy_output=args.npy,
+        )
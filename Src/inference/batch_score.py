@@ -0,0 +1,423 @@
+"""Offline scoring of a client portfolio, chunk by chunk, across a process pool.
+
+The input (Parquet or CSV, raw ``joined_clients`` columns with
+``--preprocessor`` or already-built feature columns without it) is read in
+``chunk_rows`` blocks. Each worker loads the model, preprocessor and, with
+``--top-k``, a TreeSHAP explainer once, then scores its blocks and writes
+them as ``<output_dir>/part-00000.parquet``, ``part-00001.parquet``, ...:
+passthrough columns (``client_id``), ``probability``, ``decision`` and the
+``top_k`` strongest reasons.
+
+Every part is written to a temporary file and renamed, and the run settings
+are stored in ``_manifest.json``. An interrupted run started again with the
+same arguments skips the parts already on disk. ``_SUCCESS`` records the
+summary once every chunk is scored.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from Src.features.chunked_transform import iter_input_chunks
+from Src.inference.predict import positive_proba
+from Src.inference.tree_engine import CompiledForest
+
+MANIFEST_FILENAME = "_manifest.json"
+SUCCESS_FILENAME = "_SUCCESS"
+MODEL_PATH = Path("models/lgbm_model_final.pkl")
+# Business threshold tuned for MODEL_PATH, the one the API serves with it.
+THRESHOLD_PATH = Path("models/optimal_threshold.pkl")
+
+_worker_state: Dict[str, Any] = {}
+
+
+@dataclass
+class BatchScoreSummary:
+    rows: int = 0
+    chunks: int = 0
+    skipped_chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {**self.__dict__, "rows_per_second": self.rows_per_second}
+
+
+def load_scoring_model(path: Path):
+    """A pickled model, a compiled ``.npz`` forest or a memory-mapped forest."""
+    path = Path(path)
+    if path.suffix == ".npz" or path.is_dir():
+        return CompiledForest.load(path)
+    return joblib.load(path)
+
+
+def _path_digest(path: Path | None) -> str | None:
+    if path is None:
+        return None
+    path = Path(path)
+    digest = hashlib.sha256()
+    for file in sorted(path.iterdir()) if path.is_dir() else [path]:
+        digest.update(file.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _model_feature_names(model) -> list[str]:
+    """Input column names of ``model``; empty when it was fitted without names."""
+    names = [
+        str(name)
+        for name in (
+            getattr(model, "feature_name_", None)
+            or getattr(model, "feature_names_in_", [])
+        )
+    ]
+    # LightGBM names the columns of an unnamed matrix Column_0, Column_1, ...
+    if names == [f"Column_{index}" for index in range(len(names))]:
+        return []
+    return names
+
+
+def feature_matrix(
+    frame: pd.DataFrame,
+    feature_names: Sequence[str],
+    passthrough: Sequence[str],
+    n_features: int | None = None,
+) -> np.ndarray:
+    """The model's columns of ``frame``, selected by name.
+
+    Only a model without feature names falls back to every non-passthrough
+    column in file order, and then only when there are ``n_features`` of them.
+    """
+    if feature_names:
+        missing = [name for name in feature_names if name not in frame.columns]
+        if missing:
+            raise ValueError(
+                f"{len(missing)} of the model's {len(feature_names)} features are "
+                f"missing from the input, e.g. {missing[:5]}"
+            )
+        return frame[list(feature_names)].to_numpy(dtype=np.float64)
+    columns = [column for column in frame.columns if column not in passthrough]
+    if n_features is not None and len(columns) != n_features:
+        raise ValueError(f"Expected {n_features} feature columns, found {len(columns)}")
+    return frame[columns].to_numpy(dtype=np.float64)
+
+
+def top_reasons(
+    shap_values: np.ndarray, feature_names: Sequence[str], top_k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Names and SHAP values of the ``top_k`` largest absolute contributions per row."""
+    top_k = min(top_k, shap_values.shape[1])
+    magnitude = np.abs(shap_values)
+    candidates = np.argpartition(-magnitude, top_k - 1, axis=1)[:, :top_k]
+    order = np.argsort(
+        -np.take_along_axis(magnitude, candidates, axis=1), axis=1, kind="stable"
+    )
+    indices = np.take_along_axis(candidates, order, axis=1)
+    return np.asarray(feature_names, dtype=object)[indices], np.take_along_axis(
+        shap_values, indices, axis=1
+    )
+
+
+def _init_worker(settings: Dict[str, Any]) -> None:
+    model = load_scoring_model(settings["model_path"])
+    preprocessor = (
+        joblib.load(settings["preprocessor_path"])
+        if settings["preprocessor_path"]
+        else None
+    )
+    model_names = _model_feature_names(model)
+    if preprocessor is not None:
+        feature_names = [str(name) for name in preprocessor.get_feature_names_out()]
+    else:
+        feature_names = model_names
+    explainer = None
+    if settings["top_k"]:
+        import shap
+
+        explain_model = (
+            joblib.load(settings["explain_model_path"])
+            if settings["explain_model_path"]
+            else model
+        )
+        if isinstance(explain_model, CompiledForest):
+            raise ValueError(
+                "SHAP reasons need the tree model: "
+                "pass --explain-model with the pickled model"
+            )
+        explainer = shap.TreeExplainer(explain_model)
+    _worker_state.update(
+        settings,
+        model=model,
+        preprocessor=preprocessor,
+        explainer=explainer,
+        model_names=model_names,
+        feature_names=feature_names or [f"f{i}" for i in range(model.n_features_in_)],
+    )
+
+
+def _score_chunk(index: int, frame: pd.DataFrame) -> int:
+    """Score one block and write it as part ``index``; returns the number of rows."""
+    state = _worker_state
+    passthrough = [column for column in state["passthrough"] if column in frame.columns]
+    if state["preprocessor"] is not None:
+        X = state["preprocessor"].transform(frame)
+        X = np.asarray(X.toarray() if hasattr(X, "toarray") else X, dtype=np.float64)
+    else:
+        X = feature_matrix(
+            frame,
+            state["model_names"],
+            state["passthrough"],
+            state["model"].n_features_in_,
+        )
+    proba = (
+        np.asarray(positive_proba(state["model"], X), dtype=np.float64)
+        if len(X)
+        else np.empty(0)
+    )
+    scored = frame[passthrough].reset_index(drop=True)
+    scored["probability"] = proba
+    scored["decision"] = (proba >= state["threshold"]).astype(np.int8)
+    if state["explainer"] is not None and len(X):
+        values = state["explainer"].shap_values(X)
+        if isinstance(values, list):
+            # LightGBM binary models return [class 0, class 1]; keep the positive class.
+            values = values[-1]
+        values = np.asarray(values).reshape(len(X), -1)
+        names, contributions = top_reasons(
+            values, state["feature_names"], state["top_k"]
+        )
+        for rank in range(names.shape[1]):
+            scored[f"reason_{rank + 1}"] = names[:, rank]
+            scored[f"reason_{rank + 1}_shap"] = contributions[:, rank]
+    output_dir = Path(state["output_dir"])
+    tmp_path = output_dir / f".part-{index:05d}.parquet.tmp"
+    scored.to_parquet(tmp_path, index=False, compression="zstd")
+    os.replace(tmp_path, output_dir / f"part-{index:05d}.parquet")
+    return len(scored)
+
+
+def _prepare_output(
+    output_dir: Path, manifest: Dict[str, Any], overwrite: bool
+) -> set[int]:
+    """Create ``output_dir``; return the indices of parts left by an identical run."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_FILENAME
+    if manifest_path.exists() and not overwrite:
+        previous = json.loads(manifest_path.read_text())
+        if previous != manifest:
+            changed = sorted(
+                key for key in manifest if previous.get(key) != manifest[key]
+            )
+            raise ValueError(
+                f"{output_dir} holds a run with other settings "
+                f"({', '.join(changed)}); use --overwrite"
+            )
+    else:
+        for stale in output_dir.glob("part-*.parquet"):
+            stale.unlink()
+    for partial in output_dir.glob(".part-*.tmp"):
+        partial.unlink()
+    (output_dir / SUCCESS_FILENAME).unlink(missing_ok=True)
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return {int(path.stem.split("-")[1]) for path in output_dir.glob("part-*.parquet")}
+
+
+def _count_chunks(source: Path, chunk_rows: int) -> int | None:
+    if source.suffix != ".parquet":
+        return None
+    return -(-pq.ParquetFile(source).metadata.num_rows // chunk_rows)
+
+
+def load_model_threshold(path: Path) -> float:
+    """Read a pickled business threshold, stored as a float or ``{"threshold": x}``."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(
+            f"No business threshold at {path}: pass --threshold or --threshold-path"
+        )
+    value = joblib.load(path)
+    if isinstance(value, dict):
+        value = value["threshold"]
+    return float(value)
+
+
+def score_portfolio(
+    input_path: Path,
+    output_dir: Path,
+    model_path: Path = MODEL_PATH,
+    preprocessor_path: Path | None = None,
+    threshold: float | None = None,
+    threshold_path: Path = THRESHOLD_PATH,
+    chunk_rows: int = 50_000,
+    n_jobs: int | None = None,
+    top_k: int = 0,
+    explain_model_path: Path | None = None,
+    passthrough: Sequence[str] = ("client_id",),
+    overwrite: bool = False,
+) -> BatchScoreSummary:
+    """Score ``input_path`` into partitioned Parquet under ``output_dir``.
+
+    See the module docstring for the layout and the resume rules.
+    """
+    input_path, output_dir = Path(input_path), Path(output_dir)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if threshold is None:
+        threshold = load_model_threshold(threshold_path)
+    threshold = float(threshold)
+    stat = input_path.stat()
+    manifest = {
+        "input": str(input_path.resolve()),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "model": _path_digest(model_path),
+        "preprocessor": _path_digest(preprocessor_path),
+        "explain_model": _path_digest(explain_model_path) if top_k else None,
+        "threshold": threshold,
+        "chunk_rows": chunk_rows,
+        "top_k": top_k,
+        "passthrough": list(passthrough),
+    }
+    done = _prepare_output(output_dir, manifest, overwrite)
+    settings = {
+        "model_path": Path(model_path),
+        "preprocessor_path": preprocessor_path,
+        "explain_model_path": explain_model_path,
+        "threshold": threshold,
+        "top_k": top_k,
+        "passthrough": list(passthrough),
+        "output_dir": output_dir,
+    }
+    total = _count_chunks(input_path, chunk_rows)
+    summary = BatchScoreSummary()
+    started = time.perf_counter()
+
+    def report(n_rows: int) -> None:
+        summary.rows += n_rows
+        summary.chunks += 1
+        summary.seconds = time.perf_counter() - started
+        progress = (
+            f"{summary.chunks + summary.skipped_chunks}/{total}"
+            if total
+            else str(summary.chunks)
+        )
+        print(
+            f"[{progress}] {summary.rows} rows scored, "
+            f"{summary.rows_per_second:,.0f} rows/s",
+            flush=True,
+        )
+
+    chunks = (
+        (index, frame)
+        for index, frame in enumerate(iter_input_chunks(input_path, chunk_rows))
+    )
+    if n_jobs == 1:
+        _init_worker(settings)
+        for index, frame in chunks:
+            if index in done:
+                summary.skipped_chunks += 1
+                continue
+            report(_score_chunk(index, frame))
+    else:
+        in_flight: deque = deque()
+        with ProcessPoolExecutor(
+            n_jobs, initializer=_init_worker, initargs=(settings,)
+        ) as pool:
+            for index, frame in chunks:
+                if index in done:
+                    summary.skipped_chunks += 1
+                    continue
+                in_flight.append(pool.submit(_score_chunk, index, frame))
+                if len(in_flight) >= 2 * n_jobs:
+                    report(in_flight.popleft().result())
+            while in_flight:
+                report(in_flight.popleft().result())
+    summary.seconds = time.perf_counter() - started
+    (output_dir / SUCCESS_FILENAME).write_text(json.dumps(summary.as_dict(), indent=2))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Score a Parquet/CSV portfolio into partitioned Parquet files."
+    )
+    parser.add_argument("input_path", type=Path)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument(
+        "--model",
+        type=Path,
+        default=MODEL_PATH,
+        help="Pickled model, .npz or forest directory.",
+    )
+    parser.add_argument(
+        "--preprocessor",
+        type=Path,
+        default=None,
+        help="Apply it to raw joined_clients columns.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="Overrides the threshold read from --threshold-path.",
+    )
+    parser.add_argument(
+        "--threshold-path",
+        type=Path,
+        default=THRESHOLD_PATH,
+        help="Pickled business threshold of --model (default: %(default)s).",
+    )
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=0,
+        help="Add the k strongest SHAP reasons per client.",
+    )
+    parser.add_argument(
+        "--explain-model",
+        type=Path,
+        default=None,
+        help="Pickled tree model for a compiled --model.",
+    )
+    parser.add_argument("--passthrough", nargs="*", default=["client_id"])
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Discard parts left by a run with other settings.",
+    )
+    args = parser.parse_args()
+    result = score_portfolio(
+        args.input_path,
+        args.output_dir,
+        model_path=args.model,
+        preprocessor_path=args.preprocessor,
+        threshold=args.threshold,
+        threshold_path=args.threshold_path,
+        chunk_rows=args.chunk_rows,
+        n_jobs=args.jobs,
+        top_k=args.top_k,
+        explain_model_path=args.explain_model,
+        passthrough=args.passthrough,
+        overwrite=args.overwrite,
+    )
+    print(
+        f"Scored {result.rows} rows in {result.seconds:.1f}s "
+        f"({result.rows_per_second:,.0f} rows/s) to {args.output_dir}",
+    )
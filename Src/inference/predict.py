@@ -1,18 +1,111 @@
 from __future__ import annotations
 
 import json
+import os
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 
-import mlflow
 import numpy as np
 
-THRESHOLD_PATH = Path(__file__).resolve().parents[2] / "artifacts" / "models" / "threshold.json"
+from Src.inference.tree_engine import CompiledForest
 
+THRESHOLD_PATH = (
+    Path(__file__).resolve().parents[2] / "artifacts" / "models" / "threshold.json"
+)
+MODEL_NAME = "credit_scoring_model"
+# Seconds a cached model is trusted before the registry is asked for the current
+# version again.
+MODEL_CACHE_TTL = float(os.getenv("MODEL_CACHE_TTL", "300"))
 
-def load_model(stage: str = "Production"):
-    model_uri = f"models:/credit_scoring_model/{stage}"
-    return mlflow.pyfunc.load_model(model_uri)
+
+@dataclass
+class _CacheEntry:
+    model: Any
+    version: str
+    checked_at: float
+
+
+class ModelCache:
+    """Thread-safe cache of loaded models keyed by stage (or compiled file).
+
+    Within ``ttl`` seconds a hit costs a dict lookup. After that the current
+    version is resolved again (a registry call, not a download) and the model
+    is only reloaded when that version changed, e.g. after a new Production
+    promotion. If the registry cannot be reached the cached model keeps serving.
+    """
+
+    def __init__(self, ttl: float = MODEL_CACHE_TTL) -> None:
+        self.ttl = ttl
+        self._entries: dict[str, _CacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self, key: str, resolve_version: Callable[[], str], load: Callable[[str], Any]
+    ) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.checked_at < self.ttl:
+            return entry.model
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and now - entry.checked_at < self.ttl:
+                return entry.model
+            try:
+                version = resolve_version()
+            except Exception:  # noqa: BLE001
+                if entry is None:
+                    raise
+                entry.checked_at = now
+                return entry.model
+            if entry is None or entry.version != version:
+                entry = _CacheEntry(
+                    model=load(version), version=version, checked_at=now
+                )
+                self._entries[key] = entry
+            entry.checked_at = now
+            return entry.model
+
+    def version(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        return entry.version if entry else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_model_cache = ModelCache()
+
+
+def registry_version(stage: str, model_name: str = MODEL_NAME) -> str:
+    from mlflow.tracking import MlflowClient
+
+    versions = MlflowClient().get_latest_versions(model_name, stages=[stage])
+    if not versions:
+        raise LookupError(f"No version of {model_name} in stage {stage}")
+    return str(max(int(version.version) for version in versions))
+
+
+def load_model(stage: str = "Production", compiled_path: Path | None = None):
+    if compiled_path is not None:
+        # NumPy-only engine exported by tree_engine.py: no MLflow/LightGBM import.
+        compiled_path = Path(compiled_path)
+        return _model_cache.get(
+            f"compiled:{compiled_path.resolve()}",
+            lambda: str(compiled_path.stat().st_mtime_ns),
+            lambda _: CompiledForest.load(compiled_path),
+        )
+
+    def load_version(version: str):
+        import mlflow
+
+        # Pin the resolved version: a promotion racing the download cannot mix versions.
+        return mlflow.pyfunc.load_model(f"models:/{MODEL_NAME}/{version}")
+
+    return _model_cache.get(stage, lambda: registry_version(stage), load_version)
 
 
 def load_threshold(default: float = 0.5) -> float:
@@ -21,13 +114,34 @@ def load_threshold(default: float = 0.5) -> float:
     return default
 
 
-def predict_proba(features: np.ndarray, stage: str = "Production") -> Dict[str, Any]:
-    model = load_model(stage=stage)
+def positive_proba(model, features: np.ndarray) -> np.ndarray:
+    if hasattr(model, "predict_proba"):
+        return model.predict_proba(features)[:, 1]
+    return np.asarray(model.predict(features), dtype=float)
+
+
+def predict_proba_batch(
+    features: np.ndarray,
+    stage: str = "Production",
+    compiled_path: Path | None = None,
+) -> Dict[str, Any]:
+    """Score every row: ``probability`` and ``decision`` align with ``features``."""
+    model = load_model(stage=stage, compiled_path=compiled_path)
     threshold = load_threshold()
-    proba = model.predict(features)
-    decision = (proba >= threshold).astype(int)
+    proba = np.asarray(positive_proba(model, np.atleast_2d(features)), dtype=float)
     return {
-        "probability": float(proba[0]),
-        "decision": int(decision[0]),
+        "probability": proba,
+        "decision": (proba >= threshold).astype(int),
         "threshold": threshold,
     }
+
+
+def predict_proba(
+    features: np.ndarray, stage: str = "Production", compiled_path: Path | None = None
+) -> Dict[str, Any]:
+    scores = predict_proba_batch(features, stage=stage, compiled_path=compiled_path)
+    return {
+        "probability": float(scores["probability"][0]),
+        "decision": int(scores["decision"][0]),
+        "threshold": scores["threshold"],
+    }
@@ -0,0 +1,307 @@
+"""Pure-NumPy scoring engine for LightGBM binary classifiers.
+
+``export_model`` flattens every tree of a fitted LightGBM model into packed
+arrays; :class:`CompiledForest` scores a batch by advancing all (row, tree)
+pairs one level at a time, so the Python loop runs ``max_depth`` times per
+chunk regardless of the number of rows or trees. Serving only needs NumPy.
+
+A forest is saved either as one ``.npz`` archive or, for multi-worker
+serving, as a directory of ``.npy`` files plus ``metadata.json``. The
+directory form is opened with ``mmap_mode="r"``: every worker maps the same
+read-only pages from the OS page cache instead of holding its own copy.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+# LightGBM treats |x| <= kZeroThreshold as zero for missing_type == "Zero".
+_ZERO_THRESHOLD = 1e-35
+ARRAY_FIELDS = (
+    "roots",
+    "feature",
+    "threshold",
+    "left",
+    "right",
+    "value",
+    "default_left",
+    "missing_type",
+)
+METADATA_FILENAME = "metadata.json"
+
+
+@dataclass(frozen=True)
+class CompiledForest:
+    """Packed tree ensemble; leaves point to themselves so extra steps are no-ops."""
+
+    roots: np.ndarray  # int32 (n_trees,)
+    feature: np.ndarray  # int32 (n_nodes,), 0 for leaves
+    threshold: np.ndarray  # float64 (n_nodes,)
+    left: np.ndarray  # int32 (n_nodes,)
+    right: np.ndarray  # int32 (n_nodes,)
+    value: np.ndarray  # float64 (n_nodes,), leaf output, 0 for internal nodes
+    default_left: np.ndarray  # bool (n_nodes,)
+    missing_type: np.ndarray  # uint8 (n_nodes,)
+    max_depth: int
+    n_features: int
+    feature_names: list[str]
+    sigmoid: float = 1.0
+
+    @property
+    def n_features_in_(self) -> int:
+        return self.n_features
+
+    @property
+    def feature_name_(self) -> list[str]:
+        return self.feature_names
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        has_missing_branches = bool(self.missing_type.any())
+        if not has_missing_branches:
+            # Every split is missing_type None: NaN simply compares as 0.0.
+            X = np.where(np.isnan(X), 0.0, X)
+        flat = X.ravel()
+        offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            values = flat[offsets + self.feature[nodes]]
+            if has_missing_branches:
+                go_left = self._missing_aware_left(nodes, values)
+            else:
+                go_left = values <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def _missing_aware_left(self, nodes: np.ndarray, values: np.ndarray) -> np.ndarray:
+        missing_type = self.missing_type[nodes]
+        is_nan = np.isnan(values)
+        # Outside missing_type == NaN, LightGBM maps NaN to 0.0 before comparing.
+        values = np.where(is_nan & (missing_type != MISSING_NAN), 0.0, values)
+        is_missing = (
+            (missing_type == MISSING_ZERO) & (np.abs(values) <= _ZERO_THRESHOLD)
+        ) | ((missing_type == MISSING_NAN) & is_nan)
+        return np.where(
+            is_missing, self.default_left[nodes], values <= self.threshold[nodes]
+        )
+
+    def predict_raw(self, X: np.ndarray, chunk_rows: int = 256) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(
+                f"Expected a (n, {self.n_features}) matrix, got shape {X.shape}"
+            )
+        raw = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_rows):
+            chunk = X[start : start + chunk_rows]
+            raw[start : start + len(chunk)] = self.value[self._leaves(chunk)].sum(
+                axis=1
+            )
+        return raw
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """``(n, 2)`` class probabilities, like ``LGBMClassifier.predict_proba``."""
+        positive = 1.0 / (1.0 + np.exp(-self.sigmoid * self.predict_raw(X)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+    def metadata(self) -> dict[str, Any]:
+        return {
+            "max_depth": self.max_depth,
+            "n_features": self.n_features,
+            "feature_names": self.feature_names,
+            "sigmoid": self.sigmoid,
+        }
+
+    def save(self, path: Path) -> None:
+        """Write a ``.npz`` archive, or a memory-mappable directory for other paths."""
+        path = Path(path)
+        if path.suffix == ".npz":
+            arrays = {name: getattr(self, name) for name in ARRAY_FIELDS}
+            np.savez(path, metadata=np.array(json.dumps(self.metadata())), **arrays)
+            return
+        # Built next to the target and swapped in whole, so a serving worker
+        # never maps a half-written forest.
+        tmp_dir = path.with_name(f".{path.name}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        for name in ARRAY_FIELDS:
+            np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        (tmp_dir / METADATA_FILENAME).write_text(json.dumps(self.metadata()))
+        if path.exists():
+            stale = path.with_name(f".{path.name}.old")
+            shutil.rmtree(stale, ignore_errors=True)
+            os.replace(path, stale)
+            os.replace(tmp_dir, path)
+            shutil.rmtree(stale, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "CompiledForest":
+        """Load a ``.npz`` archive into memory, or map a saved directory read-only."""
+        path = Path(path)
+        if path.is_dir():
+            metadata = json.loads((path / METADATA_FILENAME).read_text())
+            # Plain ndarray views over the maps: same pages, no np.memmap overhead.
+            arrays = {
+                name: np.asarray(np.load(path / f"{name}.npy", mmap_mode="r"))
+                for name in ARRAY_FIELDS
+            }
+            return cls(**arrays, **metadata)
+        with np.load(path, allow_pickle=False) as archive:
+            metadata = json.loads(str(archive["metadata"]))
+            arrays = {name: archive[name] for name in ARRAY_FIELDS}
+        return cls(**arrays, **metadata)
+
+
+def _parse_sigmoid(objective: str) -> float:
+    name, *options = objective.split()
+    if name not in {"binary", "cross_entropy"}:
+        raise NotImplementedError(
+            f"Only binary objectives are supported, got {objective!r}"
+        )
+    for option in options:
+        key, _, value = option.partition(":")
+        if key == "sigmoid":
+            return float(value)
+    return 1.0
+
+
+def compile_booster(booster) -> CompiledForest:
+    """Flatten a ``lightgbm.Booster`` into a :class:`CompiledForest`."""
+    dump = booster.dump_model()
+    if dump.get("num_tree_per_iteration", 1) != 1:
+        raise NotImplementedError("Multiclass models are not supported")
+    feature, threshold, left, right, value, default_left, missing_type = (
+        [] for _ in range(7)
+    )
+    roots: list[int] = []
+    max_depth = 0
+
+    def add(node: dict, depth: int) -> int:
+        nonlocal max_depth
+        index = len(feature)
+        for column in (
+            feature,
+            threshold,
+            left,
+            right,
+            value,
+            default_left,
+            missing_type,
+        ):
+            column.append(None)
+        if "split_index" not in node:
+            max_depth = max(max_depth, depth)
+            feature[index], threshold[index], value[index] = 0, 0.0, node["leaf_value"]
+            left[index] = right[index] = index
+            default_left[index], missing_type[index] = True, MISSING_NONE
+            return index
+        if node["decision_type"] != "<=":
+            raise NotImplementedError(
+                "Categorical splits are not supported by the NumPy engine"
+            )
+        feature[index], threshold[index], value[index] = (
+            node["split_feature"],
+            node["threshold"],
+            0.0,
+        )
+        default_left[index] = node["default_left"]
+        missing_type[index] = _MISSING_TYPES[node["missing_type"]]
+        left[index] = add(node["left_child"], depth + 1)
+        right[index] = add(node["right_child"], depth + 1)
+        return index
+
+    for tree in dump["tree_info"]:
+        roots.append(add(tree["tree_structure"], 0))
+
+    return CompiledForest(
+        roots=np.asarray(roots, dtype=np.int32),
+        feature=np.asarray(feature, dtype=np.int32),
+        threshold=np.asarray(threshold, dtype=np.float64),
+        left=np.asarray(left, dtype=np.int32),
+        right=np.asarray(right, dtype=np.int32),
+        value=np.asarray(value, dtype=np.float64),
+        default_left=np.asarray(default_left, dtype=bool),
+        missing_type=np.asarray(missing_type, dtype=np.uint8),
+        max_depth=max_depth,
+        n_features=dump["max_feature_idx"] + 1,
+        feature_names=list(dump["feature_names"]),
+        sigmoid=_parse_sigmoid(dump["objective"]),
+    )
+
+
+def compile_model(model) -> CompiledForest:
+    booster = getattr(model, "booster_", model)
+    if not hasattr(booster, "dump_model"):
+        raise TypeError(f"Expected a LightGBM model, got {type(model).__name__}")
+    return compile_booster(booster)
+
+
+def verify(model, forest: CompiledForest, X: np.ndarray, atol: float = 1e-10) -> float:
+    """Compare against ``model.predict_proba`` and return the max absolute gap."""
+    expected = model.predict_proba(X)[:, 1]
+    gap = (
+        float(np.max(np.abs(forest.predict_proba(X)[:, 1] - expected)))
+        if len(X)
+        else 0.0
+    )
+    if gap > atol:
+        raise AssertionError(
+            f"Compiled forest deviates from LightGBM by {gap:.3e} (> {atol:.0e})"
+        )
+    return gap
+
+
+def export_model(
+    model_path: Path, output_path: Path, n_check: int = 1000, seed: int = 0
+) -> CompiledForest:
+    import joblib
+
+    model = joblib.load(model_path)
+    forest = compile_model(model)
+    rng = np.random.default_rng(seed)
+    X_check = rng.normal(size=(n_check, forest.n_features))
+    X_check[rng.random(X_check.shape) < 0.05] = np.nan
+    gap = verify(model, forest, X_check)
+    forest.save(output_path)
+    print(
+        f"Exported {forest.n_trees} trees ({len(forest.feature)} nodes, "
+        f"depth {forest.max_depth}) to {output_path}; max |proba gap| = {gap:.2e}",
+    )
+    return forest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compile a LightGBM model into NumPy arrays."
+    )
+    parser.add_argument(
+        "model_path", type=Path, nargs="?", default=Path("models/lgbm_model_final.pkl")
+    )
+    parser.add_argument(
+        "output_path",
+        type=Path,
+        nargs="?",
+        default=Path("models/lgbm_model_final.npz"),
+        help="A .npz archive, or a directory of .npy files memory-mapped "
+        "by every API worker.",
+    )
+    args = parser.parse_args()
+    export_model(args.model_path, args.output_path)
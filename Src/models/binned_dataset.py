@@ -0,0 +1,185 @@
+"""Bin the training features once and reuse them across folds, candidates and runs.
+
+``LGBMClassifier.fit`` re-bins its input on every call, so a search over
+``k`` candidates with ``n`` folds bins ``X_train`` ``k * n`` times.
+:class:`BinnedLGBMSearch` builds a LightGBM ``Dataset`` once, saves it as a
+binary file named after a content hash of the feature files, and runs
+``lgb.cv`` for every candidate on that Dataset: folds are subsets sharing the
+same bins. A later run on unchanged features loads the binary file directly;
+new features produce a new hash and the stale file is removed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+import lightgbm as lgb
+import numpy as np
+from lightgbm import LGBMClassifier
+from sklearn.model_selection import ParameterGrid
+from sklearn.preprocessing import LabelEncoder
+
+BINNED_DIR = Path(__file__).resolve().parents[2] / "artifacts" / "binned"
+# Parameters fixed at Dataset construction; they are part of the cache key and
+# must not vary between candidates.
+DATASET_PARAMS = {
+    "max_bin": 255,
+    "min_data_in_bin": 3,
+    "bin_construct_sample_cnt": 200_000,
+}
+
+
+def features_digest(paths: Iterable[Path], extra: Dict[str, Any] | None = None) -> str:
+    """SHA-256 of the files' contents (and of ``extra``), stable across runs."""
+    digest = hashlib.sha256(json.dumps(extra or {}, sort_keys=True).encode())
+    for path in sorted(Path(p) for p in paths):
+        digest.update(path.name.encode())
+        with path.open("rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def load_or_build_dataset(
+    X, y, sample_weight, cache_key: str | None, cache_dir: Path = BINNED_DIR
+) -> lgb.Dataset:
+    """Constructed training Dataset, reused from ``<cache_dir>/<cache_key>.bin``."""
+    params = {**DATASET_PARAMS, "feature_pre_filter": False, "verbose": -1}
+    cache_path = cache_dir / f"{cache_key}.bin" if cache_key else None
+    if cache_path is not None and cache_path.exists():
+        print(f"Reusing binned training data {cache_path.name}")
+        return lgb.Dataset(str(cache_path), params=params).construct()
+    dataset = lgb.Dataset(
+        X, label=y, weight=sample_weight, params=params, free_raw_data=True
+    ).construct()
+    if cache_path is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for stale in cache_dir.glob("*.bin"):
+            stale.unlink()
+        dataset.save_binary(str(cache_path))
+    return dataset
+
+
+def classifier_from_booster(
+    booster: lgb.Booster, params: Dict[str, Any], y
+) -> LGBMClassifier:
+    """An ``LGBMClassifier`` wrapping ``booster`` as if ``fit`` had trained it.
+
+    Sets the fitted state that ``LGBMClassifier.fit`` leaves behind (private
+    attributes of the pinned lightgbm, compared with a real ``fit`` in
+    ``tests/test_model_training.py``), so ``predict_proba``, ``booster_``,
+    ``feature_name_``, TreeSHAP, the compiled engine and pickling see an
+    ordinary classifier.
+    """
+    model = LGBMClassifier(**params)
+    model._le = LabelEncoder().fit(y)
+    model._classes = model._le.classes_
+    model._class_map = dict(zip(model._classes, model._le.transform(model._classes)))
+    model._n_classes = len(model._classes)
+    model._objective = "binary"
+    model._n_features = model._n_features_in = booster.num_feature()
+    model._Booster = booster
+    model._evals_result = {}
+    model._best_iteration = booster.best_iteration
+    model._best_score = booster.best_score
+    model.fitted_ = True
+    return model
+
+
+class BinnedLGBMSearch:
+    """Grid search over LightGBM parameters with ``lgb.cv`` on one cached Dataset.
+
+    Mirrors the attributes of the sklearn searches that ``train()`` relies on
+    (``best_params_``, ``best_estimator_``, ``cv_results_``, ``n_splits_``).
+    Each candidate trains up to its ``n_estimators`` with early stopping on the
+    fold AUC; the best one is refit once with ``lgb.train`` on the same
+    Dataset, so with the bins used in cross-validation, for the number of
+    rounds that early stopping selected.
+    """
+
+    def __init__(
+        self,
+        param_grid: Dict[str, list],
+        estimator_params: Dict[str, Any] | None = None,
+        cv: int = 3,
+        early_stopping_rounds: int = 50,
+        cache_key: str | None = None,
+        cache_dir: Path = BINNED_DIR,
+    ) -> None:
+        self.param_grid = param_grid
+        # Folds run one after the other, so LightGBM gets every thread.
+        self.estimator_params = {
+            k: v for k, v in (estimator_params or {}).items() if k != "n_jobs"
+        }
+        self.cv = cv
+        self.early_stopping_rounds = early_stopping_rounds
+        self.cache_key = cache_key
+        self.cache_dir = cache_dir
+
+    @property
+    def n_splits_(self) -> int:
+        return self.cv
+
+    def fit(self, X, y, sample_weight=None) -> "BinnedLGBMSearch":
+        dataset = load_or_build_dataset(
+            X, y, sample_weight, self.cache_key, self.cache_dir
+        )
+        base = {
+            "objective": "binary",
+            "metric": "auc",
+            "random_state": 42,
+            "verbose": -1,
+            **self.estimator_params,
+        }
+        results: Dict[str, list] = {
+            "params": [],
+            "mean_fit_time": [],
+            "mean_score_time": [],
+            "mean_test_score": [],
+        }
+        best_rounds = []
+        for candidate in ParameterGrid(self.param_grid):
+            params = {**base, **candidate}
+            num_boost_round = int(params.pop("n_estimators", 100))
+            started = time.perf_counter()
+            history = lgb.cv(
+                params,
+                dataset,
+                num_boost_round=num_boost_round,
+                nfold=self.cv,
+                stratified=True,
+                seed=42,
+                callbacks=[
+                    lgb.early_stopping(self.early_stopping_rounds, verbose=False)
+                ],
+            )
+            elapsed = time.perf_counter() - started
+            scores = history["valid auc-mean"]
+            results["params"].append(candidate)
+            results["mean_fit_time"].append(elapsed / self.cv)
+            results["mean_score_time"].append(0.0)
+            results["mean_test_score"].append(float(np.max(scores)))
+            best_rounds.append(int(np.argmax(scores)) + 1)
+        self.cv_results_ = {
+            key: values if key == "params" else np.asarray(values)
+            for key, values in results.items()
+        }
+        best = int(np.argmax(self.cv_results_["mean_test_score"]))
+        self.best_index_ = best
+        self.best_score_ = float(self.cv_results_["mean_test_score"][best])
+        self.best_params_ = {
+            **results["params"][best],
+            "n_estimators": best_rounds[best],
+        }
+        params = {**base, **self.best_params_}
+        booster = lgb.train(
+            {k: v for k, v in params.items() if k != "n_estimators"},
+            dataset,
+            num_boost_round=best_rounds[best],
+        )
+        self.best_estimator_ = classifier_from_booster(booster, params, y)
+        return self
@@ -4,21 +4,86 @@ import numpy as np
 from sklearn.metrics import confusion_matrix
 
 
-def business_cost_score(y_true, y_pred, fn_cost: float = 10.0, fp_cost: float = 1.0) -> float:
-    tn, fp, fn, tp = confusion_matrix(y_true, y_pred).ravel()
+def business_cost_score(
+    y_true, y_pred, fn_cost: float = 10.0, fp_cost: float = 1.0, sample_weight=None
+) -> float:
+    tn, fp, fn, tp = confusion_matrix(
+        y_true, y_pred, labels=[0, 1], sample_weight=sample_weight
+    ).ravel()
     total_cost = fn * fn_cost + fp * fp_cost
     max_cost = (fn + tp) * fn_cost + (fp + tn) * fp_cost
     return 1 - total_cost / max_cost
 
 
-def optimal_threshold(y_true, y_proba, grid=None):
-    if grid is None:
-        grid = np.linspace(0.05, 0.95, 50)
-    best_threshold, best_score = 0.5, -np.inf
-    for thr in grid:
-        preds = (y_proba >= thr).astype(int)
-        score = business_cost_score(y_true, preds)
-        if score > best_score:
-            best_score = score
-            best_threshold = thr
-    return best_threshold, best_score
+def cost_curve(
+    y_true,
+    y_proba,
+    thresholds=None,
+    sample_weight=None,
+    fn_cost: float = 10.0,
+    fp_cost: float = 1.0,
+) -> dict[str, np.ndarray]:
+    """Business cost of ``y_proba >= t`` for every candidate threshold ``t``.
+
+    Scores are sorted once; the weighted positives/negatives at or above each
+    threshold come from suffix sums, so the sweep is O(n log n) whatever the
+    number of candidates. Without ``thresholds`` every unique score is tried.
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    y_proba = np.asarray(y_proba, dtype=float)
+    weights = (
+        np.ones_like(y_proba)
+        if sample_weight is None
+        else np.asarray(sample_weight, dtype=float)
+    )
+    order = np.argsort(y_proba, kind="mergesort")
+    sorted_proba = y_proba[order]
+    positive = np.where(y_true[order], weights[order], 0.0)
+    negative = weights[order] - positive
+    # suffix[i] = weighted count among sorted_proba[i:], with suffix[n] = 0.
+    positive_above = np.concatenate([np.cumsum(positive[::-1])[::-1], [0.0]])
+    negative_above = np.concatenate([np.cumsum(negative[::-1])[::-1], [0.0]])
+
+    if thresholds is None:
+        thresholds = np.unique(sorted_proba)
+    thresholds = np.asarray(thresholds, dtype=float)
+    first_selected = np.searchsorted(sorted_proba, thresholds, side="left")
+    tp = positive_above[first_selected]
+    fp = negative_above[first_selected]
+    fn = positive_above[0] - tp
+    tn = negative_above[0] - fp
+    cost = fn * fn_cost + fp * fp_cost
+    max_cost = positive_above[0] * fn_cost + negative_above[0] * fp_cost
+    return {
+        "threshold": thresholds,
+        "tp": tp,
+        "fp": fp,
+        "fn": fn,
+        "tn": tn,
+        "cost": cost,
+        "score": 1 - cost / max_cost,
+    }
+
+
+def optimal_threshold(
+    y_true,
+    y_proba,
+    grid=None,
+    sample_weight=None,
+    fn_cost: float = 10.0,
+    fp_cost: float = 1.0,
+):
+    """Threshold maximising ``business_cost_score``; the first candidate wins ties.
+
+    ``grid=None`` performs an exact sweep over all unique scores.
+    """
+    curve = cost_curve(
+        y_true,
+        y_proba,
+        grid,
+        sample_weight=sample_weight,
+        fn_cost=fn_cost,
+        fp_cost=fp_cost,
+    )
+    best = int(np.argmax(curve["score"]))
+    return float(curve["threshold"][best]), float(curve["score"][best])
@@ -0,0 +1,211 @@
+"""Training-time SHAP stage: sampled by score band, parallel, off the critical path.
+
+Rows are sampled evenly across score bands so the rare high-risk clients are
+explained as well as the bulk, TreeSHAP runs on chunks across a process pool
+(each worker loads the saved model and builds its explainer once), and the
+results are persisted for the API and the dashboard:
+
+- ``shap_values.npy``: SHAP matrix of the sampled rows (positive class);
+- ``shap_sample.npy``: the sampled feature rows, usable as ``SHAP_BACKGROUND_PATH``;
+- ``global_importance.csv``: mean absolute SHAP per feature, sorted;
+- ``shap_meta.json``: base value, feature names, row indices and scores;
+- ``shap_summary.png``: the beeswarm summary plot.
+
+:func:`start_explainability` runs the whole stage in a background thread and
+returns a future, so ``train()`` keeps saving and registering the model
+meanwhile.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+_worker_explainer = None
+# The stage runs from a background thread while train() keeps working; forking
+# a multi-threaded process can copy held locks, so workers are spawned.
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def stratified_sample(
+    proba: np.ndarray, n_samples: int, n_bands: int = 5, seed: int = 42
+) -> np.ndarray:
+    """Sorted row indices, ``n_samples / n_bands`` from each score quantile band.
+
+    Bands smaller than their share are taken whole and the remainder is spread
+    over the other bands, so exactly ``min(n_samples, len(proba))`` rows come back.
+    """
+    n_samples = min(n_samples, len(proba))
+    rng = np.random.default_rng(seed)
+    order = np.argsort(proba, kind="stable")
+    bands = [band for band in np.array_split(order, n_bands) if len(band)]
+    quotas = np.zeros(len(bands), dtype=int)
+    remaining = n_samples
+    open_bands = list(range(len(bands)))
+    while remaining and open_bands:
+        share = max(remaining // len(open_bands), 1)
+        for band in list(open_bands):
+            take = min(share, len(bands[band]) - quotas[band], remaining)
+            quotas[band] += take
+            remaining -= take
+            if quotas[band] == len(bands[band]):
+                open_bands.remove(band)
+            if not remaining:
+                break
+    picked = [
+        rng.choice(band, size=quota, replace=False)
+        for band, quota in zip(bands, quotas)
+        if quota
+    ]
+    return np.sort(np.concatenate(picked)) if picked else np.empty(0, dtype=int)
+
+
+def _positive_class(values, n_rows: int) -> np.ndarray:
+    if isinstance(values, list):
+        # LightGBM binary models return [class 0, class 1]; keep the positive class.
+        values = values[-1]
+    values = np.asarray(values)
+    if values.ndim == 3:
+        values = values[..., -1]
+    return values.reshape(n_rows, -1)
+
+
+def _init_worker(model_path: Path) -> None:
+    import shap
+
+    global _worker_explainer
+    _worker_explainer = shap.TreeExplainer(joblib.load(model_path))
+
+
+def _explain_chunk(X: np.ndarray) -> np.ndarray:
+    return _positive_class(_worker_explainer.shap_values(X), len(X))
+
+
+def _expected_value() -> float:
+    return float(np.ravel(_worker_explainer.expected_value)[-1])
+
+
+def _render_summary(
+    shap_values: np.ndarray, X: np.ndarray, feature_names: Sequence[str], path: Path
+) -> None:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import shap
+
+    shap.summary_plot(shap_values, X, feature_names=list(feature_names), show=False)
+    plt.tight_layout()
+    plt.savefig(path, dpi=200)
+    plt.close("all")
+
+
+def compute_shap(
+    model_path: Path,
+    X: np.ndarray,
+    n_jobs: int | None = None,
+    chunk_rows: int = 256,
+) -> tuple[np.ndarray, float]:
+    """SHAP values of ``X`` for the model saved at ``model_path`` and its base value."""
+    n_jobs = n_jobs or os.cpu_count() or 1
+    chunks = [X[start : start + chunk_rows] for start in range(0, len(X), chunk_rows)]
+    if n_jobs == 1:
+        _init_worker(model_path)
+        values = [_explain_chunk(chunk) for chunk in chunks]
+        return np.vstack(values), _expected_value()
+    with ProcessPoolExecutor(
+        n_jobs, _MP_CONTEXT, initializer=_init_worker, initargs=(model_path,)
+    ) as pool:
+        base_value = pool.submit(_expected_value)
+        values = list(pool.map(_explain_chunk, chunks))
+        return np.vstack(values), base_value.result()
+
+
+def global_importance(
+    shap_values: np.ndarray, feature_names: Sequence[str]
+) -> pd.DataFrame:
+    importance = np.abs(shap_values).mean(axis=0)
+    return pd.DataFrame(
+        {"feature": list(feature_names), "mean_abs_shap": importance}
+    ).sort_values("mean_abs_shap", ascending=False, ignore_index=True)
+
+
+def run_explainability(
+    model_path: Path,
+    X,
+    proba: np.ndarray,
+    feature_names: Sequence[str] | None,
+    output_dir: Path,
+    settings: Dict[str, Any],
+) -> Dict[str, Path]:
+    """Sample, explain and write the artifacts listed in the module docstring."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    indices = stratified_sample(
+        proba, settings["n_samples"], settings["n_bands"], settings["seed"]
+    )
+    X_sample = X[indices]
+    X_sample = (
+        X_sample.toarray()
+        if sparse.issparse(X_sample)
+        else np.asarray(X_sample, dtype=np.float64)
+    )
+    feature_names = (
+        list(feature_names)
+        if feature_names is not None
+        else [f"f{i}" for i in range(X.shape[1])]
+    )
+    shap_values, base_value = compute_shap(
+        model_path, X_sample, settings["n_jobs"], settings["chunk_rows"]
+    )
+
+    paths = {
+        "shap_values": output_dir / "shap_values.npy",
+        "shap_sample": output_dir / "shap_sample.npy",
+        "global_importance": output_dir / "global_importance.csv",
+        "meta": output_dir / "shap_meta.json",
+    }
+    np.save(paths["shap_values"], shap_values.astype(np.float32))
+    np.save(paths["shap_sample"], X_sample)
+    global_importance(shap_values, feature_names).to_csv(
+        paths["global_importance"], index=False
+    )
+    paths["meta"].write_text(
+        json.dumps(
+            {
+                "base_value": base_value,
+                "feature_names": feature_names,
+                "row_indices": indices.tolist(),
+                "scores": np.asarray(proba)[indices].tolist(),
+                "n_bands": settings["n_bands"],
+            },
+        ),
+    )
+    if settings["summary_plot"]:
+        paths["summary_plot"] = output_dir / "shap_summary.png"
+        # Own process: pyplot is not thread-safe and the plot holds the GIL for seconds.
+        with ProcessPoolExecutor(1, _MP_CONTEXT) as pool:
+            pool.submit(
+                _render_summary,
+                shap_values,
+                X_sample,
+                feature_names,
+                paths["summary_plot"],
+            ).result()
+    return paths
+
+
+def start_explainability(*args, **kwargs) -> Future:
+    """Run :func:`run_explainability` in a background thread and return its future."""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explainability")
+    future = executor.submit(run_explainability, *args, **kwargs)
+    executor.shutdown(wait=False)
+    return future
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import yaml
+
+PARAMS_PATH = Path(__file__).resolve().parents[2] / "configs" / "params.yaml"
+
+
+def load_params(path: Path = PARAMS_PATH) -> Dict[str, Any]:
+    return yaml.safe_load(Path(path).read_text()) or {}
+
+
+def scoring_params(params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """Costs and threshold candidates from the ``scoring`` section.
+
+    ``threshold_search: exact`` (the default) tries every unique score;
+    ``grid`` uses ``threshold_grid: [start, stop, step]``.
+    """
+    scoring = (params if params is not None else load_params()).get("scoring", {})
+    grid = None
+    if scoring.get("threshold_search", "exact") == "grid":
+        start, stop, step = scoring["threshold_grid"]
+        grid = np.arange(start, stop + step / 2, step)
+    return {
+        "fn_cost": float(scoring.get("fn_cost", 10.0)),
+        "fp_cost": float(scoring.get("fp_cost", 1.0)),
+        "grid": grid,
+    }
+
+
+def modeling_params(params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """Estimator, search strategy and search space from the ``modeling`` section.
+
+    ``search_space`` is keyed by algorithm so switching ``algorithm`` never
+    feeds one estimator the hyperparameters of another. The former flat
+    layout (hyperparameter lists directly under ``search_space``) raises
+    ``ValueError`` instead of silently searching an empty grid.
+    """
+    modeling = (params if params is not None else load_params()).get("modeling", {})
+    algorithm = modeling.get("algorithm", "GradientBoostingClassifier")
+    search_space = modeling.get("search_space") or {}
+    flat_keys = sorted(
+        key for key, value in search_space.items() if not isinstance(value, dict)
+    )
+    if algorithm not in search_space and flat_keys:
+        raise ValueError(
+            f"search_space has no entry for {algorithm} but flat keys {flat_keys}: "
+            f"nest them under search_space.{algorithm} in configs/params.yaml"
+        )
+    return {
+        "algorithm": algorithm,
+        "search": modeling.get("search", "grid"),
+        "cv_folds": int(modeling.get("cv_folds", 3)),
+        "halving_factor": float(modeling.get("halving_factor", 3)),
+        "early_stopping_rounds": int(modeling.get("early_stopping_rounds", 50)),
+        "estimator_params": dict(
+            (modeling.get("estimator_params") or {}).get(algorithm, {})
+        ),
+        "search_space": dict(search_space.get(algorithm, {})),
+    }
+
+
+def explainability_params(params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """Settings of the training-time SHAP stage (``explainability`` section)."""
+    explainability = (params if params is not None else load_params()).get(
+        "explainability", {}
+    )
+    n_jobs = explainability.get("n_jobs")
+    return {
+        "enabled": bool(explainability.get("enabled", True)),
+        "background": bool(explainability.get("background", True)),
+        "n_samples": int(explainability.get("n_samples", 2000)),
+        "n_bands": int(explainability.get("n_bands", 5)),
+        "chunk_rows": int(explainability.get("chunk_rows", 256)),
+        "n_jobs": int(n_jobs) if n_jobs is not None else None,
+        "summary_plot": bool(explainability.get("summary_plot", True)),
+        "seed": int(explainability.get("seed", 42)),
+    }
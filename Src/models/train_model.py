@@ -1,69 +1,195 @@
 from __future__ import annotations
 
 import json
+import time
 from pathlib import Path
+from typing import Any, Dict
 
 import joblib
 import mlflow
-from mlflow import sklearn as mlflow_sklearn
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import GradientBoostingClassifier
+from lightgbm import LGBMClassifier
+from mlflow import sklearn as mlflow_sklearn
+from scipy import sparse
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
 from sklearn.metrics import classification_report, roc_auc_score
-from sklearn.model_selection import GridSearchCV
-import shap
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV
 
-from Src.models.custom_score import business_cost_score, optimal_threshold
+from Src.features.feature_engineering import FEATURE_NAMES_FILENAME
+from Src.models.binned_dataset import DATASET_PARAMS, BinnedLGBMSearch, features_digest
+from Src.models.custom_score import business_cost_score, cost_curve, optimal_threshold
+from Src.models.explainability import start_explainability
+from Src.models.params import explainability_params, modeling_params, scoring_params
 
 ARTIFACT_DIR = Path(__file__).resolve().parents[2] / "artifacts"
 FEATURES_DIR = ARTIFACT_DIR / "features"
 MODELS_DIR = ARTIFACT_DIR / "models"
 PLOTS_DIR = ARTIFACT_DIR / "plots"
+EXPLAIN_DIR = ARTIFACT_DIR / "explainability"
 MODELS_DIR.mkdir(parents=True, exist_ok=True)
 PLOTS_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def load_matrix(split: str) -> tuple[np.ndarray, np.ndarray]:
-    X = pd.read_parquet(FEATURES_DIR / f"X_{split}.parquet").values
+# Rows scored per model call when evaluating, so predictions never need a stacked copy.
+PREDICT_CHUNK_ROWS = 100_000
+
+
+def load_matrix(split: str) -> tuple[np.ndarray | sparse.csr_matrix, np.ndarray]:
+    """Load a split without copying more than needed.
+
+    ``X_<split>.npy`` (float32, written with ``--npy``) is memory-mapped
+    read-only, so pages are read on demand and shared with the search workers;
+    sparse features (``X_<split>.npz``) stay CSR, never densified.
+    """
+    npy_path = FEATURES_DIR / f"X_{split}.npy"
+    npz_path = FEATURES_DIR / f"X_{split}.npz"
+    if npy_path.exists():
+        X = np.load(npy_path, mmap_mode="r")
+    elif npz_path.exists():
+        X = sparse.load_npz(npz_path).tocsr()
+    else:
+        X = pd.read_parquet(FEATURES_DIR / f"X_{split}.parquet").to_numpy()
     y = pd.read_parquet(FEATURES_DIR / f"y_{split}.parquet")["target"].values
     return X, y
 
 
+def predict_positive(
+    model, *matrices, chunk_rows: int = PREDICT_CHUNK_ROWS
+) -> np.ndarray:
+    """Positive-class probabilities of the rows of ``matrices``, scored in blocks."""
+    blocks = [
+        model.predict_proba(X[start : start + chunk_rows])[:, 1]
+        for X in matrices
+        for start in range(0, X.shape[0], chunk_rows)
+    ]
+    return np.concatenate(blocks) if blocks else np.empty(0)
+
+
+def train_feature_files() -> list[Path]:
+    """Files the training split is read from; their hash keys the binned-data cache."""
+    names = [
+        "X_train.npy",
+        "X_train.npz",
+        "X_train.parquet",
+        "y_train.parquet",
+        "sample_weights_train.parquet",
+    ]
+    return [FEATURES_DIR / name for name in names if (FEATURES_DIR / name).exists()]
+
+
 def load_sample_weights() -> np.ndarray:
     weights_path = FEATURES_DIR / "sample_weights_train.parquet"
     if not weights_path.exists():
-        raise FileNotFoundError("Sample weights missing. Run feature engineering first.")
+        raise FileNotFoundError(
+            "Sample weights missing. Run feature engineering first."
+        )
     return pd.read_parquet(weights_path)["sample_weight"].values
 
 
-def build_estimator() -> GridSearchCV:
-    estimator = GradientBoostingClassifier(random_state=42)
-    param_grid = {
-        "n_estimators": [100, 200],
-        "learning_rate": [0.05, 0.1],
-        "max_depth": [3, 4],
+ESTIMATORS = {
+    "GradientBoostingClassifier": GradientBoostingClassifier,
+    "HistGradientBoostingClassifier": HistGradientBoostingClassifier,
+    "LGBMClassifier": LGBMClassifier,
+}
+# Prefix of the MLflow run name and of the saved model file.
+MODEL_SLUGS = {
+    "GradientBoostingClassifier": "gradient_boosting",
+    "HistGradientBoostingClassifier": "hist_gradient_boosting",
+    "LGBMClassifier": "lightgbm",
+}
+
+
+def build_estimator(
+    modeling: Dict[str, Any] | None = None,
+    cache_key: str | None = None,
+) -> GridSearchCV | HalvingGridSearchCV | BinnedLGBMSearch:
+    """Search configured by the ``modeling`` section of ``configs/params.yaml``.
+
+    ``search: halving`` runs successive halving: every candidate is scored on a
+    small sample and only the best ``1 / halving_factor`` go on with more rows.
+    ``search: lgb_cv`` bins the training data once (cached under ``cache_key``)
+    and cross-validates every candidate on it.
+    """
+    modeling = modeling if modeling is not None else modeling_params()
+    algorithm = modeling["algorithm"]
+    if algorithm not in ESTIMATORS:
+        raise ValueError(
+            f"Unknown algorithm {algorithm!r}; expected one of {sorted(ESTIMATORS)}"
+        )
+    if modeling["search"] == "lgb_cv":
+        if algorithm != "LGBMClassifier":
+            raise ValueError("search 'lgb_cv' needs algorithm 'LGBMClassifier'")
+        return BinnedLGBMSearch(
+            modeling["search_space"],
+            modeling["estimator_params"],
+            cv=modeling["cv_folds"],
+            early_stopping_rounds=modeling["early_stopping_rounds"],
+            cache_key=cache_key,
+        )
+    estimator_params = {"random_state": 42, **modeling["estimator_params"]}
+    if algorithm == "LGBMClassifier":
+        estimator_params.setdefault("verbose", -1)
+    estimator = ESTIMATORS[algorithm](**estimator_params)
+    common = {
+        "estimator": estimator,
+        "param_grid": modeling["search_space"],
+        "scoring": "roc_auc",
+        "cv": modeling["cv_folds"],
+        "n_jobs": -1,
+        "verbose": 2,
     }
-    search = GridSearchCV(
-        estimator=estimator,
-        param_grid=param_grid,
-        scoring="roc_auc",
-        cv=3,
-        n_jobs=-1,
-        verbose=2,
-    )
-    return search
+    if modeling["search"] == "halving":
+        return HalvingGridSearchCV(
+            factor=modeling["halving_factor"], random_state=42, **common
+        )
+    if modeling["search"] != "grid":
+        raise ValueError(
+            f"Unknown search {modeling['search']!r}; "
+            "expected 'grid', 'halving' or 'lgb_cv'"
+        )
+    return GridSearchCV(**common)
+
+
+def serving_estimator(search, estimator_params: Dict[str, Any]) -> Any:
+    """``search.best_estimator_`` with the search-only ``n_jobs`` reset to its default.
+
+    ``estimator_params`` pins ``n_jobs`` so parallel candidates and folds do not
+    oversubscribe the cores; the saved model must not keep scoring on one thread.
+    """
+    model = search.best_estimator_
+    if "n_jobs" in estimator_params and "n_jobs" in model.get_params():
+        model.set_params(n_jobs=type(model)().get_params()["n_jobs"])
+    return model
 
 
-def log_shap_values(model, X_sample) -> None:
-    explainer = shap.TreeExplainer(model)
-    shap_values = explainer.shap_values(X_sample[:200])
-    shap.summary_plot(shap_values, X_sample[:200], show=False)
-    shap_path = PLOTS_DIR / "shap_summary.png"
-    import matplotlib.pyplot as plt
+def search_timings(search, total_seconds: float) -> Dict[str, Any]:
+    """Wall-clock per evaluated configuration (all folds) and for the whole search."""
+    results = search.cv_results_
+    n_splits = search.n_splits_
+    configs = []
+    for index, params in enumerate(results["params"]):
+        entry = {
+            "params": params,
+            "fit_seconds": float(results["mean_fit_time"][index] * n_splits),
+            "score_seconds": float(results["mean_score_time"][index] * n_splits),
+            "mean_test_score": float(results["mean_test_score"][index]),
+        }
+        if "n_resources" in results:
+            entry["iteration"] = int(results["iter"][index])
+            entry["n_resources"] = int(results["n_resources"][index])
+        configs.append(entry)
+    return {
+        "total_seconds": total_seconds,
+        "n_candidates_evaluated": len(configs),
+        "configs": configs,
+    }
+
 
-    plt.tight_layout()
-    plt.savefig(shap_path, dpi=200)
-    mlflow.log_artifact(shap_path, artifact_path="explainability")
+def load_feature_names() -> list[str] | None:
+    names_path = FEATURES_DIR / FEATURE_NAMES_FILENAME
+    return json.loads(names_path.read_text()) if names_path.exists() else None
 
 
 def train() -> None:
@@ -76,16 +202,59 @@ def train() -> None:
     X_test, y_test = load_matrix("test")
     sample_weights = load_sample_weights()
 
-    search = build_estimator()
+    modeling = modeling_params()
+    is_hist = modeling["algorithm"] == "HistGradientBoostingClassifier"
+    if is_hist and sparse.issparse(X_train):
+        raise ValueError(
+            "HistGradientBoostingClassifier needs dense features; "
+            "use LGBMClassifier with --sparse."
+        )
+    cache_key = None
+    if modeling["search"] == "lgb_cv":
+        cache_key = features_digest(train_feature_files(), extra=DATASET_PARAMS)[:16]
+    search = build_estimator(modeling, cache_key=cache_key)
+    scoring = scoring_params()
+    costs = {"fn_cost": scoring["fn_cost"], "fp_cost": scoring["fp_cost"]}
+    slug = MODEL_SLUGS[modeling["algorithm"]]
+    search_label = {"grid": "gridsearch"}.get(modeling["search"], modeling["search"])
 
-    with mlflow.start_run(run_name="gradient_boosting_gridsearch"):
+    with mlflow.start_run(run_name=f"{slug}_{search_label}"):
+        started = time.perf_counter()
         search.fit(X_train, y_train, sample_weight=sample_weights)
-        best_model = search.best_estimator_
+        timings = search_timings(search, time.perf_counter() - started)
+        best_model = serving_estimator(search, modeling["estimator_params"])
+        mlflow.set_tags(
+            {"algorithm": modeling["algorithm"], "search": modeling["search"]}
+        )
+        if cache_key is not None:
+            mlflow.set_tag("binned_features_key", cache_key)
         mlflow.log_params(search.best_params_)
+        mlflow.log_metric("search_seconds", timings["total_seconds"])
+        mlflow.log_metric(
+            "search_candidates_evaluated", timings["n_candidates_evaluated"]
+        )
+        mlflow.log_dict(timings, "reports/search_timings.json")
+        slowest = sorted(timings["configs"], key=lambda item: -item["fit_seconds"])
+        for entry in slowest[:5]:
+            print(
+                f"{entry['fit_seconds']:8.1f}s  "
+                f"auc={entry['mean_test_score']:.4f}  {entry['params']}"
+            )
+        print(
+            f"Search took {timings['total_seconds']:.1f}s "
+            f"over {timings['n_candidates_evaluated']} configurations"
+        )
 
-        valid_proba = best_model.predict_proba(X_valid)[:, 1]
+        valid_proba = predict_positive(best_model, X_valid)
         valid_auc = roc_auc_score(y_valid, valid_proba)
-        threshold, cost_score = optimal_threshold(y_valid, valid_proba)
+        threshold, cost_score = optimal_threshold(
+            y_valid, valid_proba, grid=scoring["grid"], **costs
+        )
+        curve = cost_curve(y_valid, valid_proba, scoring["grid"], **costs)
+        mlflow.log_dict(
+            {key: values.tolist() for key, values in curve.items()},
+            "reports/valid_cost_curve.json",
+        )
         mlflow.log_metric("valid_auc", valid_auc)
         mlflow.log_metric("optimal_threshold", threshold)
         mlflow.log_metric("business_cost_score", cost_score)
@@ -94,10 +263,22 @@ def train() -> None:
         report = classification_report(y_valid, y_valid_pred, output_dict=True)
         mlflow.log_dict(report, "reports/valid_classification_report.json")
 
-        log_shap_values(best_model, X_valid)
-
-        model_path = MODELS_DIR / "gradient_boosting.joblib"
+        model_path = MODELS_DIR / f"{slug}.joblib"
         joblib.dump(best_model, model_path)
+        explain_settings = explainability_params()
+        explanation = None
+        if explain_settings["enabled"]:
+            # Workers load the saved model while registration and holdout scoring go on.
+            explanation = start_explainability(
+                model_path,
+                X_valid,
+                valid_proba,
+                load_feature_names(),
+                EXPLAIN_DIR,
+                explain_settings,
+            )
+            if not explain_settings["background"]:
+                explanation.result()
         mlflow_sklearn.log_model(
             sk_model=best_model,
             artifact_path="model",
@@ -109,14 +290,24 @@ def train() -> None:
         threshold_path.write_text(json.dumps(threshold_data))
         mlflow.log_text(json.dumps(threshold_data), "serving/threshold.json")
 
-        X_eval = np.vstack([X_valid, X_test])
+        # valid + test scored in place: no stacked copy, and valid is not scored twice.
         y_eval = np.concatenate([y_valid, y_test])
-        test_proba = best_model.predict_proba(X_eval)[:, 1]
+        test_proba = np.concatenate([valid_proba, predict_positive(best_model, X_test)])
         test_auc = roc_auc_score(y_eval, test_proba)
         mlflow.log_metric("holdout_auc", test_auc)
 
         predictions = (test_proba >= threshold).astype(int)
-        mlflow.log_metric("business_cost_holdout", business_cost_score(y_eval, predictions))
+        mlflow.log_metric(
+            "business_cost_holdout", business_cost_score(y_eval, predictions, **costs)
+        )
+
+        if explanation is not None:
+            waited = time.perf_counter()
+            explanation.result()
+            mlflow.log_metric(
+                "explainability_wait_seconds", time.perf_counter() - waited
+            )
+            mlflow.log_artifacts(str(EXPLAIN_DIR), artifact_path="explainability")
 
         print(f"Model saved to {model_path} and registered in MLflow.")
 
@@ -0,0 +1,252 @@
+"""Incremental drift detection from reference sketches.
+
+The reference data is summarised once into a :class:`ReferenceSketch`:
+quantile bin edges and counts for numeric columns, top-category counts for
+the others, each with a bucket for missing values. A :class:`DriftMonitor`
+then bins production batches as they arrive, only adding to per-feature
+count vectors, so memory does not grow with traffic and
+:meth:`DriftMonitor.compute_drift` compares two small histograms per feature
+(PSI, binned Kolmogorov-Smirnov and Jensen-Shannon distance) in milliseconds.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+import numpy as np
+import pandas as pd
+from scipy.spatial.distance import jensenshannon
+
+OTHER = "__other__"
+# Added to every bin proportion so PSI stays finite on empty bins.
+EPSILON = 1e-4
+# Common PSI reading: < 0.1 stable, 0.1-0.2 moderate, > 0.2 significant shift.
+PSI_THRESHOLD = 0.2
+
+
+@dataclass
+class FeatureSketch:
+    """Reference histogram of one column; the last bin always counts missing values."""
+
+    name: str
+    kind: str
+    counts: np.ndarray
+    edges: np.ndarray | None = None
+    categories: list[str] | None = None
+    _lookup: dict[str, int] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.categories is not None:
+            self._lookup = {value: index for index, value in enumerate(self.categories)}
+
+    def bin(self, values) -> np.ndarray:
+        """Counts of ``values`` in this sketch's bins."""
+        n_bins = len(self.counts)
+        if self.kind == "numeric":
+            values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(
+                dtype=float
+            )
+            missing = np.isnan(values)
+            indices = np.searchsorted(self.edges, values, side="right")
+            indices[missing] = n_bins - 1
+        else:
+            series = pd.Series(values, dtype=object)
+            missing = series.isna().to_numpy()
+            other = self._lookup[OTHER]
+            indices = np.fromiter(
+                (self._lookup.get(str(value), other) for value in series),
+                dtype=np.int64,
+                count=len(series),
+            )
+            indices[missing] = n_bins - 1
+        return np.bincount(indices, minlength=n_bins)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "counts": self.counts.tolist(),
+            "edges": self.edges.tolist() if self.edges is not None else None,
+            "categories": self.categories,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "FeatureSketch":
+        edges = payload.get("edges")
+        return cls(
+            name=payload["name"],
+            kind=payload["kind"],
+            counts=np.asarray(payload["counts"], dtype=np.int64),
+            edges=np.asarray(edges, dtype=float) if edges is not None else None,
+            categories=payload.get("categories"),
+        )
+
+
+def sketch_column(
+    name: str, values: pd.Series, n_bins: int = 10, max_categories: int = 50
+) -> FeatureSketch:
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        present = values.dropna().to_numpy(dtype=float)
+        quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+        edges = (
+            np.unique(np.quantile(present, quantiles)) if len(present) else np.empty(0)
+        )
+        # Bins: (-inf, e0), [e0, e1), ..., [e_last, inf), missing.
+        sketch = FeatureSketch(
+            name, "numeric", np.zeros(len(edges) + 2, dtype=np.int64), edges=edges
+        )
+    else:
+        top = values.dropna().astype(str).value_counts().index[:max_categories].tolist()
+        sketch = FeatureSketch(
+            name,
+            "categorical",
+            np.zeros(len(top) + 2, dtype=np.int64),
+            categories=[*top, OTHER],
+        )
+    sketch.counts = sketch.bin(values)
+    return sketch
+
+
+@dataclass
+class ReferenceSketch:
+    features: list[FeatureSketch]
+    n_rows: int
+    # Resolved path, size and mtime of the file the sketch was built from.
+    source: Dict[str, Any] | None = None
+
+    @classmethod
+    def from_frame(
+        cls, frame: pd.DataFrame, n_bins: int = 10, max_categories: int = 50
+    ) -> "ReferenceSketch":
+        features = [
+            sketch_column(str(column), frame[column], n_bins, max_categories)
+            for column in frame.columns
+        ]
+        return cls(features=features, n_rows=len(frame))
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "n_rows": self.n_rows,
+            "features": [feature.to_dict() for feature in self.features],
+            "source": self.source,
+        }
+        path.write_text(json.dumps(payload))
+
+    @classmethod
+    def load(cls, path: Path) -> "ReferenceSketch":
+        payload = json.loads(Path(path).read_text())
+        return cls(
+            features=[FeatureSketch.from_dict(item) for item in payload["features"]],
+            n_rows=payload["n_rows"],
+            source=payload.get("source"),
+        )
+
+
+def _proportions(counts: np.ndarray) -> np.ndarray:
+    total = counts.sum()
+    proportions = counts / total if total else np.zeros(len(counts))
+    return (proportions + EPSILON) / (1 + EPSILON * len(counts))
+
+
+def compare_histograms(
+    reference: np.ndarray, production: np.ndarray
+) -> Dict[str, float]:
+    """PSI, KS statistic on the binned CDFs and Jensen-Shannon distance (base 2)."""
+    expected, actual = _proportions(reference), _proportions(production)
+    return {
+        "psi": float(np.sum((actual - expected) * np.log(actual / expected))),
+        "ks": float(np.max(np.abs(np.cumsum(actual) - np.cumsum(expected)))),
+        "js": float(jensenshannon(expected, actual, base=2)),
+    }
+
+
+class DriftMonitor:
+    """Production histograms aligned with a reference sketch, updated batch by batch.
+
+    ``update`` is thread-safe, so request handlers and a background reader can
+    feed the same monitor.
+    """
+
+    def __init__(self, reference: ReferenceSketch) -> None:
+        self.reference = reference
+        self._counts = [np.zeros_like(feature.counts) for feature in reference.features]
+        self.n_rows = 0
+        self._lock = threading.Lock()
+
+    def update(self, batch) -> None:
+        """Add a batch of production rows.
+
+        ``batch`` is a DataFrame holding the reference columns, or a 2-D array
+        with the reference columns in order.
+
+        Extra DataFrame columns are ignored; a missing reference column raises
+        ``ValueError`` rather than counting as 100 % missing values.
+        """
+        if isinstance(batch, pd.DataFrame):
+            missing = [
+                feature.name
+                for feature in self.reference.features
+                if feature.name not in batch
+            ]
+            if missing:
+                raise ValueError(
+                    f"Production batch lacks {len(missing)} of the "
+                    f"{len(self.reference.features)} reference columns, "
+                    f"e.g. {missing[:5]}; got columns {list(batch.columns)[:5]}..."
+                )
+            columns = [batch[feature.name] for feature in self.reference.features]
+            n_rows = len(batch)
+        else:
+            array = np.atleast_2d(np.asarray(batch))
+            if array.shape[1] != len(self.reference.features):
+                raise ValueError(
+                    f"Production batch has {array.shape[1]} columns, "
+                    f"the reference has {len(self.reference.features)}"
+                )
+            columns = [array[:, index] for index in range(array.shape[1])]
+            n_rows = len(array)
+        increments = [
+            feature.bin(values)
+            for feature, values in zip(self.reference.features, columns)
+        ]
+        with self._lock:
+            for counts, increment in zip(self._counts, increments):
+                counts += increment
+            self.n_rows += n_rows
+
+    def update_many(self, batches: Iterable) -> "DriftMonitor":
+        for batch in batches:
+            self.update(batch)
+        return self
+
+    def reset(self) -> None:
+        with self._lock:
+            for counts in self._counts:
+                counts[:] = 0
+            self.n_rows = 0
+
+    def compute_drift(self, psi_threshold: float = PSI_THRESHOLD) -> Dict[str, Any]:
+        """Per-feature statistics and the share of features with PSI >= threshold."""
+        with self._lock:
+            production = [counts.copy() for counts in self._counts]
+            n_rows = self.n_rows
+        features = {}
+        for sketch, counts in zip(self.reference.features, production):
+            stats = compare_histograms(sketch.counts, counts)
+            stats["drifted"] = bool(stats["psi"] >= psi_threshold)
+            features[sketch.name] = stats
+        n_drifted = sum(stats["drifted"] for stats in features.values())
+        return {
+            "drift_share": n_drifted / len(features) if features and n_rows else 0.0,
+            "n_drifted": n_drifted,
+            "n_features": len(features),
+            "n_production_rows": n_rows,
+            "n_reference_rows": self.reference.n_rows,
+            "psi_threshold": psi_threshold,
+            "features": features,
+        }
@@ -1,24 +1,35 @@
 from __future__ import annotations
 
+import argparse
 import json
 from pathlib import Path
-from typing import Tuple
+from typing import Iterator, Tuple
 
 import pandas as pd
-from evidently.metric_preset import DataDriftPreset, TargetDriftPreset
-from evidently.report import Report
+import pyarrow.parquet as pq
+
+from Src.models.params import load_params
+from Src.monitoring.drift_engine import PSI_THRESHOLD, DriftMonitor, ReferenceSketch
 
 REPORT_DIR = Path(__file__).resolve().parents[2] / "Monitoring" / "reports"
 REPORT_DIR.mkdir(parents=True, exist_ok=True)
+SKETCH_PATH = REPORT_DIR.parent / "reference_sketch.json"
+BATCH_ROWS = 100_000
 
 
-def load_datasets(reference_path: Path, production_path: Path) -> Tuple[pd.DataFrame, pd.DataFrame]:
+def load_datasets(
+    reference_path: Path, production_path: Path
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
     reference = pd.read_parquet(reference_path)
     production = pd.read_parquet(production_path)
     return reference, production
 
 
 def build_report(reference: pd.DataFrame, production: pd.DataFrame) -> dict:
+    """Full Evidently report (HTML + JSON), kept as an optional deep-dive."""
+    from evidently.metric_preset import DataDriftPreset, TargetDriftPreset
+    from evidently.report import Report
+
     report = Report(metrics=[DataDriftPreset(), TargetDriftPreset()])
     report.run(reference_data=reference, current_data=production)
     html_path = REPORT_DIR / "data_drift_report.html"
@@ -30,22 +41,116 @@ def build_report(reference: pd.DataFrame, production: pd.DataFrame) -> dict:
     return report_json
 
 
+def reference_source(reference_path: Path) -> dict:
+    """Identity of a reference file: resolved path, size and mtime."""
+    reference_path = Path(reference_path).resolve()
+    stat = reference_path.stat()
+    return {
+        "path": str(reference_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def load_or_build_reference(
+    reference_path: Path, sketch_path: Path | None = None
+) -> ReferenceSketch:
+    """Reference sketch, rebuilt unless the saved one was built from this exact file."""
+    sketch_path = sketch_path or SKETCH_PATH
+    source = reference_source(reference_path)
+    if sketch_path.exists():
+        sketch = ReferenceSketch.load(sketch_path)
+        if sketch.source == source:
+            return sketch
+    sketch = ReferenceSketch.from_frame(pd.read_parquet(reference_path))
+    sketch.source = source
+    sketch.save(sketch_path)
+    print(f"Reference sketch saved to {sketch_path}")
+    return sketch
+
+
+def iter_parquet_batches(
+    path: Path, batch_rows: int = BATCH_ROWS
+) -> Iterator[pd.DataFrame]:
+    """Stream a Parquet file, or all Parquet files under a directory, in record batches.
+
+    Directories are searched recursively, so the API's prediction log
+    (``date=YYYY-MM-DD/part-*.parquet``) can be passed as ``--production``.
+    """
+    path = Path(path)
+    files = sorted(path.rglob("*.parquet")) if path.is_dir() else [path]
+    for file in files:
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=batch_rows):
+            yield batch.to_pandas()
+
+
+def compute_drift_report(
+    reference_path: Path,
+    production_path: Path,
+    psi_threshold: float = PSI_THRESHOLD,
+    sketch_path: Path | None = None,
+) -> dict:
+    monitor = DriftMonitor(load_or_build_reference(reference_path, sketch_path))
+    monitor.update_many(iter_parquet_batches(production_path))
+    report_json = monitor.compute_drift(psi_threshold)
+    summary_path = REPORT_DIR / "drift_summary.json"
+    summary_path.write_text(json.dumps(report_json, indent=2))
+    print(f"Drift summary saved to {summary_path}")
+    return report_json
+
+
 def alert_if_needed(report_json: dict, threshold: float = 0.3) -> None:
-    drift_share = report_json["metrics"][0]["result"]["drift_share"]
+    """Alert on the drift share of a drift-engine summary or of an Evidently report."""
+    if "drift_share" in report_json:
+        drift_share = report_json["drift_share"]
+    else:
+        drift_share = report_json["metrics"][0]["result"]["drift_share"]
     if drift_share >= threshold:
         print(f"ALERT: drift share {drift_share:.2f} >= {threshold}")
+        features = report_json.get("features", {})
+        worst = sorted(features.items(), key=lambda item: -item[1]["psi"])[:5]
+        for name, stats in worst:
+            print(
+                f"  {name}: PSI={stats['psi']:.3f} "
+                f"KS={stats['ks']:.3f} JS={stats['js']:.3f}"
+            )
         # Integrate webhook (Slack/Teams/Email) here.
     else:
         print(f"Drift share {drift_share:.2f} within acceptable range")
 
 
-def run_monitoring(reference_path: Path, production_path: Path) -> None:
-    reference, production = load_datasets(reference_path, production_path)
-    report_json = build_report(reference, production)
-    alert_if_needed(report_json)
+def run_monitoring(
+    reference_path: Path,
+    production_path: Path,
+    evidently: bool = False,
+    sketch_path: Path | None = None,
+) -> None:
+    settings = load_params().get("monitoring", {})
+    report_json = compute_drift_report(
+        reference_path,
+        production_path,
+        psi_threshold=float(settings.get("psi_threshold", PSI_THRESHOLD)),
+        sketch_path=sketch_path,
+    )
+    alert_if_needed(report_json, threshold=float(settings.get("drift_threshold", 0.3)))
+    if evidently:
+        build_report(*load_datasets(reference_path, production_path))
 
 
 if __name__ == "__main__":
-    REF = Path("artifacts/features/X_valid.parquet")
-    PROD = Path("artifacts/features/X_test.parquet")
-    run_monitoring(REF, PROD)
+    parser = argparse.ArgumentParser(
+        description="Compare production data with the reference sketch."
+    )
+    parser.add_argument(
+        "--reference", type=Path, default=Path("artifacts/features/X_valid.parquet")
+    )
+    parser.add_argument(
+        "--production", type=Path, default=Path("artifacts/features/X_test.parquet")
+    )
+    parser.add_argument(
+        "--evidently",
+        action="store_true",
+        help="Also build the full Evidently HTML report.",
+    )
+    args = parser.parse_args()
+    run_monitoring(args.reference, args.production, evidently=args.evidently)
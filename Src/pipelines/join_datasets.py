@@ -1,12 +1,29 @@
 from __future__ import annotations
 
+import argparse
+import json
+import os
 from pathlib import Path
+from typing import Iterable
 
+import numpy as np
 import pandas as pd
 
 DATA_DIR = Path(__file__).resolve().parents[2] / "data" / "samples"
 OUTPUT_DIR = Path(__file__).resolve().parents[2] / "data"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+JOINED_FILENAME = "joined_clients.parquet"
+CSV_FILENAME = "joined_clients.csv"
+PARQUET_COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 100_000
+# Mode incrémental : nouveaux fichiers de transactions, état persistant, sortie
+# partitionnée.
+INCOMING_DIRNAME = "incoming"
+STATE_DIRNAME = "state"
+PARTITIONED_DIRNAME = "joined_clients"
+N_PARTITIONS = 64
+CLIENTS_FILENAME = "clients_sample.csv"
+PRODUCTS_FILENAME = "products_sample.csv"
 
 
 def load_sources() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
@@ -34,7 +51,9 @@ def aggregate_transactions(transactions: pd.DataFrame) -> pd.DataFrame:
     )
 
 
-def engineer_product_mix(transactions: pd.DataFrame, products: pd.DataFrame) -> pd.DataFrame:
+def engineer_product_mix(
+    transactions: pd.DataFrame, products: pd.DataFrame
+) -> pd.DataFrame:
     """Joint les produits pour exposer les taux d'intérêt et la catégorie."""
     merged = transactions.merge(products, on="product_id", how="left")
     pivot = (
@@ -48,26 +67,399 @@ def engineer_product_mix(transactions: pd.DataFrame, products: pd.DataFrame) ->
         .add_prefix("spent_")
         .reset_index()
     )
-    interest = merged.groupby("client_id")["interest_rate"].mean().reset_index(name="avg_interest_rate")
-    tenor = merged.groupby("client_id")["tenor_months"].max().reset_index(name="max_tenor")
-    return pivot.merge(interest, on="client_id", how="left").merge(tenor, on="client_id", how="left")
+    interest = (
+        merged.groupby("client_id")["interest_rate"]
+        .mean()
+        .reset_index(name="avg_interest_rate")
+    )
+    tenor = (
+        merged.groupby("client_id")["tenor_months"].max().reset_index(name="max_tenor")
+    )
+    return pivot.merge(interest, on="client_id", how="left").merge(
+        tenor, on="client_id", how="left"
+    )
+
+
+# Agrégats partiels combinables : somme, min ou max colonne par colonne.
+PARTIAL_AGGREGATIONS = {
+    "n_transactions": "sum",
+    "total_spent": "sum",
+    "n_amounts": "sum",
+    "days_since_last": "min",
+    "n_categorized": "sum",
+    "interest_sum": "sum",
+    "n_interest": "sum",
+    "max_tenor": "max",
+}
+
+
+def partial_aggregates(
+    transactions: pd.DataFrame, products: pd.DataFrame
+) -> pd.DataFrame:
+    """Agrégats combinables d'un bloc de transactions, indexés par client_id."""
+    merged = transactions.merge(products, on="product_id", how="left")
+    grouped = merged.groupby("client_id")
+    partial = grouped.agg(
+        n_transactions=("transaction_id", "count"),
+        total_spent=("amount", "sum"),
+        n_amounts=("amount", "count"),
+        days_since_last=("days_since", "min"),
+        n_categorized=("category", "count"),
+        interest_sum=("interest_rate", "sum"),
+        n_interest=("interest_rate", "count"),
+        max_tenor=("tenor_months", "max"),
+    )
+    spent = merged.pivot_table(
+        index="client_id", columns="category", values="amount", aggfunc="sum"
+    )
+    return partial.join(spent.add_prefix("spent_"))
+
+
+def merge_partials(partials: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Fusionne des agrégats partiels (blocs ou partitions) en un état par client."""
+    stacked = pd.concat(list(partials))
+    aggregations = {
+        column: PARTIAL_AGGREGATIONS.get(column, "sum") for column in stacked.columns
+    }
+    return stacked.groupby(level=0).agg(aggregations).sort_index()
+
+
+def finalize_aggregates(state: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Reconstruit les sorties d'aggregate_transactions et engineer_product_mix.
+
+    Les deux tables sont dérivées de l'état fusionné par ``merge_partials``.
+    """
+    state = state.rename_axis("client_id")
+    tx_summary = pd.DataFrame(
+        {
+            "n_transactions": state["n_transactions"],
+            "total_spent": state["total_spent"],
+            "avg_ticket": state["total_spent"]
+            / state["n_amounts"].where(state["n_amounts"] > 0),
+            "days_since_last": state["days_since_last"],
+        },
+    ).reset_index()
+    spent_columns = sorted(
+        column for column in state.columns if column.startswith("spent_")
+    )
+    categorized = state[state["n_categorized"] > 0]
+    # Même dtype que pivot_table(fill_value=0.0) : celui des montants (total_spent).
+    product_mix = (
+        categorized[spent_columns].fillna(0.0).astype(state["total_spent"].dtype)
+    )
+    product_mix.columns.name = "category"
+    product_mix = product_mix.assign(
+        avg_interest_rate=categorized["interest_sum"]
+        / categorized["n_interest"].where(categorized["n_interest"] > 0),
+        max_tenor=categorized["max_tenor"],
+    ).reset_index()
+    return tx_summary, product_mix
+
 
+def stream_transaction_aggregates(
+    transactions_path: Path,
+    products: pd.DataFrame,
+    chunksize: int,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Agrège un fichier de transactions par blocs de ``chunksize`` lignes.
 
-def assemble_dataset() -> pd.DataFrame:
-    """Pipeline d'assemblage complet + sauvegarde CSV."""
-    clients, transactions, products = load_sources()
-    tx_summary = aggregate_transactions(transactions)
-    product_mix = engineer_product_mix(transactions, products)
-    dataset = (
+    Les états partiels sont fusionnés au fil de l'eau : la mémoire dépend du
+    nombre de clients, pas du nombre de transactions.
+    """
+    state = None
+    n_rows = 0
+    for chunk in pd.read_csv(transactions_path, chunksize=chunksize):
+        partial = partial_aggregates(chunk, products)
+        state = partial if state is None else merge_partials([state, partial])
+        n_rows += len(chunk)
+    if state is None:
+        state = partial_aggregates(pd.read_csv(transactions_path, nrows=0), products)
+    print(f"Streamed {n_rows} transactions in chunks of {chunksize}")
+    return finalize_aggregates(state)
+
+
+def join_client_features(
+    clients: pd.DataFrame, tx_summary: pd.DataFrame, product_mix: pd.DataFrame
+) -> pd.DataFrame:
+    return (
         clients.merge(tx_summary, on="client_id", how="left")
         .merge(product_mix, on="client_id", how="left")
-        .fillna({"n_transactions": 0, "total_spent": 0, "avg_ticket": 0, "days_since_last": 999})
+        .fillna(
+            {
+                "n_transactions": 0,
+                "total_spent": 0,
+                "avg_ticket": 0,
+                "days_since_last": 999,
+            }
+        )
+    )
+
+
+def save_joined_dataset(dataset: pd.DataFrame, export_csv: bool = False) -> Path:
+    """Écrit le jeu joint en Parquet typé et compressé, découpé en row groups.
+
+    Les row groups permettent aux lecteurs de ne charger que les colonnes et
+    blocs utiles ; l'export CSV reste disponible pour les outils externes.
+    """
+    output_path = OUTPUT_DIR / JOINED_FILENAME
+    dataset.to_parquet(
+        output_path,
+        index=False,
+        compression=PARQUET_COMPRESSION,
+        row_group_size=ROW_GROUP_SIZE,
     )
-    output_path = OUTPUT_DIR / "joined_clients.csv"
-    dataset.to_csv(output_path, index=False)
     print(f"Saved dataset to {output_path}")
+    if export_csv:
+        csv_path = OUTPUT_DIR / CSV_FILENAME
+        dataset.to_csv(csv_path, index=False)
+        print(f"Exported CSV copy to {csv_path}")
+    return output_path
+
+
+def assemble_dataset(
+    chunksize: int | None = None, export_csv: bool = False
+) -> pd.DataFrame:
+    """Pipeline d'assemblage complet + sauvegarde Parquet (CSV en option).
+
+    Avec ``chunksize``, les transactions sont lues et agrégées par blocs
+    (même résultat que le mode en mémoire).
+    """
+    if chunksize is None:
+        clients, transactions, products = load_sources()
+        tx_summary = aggregate_transactions(transactions)
+        product_mix = engineer_product_mix(transactions, products)
+    else:
+        clients = pd.read_csv(DATA_DIR / "clients_sample.csv")
+        products = pd.read_csv(DATA_DIR / "products_sample.csv")
+        tx_summary, product_mix = stream_transaction_aggregates(
+            DATA_DIR / "transactions_sample.csv",
+            products,
+            chunksize,
+        )
+    dataset = join_client_features(clients, tx_summary, product_mix)
+    save_joined_dataset(dataset, export_csv=export_csv)
     return dataset
 
 
+def load_aggregate_state() -> tuple[pd.DataFrame | None, dict]:
+    state_dir = OUTPUT_DIR / STATE_DIRNAME
+    state_path = state_dir / "client_aggregates.parquet"
+    watermark_path = state_dir / "watermark.json"
+    state = pd.read_parquet(state_path) if state_path.exists() else None
+    watermark = (
+        json.loads(watermark_path.read_text()) if watermark_path.exists() else {}
+    )
+    watermark.setdefault("processed_files", {})
+    return state, watermark
+
+
+def save_aggregate_state(state: pd.DataFrame, watermark: dict) -> None:
+    """Écrit l'état puis le watermark via renommage atomique, l'état d'abord."""
+    state_dir = OUTPUT_DIR / STATE_DIRNAME
+    state_dir.mkdir(parents=True, exist_ok=True)
+    tmp_state = state_dir / "client_aggregates.parquet.tmp"
+    state.to_parquet(tmp_state, compression=PARQUET_COMPRESSION)
+    os.replace(tmp_state, state_dir / "client_aggregates.parquet")
+    tmp_watermark = state_dir / "watermark.json.tmp"
+    tmp_watermark.write_text(json.dumps(watermark, indent=2))
+    os.replace(tmp_watermark, state_dir / "watermark.json")
+
+
+def _file_signature(path: Path) -> dict:
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _signature_matches(recorded: dict | int, path: Path) -> bool:
+    signature = _file_signature(path)
+    if isinstance(recorded, int):
+        # Watermarks antérieurs : seul le mtime était enregistré.
+        return recorded == signature["mtime_ns"]
+    return recorded == signature
+
+
+def pending_transaction_files(processed: dict) -> list[Path]:
+    """Fichiers de transactions pas encore intégrés, dans l'ordre d'ingestion.
+
+    L'extrait initial d'abord, puis ``incoming/*.csv`` par nom.
+
+    Un fichier déjà intégré dont la taille ou le mtime a changé lève une
+    ``ValueError`` : ses lignes sont déjà dans les agrégats, le réintégrer
+    les compterait deux fois.
+    """
+    candidates = [
+        DATA_DIR / "transactions_sample.csv",
+        *sorted((DATA_DIR / INCOMING_DIRNAME).glob("*.csv")),
+    ]
+    pending, changed = [], []
+    for path in candidates:
+        if not path.exists():
+            continue
+        recorded = processed.get(path.relative_to(DATA_DIR).as_posix())
+        if recorded is None:
+            pending.append(path)
+        elif not _signature_matches(recorded, path):
+            changed.append(path.relative_to(DATA_DIR).as_posix())
+    if changed:
+        raise ValueError(
+            "Already ingested transaction files changed since the last run: "
+            f"{changed}. "
+            f"Write new rows to a new file under {INCOMING_DIRNAME}/, or delete "
+            f"{STATE_DIRNAME}/ and {PARTITIONED_DIRNAME}/ to rebuild from scratch."
+        )
+    return pending
+
+
+def update_state(state: pd.DataFrame | None, update: pd.DataFrame) -> pd.DataFrame:
+    """Fusionne ``update`` dans l'état sans toucher aux clients non concernés."""
+    if state is None:
+        return update
+    touched = state.index.intersection(update.index)
+    merged = merge_partials([state.loc[touched], update])
+    return pd.concat([state.drop(index=touched), merged]).sort_index()
+
+
+PARTITION_FLOAT_COLUMNS = {
+    "n_transactions",
+    "total_spent",
+    "avg_ticket",
+    "days_since_last",
+    "avg_interest_rate",
+    "max_tenor",
+}
+
+
+def _write_partition(dataset: pd.DataFrame, path: Path) -> None:
+    aggregate_columns = [
+        column
+        for column in dataset.columns
+        if column in PARTITION_FLOAT_COLUMNS or column.startswith("spent_")
+    ]
+    # Toujours en float64 : toutes les partitions partagent ainsi le même schéma.
+    dataset = dataset.astype({column: "float64" for column in aggregate_columns})
+    tmp_path = path.with_suffix(".tmp")
+    dataset.to_parquet(
+        tmp_path,
+        index=False,
+        compression=PARQUET_COMPRESSION,
+        row_group_size=ROW_GROUP_SIZE,
+    )
+    os.replace(tmp_path, path)
+
+
+def assemble_incremental(
+    chunksize: int | None = None, n_partitions: int = N_PARTITIONS
+) -> list[int]:
+    """Intègre les nouveaux fichiers de transactions et réécrit leurs partitions.
+
+    L'état par client (agrégats combinables, voir ``partial_aggregates``) est
+    persisté sous ``data/state/`` avec la liste des fichiers déjà intégrés. La
+    sortie ``data/joined_clients/part-XXXXX.parquet`` est partitionnée par
+    ``client_id % n_partitions`` ; seules les partitions des clients ayant de
+    nouvelles transactions sont réécrites. Retourne les partitions réécrites.
+
+    Un changement du fichier clients réécrit toutes les partitions ; un
+    changement du catalogue produits reconstruit aussi l'état, car les
+    agrégats par catégorie en dépendent.
+    """
+    state, watermark = load_aggregate_state()
+    # Relevées avant lecture : une écriture pendant l'ingestion sera détectée au
+    # prochain run.
+    sources = {
+        name: _file_signature(DATA_DIR / name)
+        for name in (CLIENTS_FILENAME, PRODUCTS_FILENAME)
+    }
+    recorded_sources = watermark.get("source_files", {})
+    if recorded_sources.get(PRODUCTS_FILENAME) != sources[PRODUCTS_FILENAME]:
+        state = None
+        watermark["processed_files"] = {}
+    new_files = pending_transaction_files(watermark["processed_files"])
+    signatures = {path: _file_signature(path) for path in new_files}
+    output_dir = OUTPUT_DIR / PARTITIONED_DIRNAME
+    full_rewrite = (
+        state is None
+        or not output_dir.exists()
+        or watermark.get("n_partitions") != n_partitions
+        or recorded_sources != sources
+    )
+    if not new_files and not full_rewrite:
+        print("No new transaction or client files since last run")
+        return []
+
+    clients = pd.read_csv(DATA_DIR / CLIENTS_FILENAME)
+    products = pd.read_csv(DATA_DIR / PRODUCTS_FILENAME)
+    partials = []
+    for path in new_files:
+        chunks = (
+            pd.read_csv(path, chunksize=chunksize) if chunksize else [pd.read_csv(path)]
+        )
+        partials.extend(partial_aggregates(chunk, products) for chunk in chunks)
+    previous_columns = None if state is None else list(state.columns)
+    if partials:
+        update = merge_partials(partials)
+        state = update_state(state, update)
+        touched_clients = update.index.to_numpy()
+    else:
+        touched_clients = np.empty(0, dtype=np.int64)
+    if state is None:
+        state = partial_aggregates(
+            pd.read_csv(DATA_DIR / "transactions_sample.csv", nrows=0), products
+        )
+    # Une nouvelle catégorie change le schéma de toutes les partitions.
+    full_rewrite = full_rewrite or sorted(state.columns) != sorted(
+        previous_columns or []
+    )
+
+    if full_rewrite:
+        buckets = list(range(n_partitions))
+        if output_dir.exists():
+            for stale in output_dir.glob("part-*.parquet"):
+                stale.unlink()
+    else:
+        buckets = sorted(np.unique(touched_clients % n_partitions).tolist())
+    output_dir.mkdir(parents=True, exist_ok=True)
+    client_buckets = clients["client_id"].to_numpy() % n_partitions
+    state_buckets = state.index.to_numpy() % n_partitions
+    for bucket in buckets:
+        tx_summary, product_mix = finalize_aggregates(state[state_buckets == bucket])
+        dataset = join_client_features(
+            clients[client_buckets == bucket], tx_summary, product_mix
+        )
+        _write_partition(dataset, output_dir / f"part-{bucket:05d}.parquet")
+
+    for path, signature in signatures.items():
+        watermark["processed_files"][path.relative_to(DATA_DIR).as_posix()] = signature
+    watermark["n_partitions"] = n_partitions
+    watermark["source_files"] = sources
+    save_aggregate_state(state, watermark)
+    print(
+        f"Ingested {len(new_files)} file(s), "
+        f"rewrote {len(buckets)}/{n_partitions} partitions in {output_dir}"
+    )
+    return buckets
+
+
 if __name__ == "__main__":
-    assemble_dataset()
+    parser = argparse.ArgumentParser(
+        description="Assemble data/joined_clients.parquet from the sample tables."
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Stream transactions in chunks of N rows.",
+    )
+    parser.add_argument(
+        "--export-csv", action="store_true", help="Also write data/joined_clients.csv."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only ingest new files from data/samples/incoming/ "
+        "and rewrite the affected partitions.",
+    )
+    args = parser.parse_args()
+    if args.incremental:
+        assemble_incremental(chunksize=args.chunksize)
+    else:
+        assemble_dataset(chunksize=args.chunksize, export_csv=args.export_csv)
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+MODEL_PATH = Path("models/lgbm_model_final.pkl")
+
+
+class BenchmarkRecorder:
+    """Times callables, keeps per-benchmark statistics, compares them to a baseline."""
+
+    def __init__(self, baseline: dict, max_regression: float, compare: bool) -> None:
+        self.baseline = baseline
+        self.max_regression = max_regression
+        self.compare = compare
+        self.results: dict[str, dict] = {}
+        self.extra_info: dict[str, dict] = {}
+
+    def __call__(
+        self, name, func, *args, min_rounds=3, max_rounds=50, min_time=0.2, **kwargs
+    ):
+        # Warm-up, also the value handed back to the test.
+        result = func(*args, **kwargs)
+        timings = []
+        started = time.perf_counter()
+        while len(timings) < min_rounds or (
+            len(timings) < max_rounds and time.perf_counter() - started < min_time
+        ):
+            tick = time.perf_counter()
+            func(*args, **kwargs)
+            timings.append(time.perf_counter() - tick)
+        stats = {
+            "rounds": len(timings),
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "mean": statistics.fmean(timings),
+            "stddev": statistics.pstdev(timings),
+        }
+        self.results[name] = stats
+        reference = self.baseline.get(name)
+        if self.compare and reference is not None:
+            limit = reference["median"] * (1 + self.max_regression)
+            if stats["median"] > limit:
+                pytest.fail(
+                    f"{name}: median {stats['median'] * 1e3:.3f} ms exceeds baseline "
+                    f"{reference['median'] * 1e3:.3f} ms "
+                    f"by more than {self.max_regression:.0%}",
+                )
+        return result
+
+
+@pytest.fixture(scope="session")
+def bench(request):
+    config = request.config
+    baseline_path = config.getoption("--benchmark-baseline")
+    save_baseline = config.getoption("--benchmark-save-baseline")
+    baseline = {}
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text())["benchmarks"]
+    elif not save_baseline:
+        warnings.warn(
+            f"No benchmark baseline at {baseline_path}: "
+            "timings are recorded, not compared",
+            stacklevel=1,
+        )
+    recorder = BenchmarkRecorder(
+        baseline,
+        config.getoption("--benchmark-max-regression"),
+        compare=not save_baseline,
+    )
+    yield recorder
+    payload = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "benchmarks": recorder.results,
+        "extra_info": recorder.extra_info,
+    }
+    output = config.getoption("--benchmark-json")
+    if output is not None:
+        output.write_text(json.dumps(payload, indent=2))
+    if save_baseline:
+        baseline_path.write_text(json.dumps(payload, indent=2))
+
+
+@pytest.fixture(scope="session")
+def lgbm_model():
+    return joblib.load(MODEL_PATH)
+
+
+@pytest.fixture(scope="session")
+def feature_matrix(lgbm_model):
+    """Factory of synthetic matrices shaped like the served model's input."""
+
+    def make(n_rows: int, seed: int = 0) -> np.ndarray:
+        return np.random.default_rng(seed).normal(
+            size=(n_rows, lgbm_model.n_features_in_)
+        )
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def join_sources(tmp_path_factory):
+    """Factory writing clients/transactions/products CSVs laid out like data/samples."""
+
+    def make(n_clients: int, n_transactions: int, seed: int = 0) -> Path:
+        directory = tmp_path_factory.mktemp(f"samples_{n_clients}_{n_transactions}")
+        rng = np.random.default_rng(seed)
+        n_products = 50
+        pd.DataFrame(
+            {
+                "client_id": np.arange(n_clients),
+                "gender": rng.choice(["F", "M"], n_clients),
+                "age": rng.integers(18, 80, n_clients),
+                "income": rng.lognormal(10, 0.5, n_clients).round(2),
+                "contract_type": rng.choice(["cash", "revolving"], n_clients),
+                "target": (rng.random(n_clients) < 0.08).astype(int),
+            },
+        ).to_csv(directory / "clients_sample.csv", index=False)
+        pd.DataFrame(
+            {
+                "transaction_id": np.arange(n_transactions),
+                "client_id": rng.integers(0, n_clients, n_transactions),
+                "product_id": rng.integers(0, n_products, n_transactions),
+                "amount": rng.gamma(2.0, 50.0, n_transactions).round(2),
+                "days_since": rng.integers(0, 720, n_transactions),
+            },
+        ).to_csv(directory / "transactions_sample.csv", index=False)
+        pd.DataFrame(
+            {
+                "product_id": np.arange(n_products),
+                "category": rng.choice(
+                    ["card", "loan", "mortgage", "savings"], n_products
+                ),
+                "interest_rate": rng.uniform(0.01, 0.2, n_products).round(4),
+                "tenor_months": rng.choice([12, 24, 36, 60, 240], n_products),
+            },
+        ).to_csv(directory / "products_sample.csv", index=False)
+        return directory
+
+    return make
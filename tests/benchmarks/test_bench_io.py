@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Src.features import feature_engineering
+from Src.pipelines import join_datasets
+
+pytestmark = pytest.mark.benchmark
+
+
+def _joined_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "client_id": np.arange(n_rows),
+            "gender": rng.choice(["F", "M"], n_rows),
+            "contract_type": rng.choice(["cash", "revolving"], n_rows),
+            "age": rng.integers(18, 80, n_rows),
+            "income": rng.lognormal(10, 0.5, n_rows).round(2),
+            "target": (rng.random(n_rows) < 0.08).astype(int),
+            "n_transactions": rng.integers(0, 200, n_rows),
+            "total_spent": rng.gamma(2.0, 500.0, n_rows).round(2),
+            "avg_ticket": rng.gamma(2.0, 50.0, n_rows).round(2),
+            "days_since_last": rng.integers(0, 999, n_rows),
+            "spent_card": rng.gamma(2.0, 100.0, n_rows).round(2),
+            "spent_loan": rng.gamma(2.0, 100.0, n_rows).round(2),
+            "avg_interest_rate": rng.uniform(0.01, 0.2, n_rows),
+            "max_tenor": rng.choice([12.0, 24.0, 60.0, 240.0], n_rows),
+        },
+    )
+
+
+@pytest.mark.parametrize("n_rows", [200_000, 2_000_000])
+def test_bench_joined_dataset_csv_vs_parquet(bench, monkeypatch, tmp_path, n_rows):
+    monkeypatch.setattr(join_datasets, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(feature_engineering, "DATA_DIR", tmp_path)
+    dataset = _joined_frame(n_rows)
+    parquet_path = join_datasets.save_joined_dataset(dataset, export_csv=True)
+    csv_path = tmp_path / join_datasets.CSV_FILENAME
+
+    from_csv = bench(f"load_joined_csv[{n_rows}]", pd.read_csv, csv_path, min_rounds=1)
+    from_parquet = bench(
+        f"load_joined_parquet[{n_rows}]",
+        feature_engineering.load_joined_dataset,
+        min_rounds=1,
+    )
+    projected = bench(
+        f"load_joined_parquet_projected[{n_rows}]",
+        feature_engineering.load_joined_dataset,
+        ["client_id", "target", "total_spent"],
+        min_rounds=1,
+    )
+    bench.extra_info[f"joined_dataset_bytes[{n_rows}]"] = {
+        "csv": csv_path.stat().st_size,
+        "parquet": parquet_path.stat().st_size,
+    }
+    assert len(from_csv) == len(from_parquet) == len(projected) == n_rows
+    pd.testing.assert_frame_equal(from_parquet, dataset)
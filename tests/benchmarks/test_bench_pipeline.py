@@ -0,0 +1,54 @@
+import pytest
+
+from Src.features import feature_engineering
+from Src.pipelines import join_datasets
+
+pytestmark = pytest.mark.benchmark
+
+SIZES = [(1_000, 20_000), (20_000, 400_000)]
+
+
+@pytest.fixture
+def joined_dataset(join_sources, monkeypatch, tmp_path):
+    def make(n_clients, n_transactions):
+        monkeypatch.setattr(
+            join_datasets, "DATA_DIR", join_sources(n_clients, n_transactions)
+        )
+        monkeypatch.setattr(join_datasets, "OUTPUT_DIR", tmp_path)
+        return join_datasets.assemble_dataset()
+
+    return make
+
+
+@pytest.mark.parametrize("n_clients,n_transactions", SIZES)
+def test_bench_assemble_dataset(bench, joined_dataset, n_clients, n_transactions):
+    joined_dataset(n_clients, n_transactions)
+    dataset = bench(
+        f"assemble_dataset[{n_clients}x{n_transactions}]",
+        join_datasets.assemble_dataset,
+    )
+    assert len(dataset) == n_clients
+
+
+@pytest.mark.parametrize("n_clients,n_transactions", SIZES)
+def test_bench_materialize_datasets(
+    bench, joined_dataset, monkeypatch, tmp_path, n_clients, n_transactions
+):
+    dataset = joined_dataset(n_clients, n_transactions)
+    monkeypatch.setattr(feature_engineering, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(
+        feature_engineering, "PREPROCESSOR_PATH", tmp_path / "preprocessor.joblib"
+    )
+    (X_train, y_train), valid, test = feature_engineering.split_data(dataset)
+    categorical_cols = X_train.select_dtypes(include=["object"]).columns.tolist()
+    numeric_cols = X_train.select_dtypes(exclude=["object"]).columns.tolist()
+    splits = {"train": (X_train, y_train), "valid": valid, "test": test}
+
+    def materialize():
+        preprocessor = feature_engineering.build_feature_pipeline(
+            categorical_cols, numeric_cols
+        )
+        feature_engineering.materialize_datasets(preprocessor, splits)
+
+    bench(f"materialize_datasets[{n_clients}]", materialize)
+    assert (tmp_path / "X_test.parquet").exists()
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import shap
+from fastapi.testclient import TestClient
+
+from Api.app.main import app
+from Src.models.custom_score import optimal_threshold
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.mark.parametrize("n_rows", [1, 100, 10_000])
+def test_bench_model_predict(bench, lgbm_model, feature_matrix, n_rows):
+    X = feature_matrix(n_rows)
+    proba = bench(f"predict_proba[{n_rows}]", lgbm_model.predict_proba, X)
+    assert proba.shape == (n_rows, 2)
+
+
+def test_bench_api_predict_single(bench, feature_matrix):
+    payload = {"client_id": 1, "features": feature_matrix(1)[0].tolist()}
+    with TestClient(app) as client:
+        response = bench("api_predict[1]", client.post, "/predict", json=payload)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("n_rows", [100, 5_000])
+def test_bench_api_predict_batch(bench, feature_matrix, n_rows):
+    X = feature_matrix(n_rows)
+    clients = [{"client_id": i, "features": row} for i, row in enumerate(X.tolist())]
+    with TestClient(app) as client:
+        response = bench(
+            f"api_predict_batch[{n_rows}]", client.post, "/predict/batch", json=clients
+        )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("n_rows", [1, 100])
+def test_bench_tree_shap(bench, lgbm_model, feature_matrix, n_rows):
+    explainer = shap.TreeExplainer(lgbm_model)
+    X = feature_matrix(n_rows)
+    values = bench(f"tree_shap[{n_rows}]", explainer.shap_values, X)
+    assert np.shape(values)[-2:] == X.shape
+
+
+@pytest.mark.parametrize("n_rows", [1_000, 100_000])
+def test_bench_optimal_threshold(bench, n_rows):
+    rng = np.random.default_rng(0)
+    y_true = (rng.random(n_rows) < 0.08).astype(int)
+    y_proba = np.clip(rng.normal(0.1 + 0.3 * y_true, 0.15), 0, 1)
+    threshold, _ = bench(
+        f"optimal_threshold[{n_rows}]", optimal_threshold, y_true, y_proba
+    )
+    assert 0 <= threshold <= 1
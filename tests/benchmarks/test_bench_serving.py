@@ -0,0 +1,130 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from Api.app.dependencies import ModelRegistry
+from Src.inference.tree_engine import CompiledForest, compile_model
+
+pytestmark = pytest.mark.benchmark
+
+MODEL_PATH = Path("models/lgbm_model_final.pkl")
+N_WORKERS = 4
+# Loads the model like an API worker, then reports its memory once every worker is up.
+WORKER = """
+import json, sys, time
+import numpy as np
+started = time.perf_counter()
+from Api.app.dependencies import ModelRegistry
+bundle = ModelRegistry(sys.argv[1], sys.argv[2]).current
+bundle.predict_proba(np.zeros((256, bundle.n_features)))
+startup = time.perf_counter() - started
+print("ready", flush=True)
+sys.stdin.readline()
+memory = {}
+for line in open("/proc/self/smaps_rollup"):
+    key, _, value = line.partition(":")
+    if key in {"Rss", "Pss", "Shared_Clean", "Private_Dirty"}:
+        memory[key] = int(value.split()[0]) / 1024
+report = {"startup_seconds": startup, "load_seconds": bundle.load_seconds, **memory}
+print(json.dumps(report), flush=True)
+"""
+
+
+def synthetic_forest(
+    n_trees: int, depth: int, n_features: int, seed: int = 0
+) -> CompiledForest:
+    """Complete trees of the given depth with random splits, in heap order."""
+    rng = np.random.default_rng(seed)
+    per_tree = 2 ** (depth + 1) - 1
+    n_internal = 2**depth - 1
+    local = np.arange(per_tree)
+    is_leaf = local >= n_internal
+    offsets = np.repeat(np.arange(n_trees) * per_tree, per_tree)
+    node = np.tile(local, n_trees)
+    leaf = np.tile(is_leaf, n_trees)
+    n_nodes = n_trees * per_tree
+    return CompiledForest(
+        roots=(np.arange(n_trees) * per_tree).astype(np.int32),
+        feature=np.where(leaf, 0, rng.integers(0, n_features, n_nodes)).astype(
+            np.int32
+        ),
+        threshold=np.where(leaf, 0.0, rng.normal(size=n_nodes)),
+        left=np.where(leaf, offsets + node, offsets + 2 * node + 1).astype(np.int32),
+        right=np.where(leaf, offsets + node, offsets + 2 * node + 2).astype(np.int32),
+        value=np.where(leaf, rng.normal(scale=0.01, size=n_nodes), 0.0),
+        default_left=np.ones(n_nodes, dtype=bool),
+        missing_type=np.zeros(n_nodes, dtype=np.uint8),
+        max_depth=depth,
+        n_features=n_features,
+        feature_names=[f"f{i}" for i in range(n_features)],
+    )
+
+
+@pytest.fixture(scope="module")
+def model_artifacts(lgbm_model, tmp_path_factory):
+    directory = tmp_path_factory.mktemp("served_models")
+    forest = compile_model(lgbm_model)
+    forest.save(directory / "model.npz")
+    forest.save(directory / "forest")
+    # ~1.5M nodes (~40 MB of arrays): large enough for sharing to show in PSS.
+    large = synthetic_forest(3000, 8, lgbm_model.n_features_in_)
+    large.save(directory / "large.npz")
+    large.save(directory / "large_forest")
+    return {
+        "pickle": MODEL_PATH,
+        "npz": directory / "model.npz",
+        "mmap": directory / "forest",
+        "large_npz": directory / "large.npz",
+        "large_mmap": directory / "large_forest",
+    }
+
+
+def _measure_workers(
+    model_path: Path, threshold_path: Path, n_workers: int
+) -> list[dict]:
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER, str(model_path), str(threshold_path)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(n_workers)
+    ]
+    for worker in workers:
+        assert worker.stdout.readline().strip() == "ready"
+    for worker in workers:
+        worker.stdin.write("\n")
+        worker.stdin.flush()
+    results = [json.loads(worker.stdout.readline()) for worker in workers]
+    for worker in workers:
+        worker.wait(timeout=30)
+    return results
+
+
+@pytest.mark.parametrize("form", ["pickle", "npz", "mmap", "large_npz", "large_mmap"])
+def test_bench_model_load(bench, model_artifacts, tmp_path, form):
+    registry = ModelRegistry(model_artifacts[form], tmp_path / "missing_threshold.pkl")
+    bundle = bench(f"model_load[{form}]", registry.reload)
+    assert bundle.n_features
+
+
+@pytest.mark.skipif(
+    not Path("/proc/self/smaps_rollup").exists(),
+    reason="needs Linux /proc smaps_rollup",
+)
+@pytest.mark.parametrize("form", ["pickle", "npz", "mmap", "large_npz", "large_mmap"])
+def test_bench_worker_memory(bench, model_artifacts, tmp_path, form):
+    """Startup time and RSS/PSS (MiB) of ``N_WORKERS`` processes serving one model."""
+    results = _measure_workers(
+        model_artifacts[form], tmp_path / "missing_threshold.pkl", N_WORKERS
+    )
+    summary = {key: max(result[key] for result in results) for key in results[0]}
+    summary["total_pss_mib"] = sum(result["Pss"] for result in results)
+    bench.extra_info[f"worker_memory[{form}]"] = summary
+    print(f"\n{form}: {json.dumps(summary)}")
+    assert len(results) == N_WORKERS
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import pytest
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "benchmarks" / "baseline.json"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption(
+        "--run-benchmarks",
+        action="store_true",
+        help="Run the tests marked @pytest.mark.benchmark.",
+    )
+    group.addoption(
+        "--benchmark-json",
+        type=Path,
+        default=None,
+        help="Write benchmark timings to this JSON file.",
+    )
+    group.addoption(
+        "--benchmark-baseline",
+        type=Path,
+        default=DEFAULT_BASELINE,
+        help="Baseline JSON to compare against "
+        "(default: tests/benchmarks/baseline.json).",
+    )
+    group.addoption(
+        "--benchmark-max-regression",
+        type=float,
+        default=0.25,
+        help="Fail a benchmark whose median is more than this fraction slower "
+        "than the baseline.",
+    )
+    group.addoption(
+        "--benchmark-save-baseline",
+        action="store_true",
+        help="Store the current timings as the new baseline instead of comparing.",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "integration: needs the sample CSVs and a local MLflow store"
+    )
+    config.addinivalue_line(
+        "markers", "benchmark: latency benchmark, only run with --run-benchmarks"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks only run with --run-benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
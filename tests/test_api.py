@@ -1,6 +1,46 @@
+import asyncio
+import dataclasses
+import io
+import json
+import shutil
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+
+import httpx
+import joblib
+import numpy as np
+import pandas as pd
 from fastapi.testclient import TestClient
+from lightgbm import LGBMClassifier
 
+from Api.app import config, main
+from Api.app import prediction_cache as prediction_cache_module
+from Api.app.batching import MicroBatcher
+from Api.app.dependencies import ModelRegistry, registry
 from Api.app.main import app
+from Api.app.metrics import Histogram, metrics
+from Api.app.prediction_cache import (
+    ENTRY_OVERHEAD_BYTES,
+    PredictionCache,
+    feature_digest,
+)
+from Api.app.prediction_log import PredictionLog
+from Src.features.feature_engineering import build_feature_pipeline
+from Src.monitoring.drift_monitor import iter_parquet_batches
+
+# Seconds allowed for ``import Api.app.main`` in a fresh interpreter (~0.7 s, 1 core).
+IMPORT_BUDGET_SECONDS = 2.0
+HEAVY_MODULES = (
+    "shap",
+    "mlflow",
+    "matplotlib",
+    "sklearn",
+    "pandas",
+    "pyarrow",
+    "lightgbm",
+)
 
 
 def test_health_endpoint():
@@ -8,3 +48,447 @@ def test_health_endpoint():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
+
+
+def test_predict_uses_preloaded_model():
+    with TestClient(app) as client:
+        assert registry.loaded
+        bundle = registry.current
+        payload = {"client_id": 1, "features": [0.0] * bundle.n_features}
+        first = client.post("/predict", json=payload).json()
+        second = client.post("/predict", json=payload).json()
+    assert registry.current is bundle
+    assert 0.0 <= first["probability"] <= 1.0
+    assert first == second
+    assert first["threshold"] == bundle.threshold
+
+
+def test_registry_swaps_bundle_when_threshold_changes(tmp_path):
+    model_path = tmp_path / "model.pkl"
+    threshold_path = tmp_path / "threshold.pkl"
+    shutil.copy(registry.model_path, model_path)
+    joblib.dump({"threshold": 0.2}, threshold_path)
+    local = ModelRegistry(model_path, threshold_path)
+    before = local.current
+    assert before.threshold == 0.2
+    assert not local.reload_if_changed()
+
+    joblib.dump({"threshold": 0.3}, threshold_path)
+    assert local.reload_if_changed()
+    after = local.current
+    assert after is not before
+    assert after.threshold == 0.3
+    assert after.version != before.version
+    assert before.threshold == 0.2
+
+
+def test_predict_batch_matches_single_predictions():
+    rng = np.random.default_rng(0)
+    with TestClient(app) as client:
+        X = rng.normal(size=(5, registry.current.n_features))
+        clients = [
+            {"client_id": 10 + i, "features": row.tolist()} for i, row in enumerate(X)
+        ]
+        singles = [client.post("/predict", json=payload).json() for payload in clients]
+        response = client.post("/predict/batch", json=clients)
+        assert response.status_code == 200
+        batch = [json.loads(line) for line in response.text.splitlines()]
+
+        buffer = io.BytesIO()
+        np.save(buffer, X)
+        npy = client.post(
+            "/predict/batch",
+            content=buffer.getvalue(),
+            headers={"content-type": "application/x-npy"},
+        )
+        npy_rows = [json.loads(line) for line in npy.text.splitlines()]
+    assert [row["client_id"] for row in batch] == [row["client_id"] for row in singles]
+    np.testing.assert_allclose(
+        [row["probability"] for row in batch], [row["probability"] for row in singles]
+    )
+    assert [row["decision"] for row in batch] == [row["decision"] for row in singles]
+    np.testing.assert_allclose(
+        [row["probability"] for row in npy_rows], [row["probability"] for row in batch]
+    )
+
+
+def test_predict_batch_rejects_oversized_batches(monkeypatch):
+    monkeypatch.setattr(config, "MAX_BATCH_SIZE", 2)
+    with TestClient(app) as client:
+        clients = [
+            {"client_id": i, "features": [0.0] * registry.current.n_features}
+            for i in range(3)
+        ]
+        response = client.post("/predict/batch", json=clients)
+    assert response.status_code == 413
+
+
+def test_predict_batch_rejects_non_numeric_payloads():
+    import pyarrow as pa
+
+    n_features = registry.current.n_features
+    npy = io.BytesIO()
+    np.save(npy, np.full((2, n_features), "x"))
+    table = pa.table({"client_id": [1, 2], "income": ["high", "low"]})
+    arrow = io.BytesIO()
+    with pa.ipc.new_stream(arrow, table.schema) as writer:
+        writer.write_table(table)
+    with TestClient(app) as client:
+        for body, content_type in (
+            (npy.getvalue(), "application/x-npy"),
+            (arrow.getvalue(), "application/vnd.apache.arrow.stream"),
+        ):
+            response = client.post(
+                "/predict/batch", content=body, headers={"content-type": content_type}
+            )
+            assert response.status_code == 422
+            assert "must be numeric" in response.json()["detail"]
+
+
+def test_micro_batcher_coalesces_concurrent_rows():
+    bundle = registry.current
+    X = np.random.default_rng(1).normal(size=(10, bundle.n_features))
+    local = MicroBatcher(registry, max_rows=4, max_wait_ms=50)
+
+    async def score_all():
+        await local.start()
+        try:
+            return await asyncio.gather(
+                *(local.submit(row.reshape(1, -1)) for row in X)
+            )
+        finally:
+            await local.stop()
+
+    results = asyncio.run(score_all())
+    np.testing.assert_allclose([proba for proba, _ in results], bundle.predict_proba(X))
+    assert local.stats.rows == 10
+    assert local.stats.batches == 3
+    assert local.stats.max_batch_size == 4
+
+
+def test_micro_batcher_fails_only_the_row_of_the_wrong_width():
+    bundle = registry.current
+    X = np.random.default_rng(1).normal(size=(3, bundle.n_features))
+    bad = np.zeros((1, bundle.n_features + 1))
+
+    async def score(current):
+        local = MicroBatcher(
+            SimpleNamespace(current=current), max_rows=4, max_wait_ms=50
+        )
+        await local.start()
+        try:
+            return await asyncio.gather(
+                local.submit(bad),
+                *(local.submit(row.reshape(1, -1)) for row in X),
+                return_exceptions=True,
+            )
+        finally:
+            await local.stop()
+
+    # With and without a known model width, the valid rows are still scored.
+    for current in (bundle, dataclasses.replace(bundle, n_features=None)):
+        results = asyncio.run(score(current))
+        assert isinstance(results[0], Exception)
+        np.testing.assert_allclose(
+            [proba for proba, _ in results[1:]], bundle.predict_proba(X)
+        )
+
+
+def test_explain_returns_additive_tree_shap_values():
+    X = np.random.default_rng(2).normal(size=(3, registry.current.n_features))
+    clients = [{"client_id": i, "features": row.tolist()} for i, row in enumerate(X)]
+    with TestClient(app) as client:
+        single = client.post("/explain", json=clients[0]).json()
+        top = client.post("/explain", params={"top_k": 5}, json=clients[0]).json()
+        batch = client.post("/explain/batch", json=clients).json()
+    raw_scores = registry.current.model.predict(X, raw_score=True)
+    assert np.isclose(
+        np.sum(single["shap_values"]) + single["base_value"], raw_scores[0]
+    )
+    for explanation, raw in zip(batch, raw_scores):
+        assert np.isclose(
+            np.sum(explanation["shap_values"]) + explanation["base_value"], raw
+        )
+    magnitudes = [abs(item["shap_value"]) for item in top["contributions"]]
+    assert len(magnitudes) == 5
+    assert magnitudes == sorted(magnitudes, reverse=True)
+    assert magnitudes[0] == np.max(np.abs(single["shap_values"]))
+
+
+def test_predict_raw_applies_saved_preprocessor(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(
+        {
+            "income": rng.lognormal(10, 0.5, 200),
+            "contract_type": rng.choice(["cash", "revolving"], 200).astype(object),
+        },
+    )
+    frame.loc[::9, "income"] = np.nan
+    preprocessor = build_feature_pipeline(["contract_type"], ["income"])
+    X = preprocessor.fit_transform(frame)
+    model = LGBMClassifier(n_estimators=5, verbose=-1).fit(X, rng.integers(0, 2, 200))
+    joblib.dump(preprocessor, tmp_path / "preprocessor.joblib")
+    joblib.dump(model, tmp_path / "model.pkl")
+    joblib.dump({"threshold": 0.5}, tmp_path / "threshold.pkl")
+    local = ModelRegistry(
+        tmp_path / "model.pkl",
+        tmp_path / "threshold.pkl",
+        preprocessor_path=tmp_path / "preprocessor.joblib",
+    )
+    monkeypatch.setattr(main, "registry", local)
+    on_event_loop = []
+    transform = main.transform_records
+
+    def tracked_transform(bundle, records):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return transform(bundle, records)
+
+    monkeypatch.setattr(main, "transform_records", tracked_transform)
+
+    client = TestClient(app)
+    records = [
+        {"income": None, "contract_type": "cash"},
+        {"income": 25000.0, "contract_type": "unknown"},
+    ]
+    single = client.post(
+        "/predict/raw", json={"client_id": 1, "record": records[0]}
+    ).json()
+    batch = client.post(
+        "/predict/raw/batch",
+        json=[{"client_id": i, "record": r} for i, r in enumerate(records)],
+    )
+    rows = [json.loads(line) for line in batch.text.splitlines()]
+    expected = model.predict_proba(
+        preprocessor.transform(pd.DataFrame(records).astype({"income": float}))
+    )[:, 1]
+    np.testing.assert_allclose([row["probability"] for row in rows], expected)
+    assert single["probability"] == rows[0]["probability"]
+    # One record is transformed inline; a batch runs in a worker thread.
+    assert on_event_loop == [True, False]
+
+    monkeypatch.setattr(
+        main,
+        "registry",
+        ModelRegistry(tmp_path / "model.pkl", tmp_path / "threshold.pkl"),
+    )
+    assert (
+        client.post(
+            "/predict/raw", json={"client_id": 1, "record": records[0]}
+        ).status_code
+        == 503
+    )
+
+
+def test_explainer_build_does_not_block_predictions(monkeypatch):
+    release, built = threading.Event(), threading.Event()
+    get = main.explainers.get
+
+    def slow_get(bundle):
+        # Stands in for the first shap import and TreeExplainer construction.
+        release.wait(2)
+        built.set()
+        return get(bundle)
+
+    monkeypatch.setattr(main.explainers, "get", slow_get)
+    payload = {"client_id": 1, "features": [0.0] * registry.current.n_features}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            explanation = asyncio.create_task(client.post("/explain", json=payload))
+            await asyncio.sleep(0.05)
+            predicted = await client.post("/predict", json=payload)
+            served_while_building = not built.is_set()
+            release.set()
+            return predicted, served_while_building, await explanation
+
+    predicted, served_while_building, explanation = asyncio.run(scenario())
+    assert predicted.status_code == 200 and explanation.status_code == 200
+    assert served_while_building
+
+
+def test_prediction_log_writes_served_rows_for_monitoring(tmp_path, monkeypatch):
+    local = PredictionLog(tmp_path / "predictions", flush_interval=60)
+    monkeypatch.setattr(main, "prediction_log", local)
+    monkeypatch.setattr(config, "PREDICTION_LOG_ENABLED", True)
+    bundle = registry.current
+    X = np.random.default_rng(3).normal(size=(4, bundle.n_features))
+    with TestClient(app) as client:
+        client.post("/predict", json={"client_id": 7, "features": X[0].tolist()})
+        client.post(
+            "/predict/batch",
+            json=[
+                {"client_id": i, "features": row.tolist()} for i, row in enumerate(X)
+            ],
+        )
+        stats = client.get("/admin/prediction-log").json()
+    assert stats["enabled"] and stats["buffered_rows"] == 5
+
+    logged = pd.concat(
+        iter_parquet_batches(tmp_path / "predictions"), ignore_index=True
+    )
+    assert logged["client_id"].tolist() == [7, 0, 1, 2, 3]
+    np.testing.assert_allclose(
+        logged["probability"], bundle.predict_proba(np.vstack([X[:1], X]))
+    )
+    np.testing.assert_allclose(
+        logged[list(bundle.feature_names)], np.vstack([X[:1], X])
+    )
+    assert (logged["model_version"] == bundle.version).all()
+    assert local.stats.flushed_rows == 5 and local.stats.dropped_rows == 0
+
+
+def test_prediction_log_drops_oldest_rows_and_rotates_files(tmp_path):
+    bundle = registry.current
+    local = PredictionLog(tmp_path, capacity=5, max_files=2)
+    X = np.zeros((3, bundle.n_features))
+    for batch in range(3):
+        local.record(
+            bundle, np.arange(3) + 10 * batch, X, np.full(3, 0.1), np.zeros(3), 1.0
+        )
+    assert local.buffered_rows == 3
+    assert local.stats.dropped_rows == 6
+    assert local.flush() == 3
+
+    for _ in range(3):
+        local.record(bundle, np.arange(3), X, np.full(3, 0.1), np.zeros(3), 1.0)
+        local.flush()
+    assert len(list(tmp_path.rglob("part-*.parquet"))) == 2
+    assert local.stats.files_written == 4
+
+    # A file removed by another worker while listed (here a dangling link).
+    partition = next(tmp_path.glob("date=*"))
+    (partition / "part-000000-1-0.parquet").symlink_to(tmp_path / "gone.parquet")
+    local.record(bundle, np.arange(3), X, np.full(3, 0.1), np.zeros(3), 1.0)
+    assert local.flush() == 3
+    assert local.stats.rotation_errors == 0 and local.stats.lost_rows == 0
+
+
+def test_prediction_log_rotation_failure_is_not_a_lost_batch(tmp_path, monkeypatch):
+    bundle = registry.current
+    local = PredictionLog(tmp_path, max_files=1)
+
+    def failing_rotate():
+        raise PermissionError("read-only directory")
+
+    monkeypatch.setattr(local, "_rotate", failing_rotate)
+    X = np.zeros((3, bundle.n_features))
+    local.record(bundle, np.arange(3), X, np.full(3, 0.1), np.zeros(3), 1.0)
+    assert local.flush() == 3
+    assert local.stats.rotation_errors == 1
+    assert local.stats.flush_errors == 0 and local.stats.lost_rows == 0
+
+
+def test_prediction_cache_serves_repeated_vectors_until_reload(monkeypatch):
+    local = PredictionCache(max_entries=100, ttl=0)
+    monkeypatch.setattr(main, "prediction_cache", local)
+    bundle = registry.current
+    X = np.random.default_rng(4).normal(size=(3, bundle.n_features))
+    clients = [{"client_id": i, "features": row.tolist()} for i, row in enumerate(X)]
+    with TestClient(app) as client:
+        first = client.post("/predict", json=clients[0]).json()
+        second = client.post("/predict", json=clients[0]).json()
+        single = client.post("/explain", json=clients[1]).json()
+        batch = client.post("/explain/batch", json=clients).json()
+        assert local.stats.hits == 2 and local.stats.misses == 4
+        client.post("/admin/reload")
+        client.post("/predict", json=clients[0])
+        stats = client.get("/admin/prediction-cache").json()
+    assert first == second
+    assert batch[1]["shap_values"] == single["shap_values"]
+    raw_scores = bundle.model.predict(X, raw_score=True)
+    for explanation, raw in zip(batch, raw_scores):
+        assert np.isclose(
+            np.sum(explanation["shap_values"]) + explanation["base_value"], raw
+        )
+    assert (
+        stats["invalidations"] == 1 and stats["entries"] == 1 and stats["misses"] == 5
+    )
+
+
+def test_prediction_cache_evicts_by_bytes_and_expires(monkeypatch):
+    local = PredictionCache(
+        max_entries=10, max_bytes=3 * (800 + ENTRY_OVERHEAD_BYTES), ttl=60
+    )
+    rows = np.random.default_rng(5).normal(size=(4, 100))
+    for row in rows:
+        assert local.get("v1", "shap", feature_digest(row)) is None
+        local.put("v1", "shap", feature_digest(row), row)
+    assert local.n_entries == 3 and local.stats.evictions == 1
+    assert local.get("v1", "shap", feature_digest(rows[0])) is None
+    np.testing.assert_array_equal(
+        local.get("v1", "shap", feature_digest(rows[3])), rows[3]
+    )
+
+    clock = [0.0]
+    monkeypatch.setattr(prediction_cache_module.time, "monotonic", lambda: clock[0])
+    local.put("v1", "predict", b"key", (0.3, 0))
+    clock[0] = 61.0
+    assert local.get("v1", "predict", b"key") is None
+    assert local.stats.expirations == 1
+    # A result computed by a replaced bundle is not stored.
+    local.put("v0", "predict", b"key", (0.3, 0))
+    assert local.get("v1", "predict", b"key") is None
+
+
+def test_metrics_endpoint_exposes_phase_histograms(monkeypatch):
+    bundle = registry.current
+    payload = {"client_id": 1, "features": [0.0] * bundle.n_features}
+    before, _ = metrics.phase_seconds.snapshot("/predict", "predict")
+    with TestClient(app) as client:
+        client.post("/predict", json=payload)
+        client.post("/predict/batch", json=[payload] * 3)
+        text = client.get("/metrics").text
+        monkeypatch.setattr(metrics, "enabled", False)
+        assert client.get("/metrics").status_code == 404
+    after, _ = metrics.phase_seconds.snapshot("/predict", "predict")
+    assert sum(after) == sum(before) + 1
+    for phase in ("validation", "array", "predict", "threshold"):
+        assert (
+            f'api_request_phase_seconds_count{{endpoint="/predict",phase="{phase}"}}'
+            in text
+        )
+    assert 'api_batch_rows_bucket{endpoint="/predict/batch",le="5"}' in text
+    assert (
+        'api_request_duration_seconds_count{endpoint="/predict",status="200"}' in text
+    )
+    assert f'api_model_info{{version="{bundle.version}"}} 1.0' in text
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Test.", (0.1, 1.0), ("endpoint",))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{endpoint="/a",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{endpoint="/a",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{endpoint="/a",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{endpoint="/a"} 4' in lines
+    assert lines[-2] == 'latency_seconds_sum{endpoint="/a"} 3.65'
+
+
+def test_api_import_stays_within_budget_and_skips_heavy_modules():
+    script = (
+        "import json, sys, time; started = time.perf_counter(); import Api.app.main; "
+        "seconds = time.perf_counter() - started; "
+        "print(json.dumps({'seconds': seconds, 'modules': sorted(sys.modules)}))"
+    )
+    runs = [
+        json.loads(
+            subprocess.run(
+                [sys.executable, "-c", script],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+        )
+        for _ in range(2)
+    ]
+    assert not set(HEAVY_MODULES) & set(runs[0]["modules"])
+    assert min(run["seconds"] for run in runs) < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from Src.features.compiled_preprocessor import compile_preprocessor
+from Src.features.feature_engineering import build_feature_pipeline
+
+
+def _frame(n_rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(
+        {
+            "income": rng.lognormal(10, 0.5, n_rows),
+            "age": rng.integers(18, 80, n_rows).astype(float),
+            "merchant": rng.integers(0, 40, n_rows).astype(str).astype(object),
+            "contract_type": rng.choice(["cash", "revolving"], n_rows).astype(object),
+        },
+    )
+    frame.loc[::7, "income"] = np.nan
+    frame.loc[::11, "merchant"] = None
+    return frame
+
+
+def test_compiled_preprocessor_matches_column_transformer():
+    preprocessor = build_feature_pipeline(
+        ["merchant", "contract_type"], ["income", "age"]
+    )
+    preprocessor.fit(_frame())
+    compiled = compile_preprocessor(preprocessor)
+
+    scoring = _frame(seed=1)
+    scoring.loc[3, "merchant"] = "never-seen"
+    scoring.loc[5, "age"] = np.nan
+    scoring.loc[8, "income"] = np.nan
+    expected = preprocessor.transform(scoring)
+    expected = expected.toarray() if hasattr(expected, "toarray") else expected
+    records = scoring.to_dict(orient="records")
+    del records[8]["income"]  # an absent key is treated like a missing value
+
+    np.testing.assert_allclose(compiled.transform_records(records), expected)
+    assert compiled.n_features == expected.shape[1]
+    assert list(compiled.feature_names) == preprocessor.get_feature_names_out().tolist()
@@ -0,0 +1,59 @@
+import numpy as np
+
+from Src.models.custom_score import business_cost_score, cost_curve, optimal_threshold
+from Src.models.params import scoring_params
+
+
+def _sample(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    y_true = (rng.random(n) < 0.2).astype(int)
+    y_proba = np.round(
+        np.clip(rng.normal(0.3 + 0.3 * y_true, 0.2), 0, 1), 2
+    )  # rounded: many ties
+    return y_true, y_proba, rng.uniform(0.5, 2.0, n)
+
+
+def test_cost_curve_matches_confusion_matrix_per_threshold():
+    y_true, y_proba, weights = _sample()
+    grid = np.linspace(0.0, 1.0, 41)
+    curve = cost_curve(
+        y_true, y_proba, grid, sample_weight=weights, fn_cost=5.0, fp_cost=2.0
+    )
+    expected = [
+        business_cost_score(
+            y_true,
+            (y_proba >= thr).astype(int),
+            fn_cost=5.0,
+            fp_cost=2.0,
+            sample_weight=weights,
+        )
+        for thr in grid
+    ]
+    np.testing.assert_allclose(curve["score"], expected)
+
+
+def test_exact_sweep_is_at_least_as_good_as_any_grid():
+    y_true, y_proba, _ = _sample(seed=1)
+    exact_threshold, exact_score = optimal_threshold(y_true, y_proba)
+    _, grid_score = optimal_threshold(y_true, y_proba, grid=np.linspace(0.05, 0.95, 50))
+    assert exact_threshold in set(y_proba)
+    assert exact_score >= grid_score
+    assert np.isclose(
+        exact_score,
+        business_cost_score(y_true, (y_proba >= exact_threshold).astype(int)),
+    )
+
+
+def test_scoring_params_grid_mode():
+    params = {
+        "scoring": {
+            "fn_cost": 8,
+            "fp_cost": 1,
+            "threshold_search": "grid",
+            "threshold_grid": [0.1, 0.5, 0.1],
+        }
+    }
+    scoring = scoring_params(params)
+    assert scoring["fn_cost"] == 8.0
+    np.testing.assert_allclose(scoring["grid"], [0.1, 0.2, 0.3, 0.4, 0.5])
+    assert scoring_params({"scoring": {}})["grid"] is None
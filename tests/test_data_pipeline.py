@@ -1,6 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Src.pipelines import join_datasets
 from Src.pipelines.join_datasets import assemble_dataset
 
 
+@pytest.fixture
+def synthetic_sources(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    n_clients, n_transactions = 120, 3000
+    pd.DataFrame(
+        {
+            "client_id": np.arange(n_clients),
+            "gender": rng.choice(["F", "M"], n_clients),
+            "target": rng.integers(0, 2, n_clients),
+        },
+    ).to_csv(tmp_path / "clients_sample.csv", index=False)
+    transactions = pd.DataFrame(
+        {
+            "transaction_id": np.arange(n_transactions),
+            # The last clients have no transaction at all.
+            "client_id": rng.integers(0, n_clients - 10, n_transactions),
+            # Products 10 and 11 are missing from the catalogue.
+            "product_id": rng.integers(0, 12, n_transactions),
+            "amount": rng.gamma(2.0, 50.0, n_transactions).round(2),
+            "days_since": rng.integers(0, 700, n_transactions),
+        },
+    )
+    transactions.loc[::97, "amount"] = np.nan
+    transactions.to_csv(tmp_path / "transactions_sample.csv", index=False)
+    pd.DataFrame(
+        {
+            "product_id": np.arange(10),
+            "category": rng.choice(["card", "loan", "mortgage"], 10),
+            "interest_rate": rng.uniform(0.0, 0.2, 10),
+            "tenor_months": rng.choice([12, 24, 60], 10),
+        },
+    ).to_csv(tmp_path / "products_sample.csv", index=False)
+    monkeypatch.setattr(join_datasets, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(join_datasets, "OUTPUT_DIR", tmp_path)
+    return tmp_path
+
+
 def test_joined_dataset_columns():
     df = assemble_dataset()
     expected_columns = {"client_id", "gender", "n_transactions"}
@@ -10,3 +54,140 @@ def test_joined_dataset_columns():
 def test_no_missing_targets():
     df = assemble_dataset()
     assert df["target"].isna().sum() == 0
+
+
+@pytest.mark.parametrize("chunksize", [97, 1_000, 10_000])
+def test_streaming_join_matches_in_memory(synthetic_sources, chunksize):
+    expected = assemble_dataset()
+    streamed = assemble_dataset(chunksize=chunksize)
+    pd.testing.assert_frame_equal(streamed, expected)
+
+
+def test_joined_dataset_parquet_roundtrip(synthetic_sources, monkeypatch):
+    from Src.features import feature_engineering
+
+    monkeypatch.setattr(feature_engineering, "DATA_DIR", synthetic_sources)
+    dataset = assemble_dataset()
+    assert not (synthetic_sources / "joined_clients.csv").exists()
+    pd.testing.assert_frame_equal(feature_engineering.load_joined_dataset(), dataset)
+    projected = feature_engineering.load_joined_dataset(columns=["client_id", "target"])
+    assert list(projected.columns) == ["client_id", "target"]
+
+
+def test_incremental_join_rewrites_only_touched_partitions(synthetic_sources):
+    assert len(join_datasets.assemble_incremental(n_partitions=8)) == 8
+    assert join_datasets.assemble_incremental(n_partitions=8) == []
+
+    incoming = synthetic_sources / join_datasets.INCOMING_DIRNAME
+    incoming.mkdir()
+    new_transactions = pd.DataFrame(
+        {
+            "transaction_id": [10_000, 10_001, 10_002],
+            "client_id": [3, 11, 115],  # 115 had no transaction so far
+            "product_id": [1, 2, 3],
+            "amount": [10.0, 20.0, 30.0],
+            "days_since": [0, 0, 0],
+        },
+    )
+    new_transactions.to_csv(incoming / "day_1.csv", index=False)
+    assert join_datasets.assemble_incremental(n_partitions=8) == [3]
+
+    incremental = pd.read_parquet(synthetic_sources / join_datasets.PARTITIONED_DIRNAME)
+    incremental = incremental.sort_values("client_id", ignore_index=True)
+    all_transactions = pd.concat(
+        [pd.read_csv(synthetic_sources / "transactions_sample.csv"), new_transactions]
+    )
+    all_transactions.to_csv(synthetic_sources / "transactions_sample.csv", index=False)
+    expected = assemble_dataset().astype(
+        {"n_transactions": "float64", "days_since_last": "float64"}
+    )
+    pd.testing.assert_frame_equal(incremental, expected)
+
+
+def test_incremental_join_picks_up_client_and_product_changes(synthetic_sources):
+    def read_incremental():
+        output = synthetic_sources / join_datasets.PARTITIONED_DIRNAME
+        return pd.read_parquet(output).sort_values("client_id", ignore_index=True)
+
+    def expected():
+        return assemble_dataset().astype(
+            {"n_transactions": "float64", "days_since_last": "float64"}
+        )
+
+    join_datasets.assemble_incremental(n_partitions=8)
+    # A new client without any transaction, no new transaction file.
+    with open(synthetic_sources / "clients_sample.csv", "a") as handle:
+        handle.write("120,F,1\n")
+    assert join_datasets.assemble_incremental(n_partitions=8) == list(range(8))
+    incremental = read_incremental()
+    assert incremental["client_id"].iloc[-1] == 120
+    pd.testing.assert_frame_equal(incremental, expected())
+
+    products = pd.read_csv(synthetic_sources / "products_sample.csv")
+    products.loc[0, "category"] = "savings"
+    products.to_csv(synthetic_sources / "products_sample.csv", index=False)
+    assert join_datasets.assemble_incremental(n_partitions=8) == list(range(8))
+    incremental = read_incremental()
+    assert "spent_savings" in incremental.columns
+    pd.testing.assert_frame_equal(incremental, expected())
+    assert join_datasets.assemble_incremental(n_partitions=8) == []
+
+
+def test_load_joined_dataset_prefers_the_latest_output(synthetic_sources, monkeypatch):
+    from Src.features import feature_engineering
+
+    monkeypatch.setattr(feature_engineering, "DATA_DIR", synthetic_sources)
+    full = assemble_dataset()
+    # Written before the incremental run below.
+    os.utime(synthetic_sources / join_datasets.JOINED_FILENAME, ns=(0, 0))
+    join_datasets.assemble_incremental(n_partitions=4)
+    incoming = synthetic_sources / join_datasets.INCOMING_DIRNAME
+    incoming.mkdir()
+    pd.DataFrame(
+        {
+            "transaction_id": [10_000],
+            "client_id": [115],
+            "product_id": [1],
+            "amount": [10.0],
+            "days_since": [0],
+        },
+    ).to_csv(incoming / "day_1.csv", index=False)
+    join_datasets.assemble_incremental(n_partitions=4)
+
+    loaded = feature_engineering.load_joined_dataset()
+    assert loaded.loc[loaded["client_id"] == 115, "n_transactions"].item() == 1
+    assert full.loc[full["client_id"] == 115, "n_transactions"].item() == 0
+    projected = feature_engineering.load_joined_dataset(columns=["n_transactions"])
+    assert list(projected.columns) == ["n_transactions"]
+    assert projected["n_transactions"].sum() == full["n_transactions"].sum() + 1
+
+
+def test_both_joined_outputs_load_in_the_same_order(synthetic_sources, monkeypatch):
+    from Src.features import feature_engineering
+
+    monkeypatch.setattr(feature_engineering, "DATA_DIR", synthetic_sources)
+    clients = pd.read_csv(synthetic_sources / "clients_sample.csv")
+    clients.sample(frac=1.0, random_state=0).to_csv(
+        synthetic_sources / "clients_sample.csv", index=False
+    )
+    assemble_dataset()
+    full = feature_engineering.load_joined_dataset()
+    full_targets = feature_engineering.load_joined_dataset(columns=["target"])
+    os.utime(synthetic_sources / join_datasets.JOINED_FILENAME, ns=(0, 0))
+    join_datasets.assemble_incremental(n_partitions=4)
+    partitioned = feature_engineering.load_joined_dataset()
+
+    assert full["client_id"].is_monotonic_increasing
+    pd.testing.assert_series_equal(partitioned["client_id"], full["client_id"])
+    pd.testing.assert_frame_equal(
+        feature_engineering.load_joined_dataset(columns=["target"]), full_targets
+    )
+    assert list(full_targets.columns) == ["target"]
+
+
+def test_incremental_join_rejects_rows_appended_to_ingested_files(synthetic_sources):
+    join_datasets.assemble_incremental(n_partitions=4)
+    with open(synthetic_sources / "transactions_sample.csv", "a") as handle:
+        handle.write("10000,3,1,10.0,0\n")
+    with pytest.raises(ValueError, match="transactions_sample.csv"):
+        join_datasets.assemble_incremental(n_partitions=4)
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Src.monitoring import drift_monitor
+from Src.monitoring.drift_engine import DriftMonitor, ReferenceSketch
+
+
+def _frame(n_rows, shift=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(
+        {
+            "income": rng.normal(50 + shift * 10, 10, n_rows),
+            "age": rng.integers(18, 80, n_rows).astype(float),
+            "contract_type": rng.choice(
+                ["cash", "revolving"], n_rows, p=[0.8 - shift * 0.5, 0.2 + shift * 0.5]
+            ),
+        },
+    )
+    frame.loc[::17, "income"] = np.nan
+    return frame
+
+
+def test_incremental_updates_match_one_pass_and_detect_shift():
+    reference = ReferenceSketch.from_frame(_frame(20_000))
+    production = _frame(9_000, shift=1.0, seed=1)
+
+    one_pass = DriftMonitor(reference)
+    one_pass.update(production)
+    batched = DriftMonitor(reference).update_many(
+        production.iloc[start : start + 1_300] for start in range(0, 9_000, 1_300)
+    )
+    assert batched.compute_drift() == one_pass.compute_drift()
+
+    drift = batched.compute_drift()
+    assert drift["n_production_rows"] == 9_000
+    assert (
+        drift["features"]["income"]["drifted"]
+        and drift["features"]["contract_type"]["drifted"]
+    )
+    assert not drift["features"]["age"]["drifted"]
+    assert drift["drift_share"] == 2 / 3
+
+    stable = DriftMonitor(reference)
+    stable.update(_frame(9_000, seed=2))
+    assert stable.compute_drift()["drift_share"] == 0.0
+
+
+def test_run_monitoring_reuses_sketch_and_alerts(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(drift_monitor, "REPORT_DIR", tmp_path)
+    sketch_path = tmp_path / "sketch.json"
+    _frame(5_000).to_parquet(tmp_path / "reference.parquet")
+    production_dir = tmp_path / "production"
+    production_dir.mkdir()
+    for part in range(3):
+        _frame(1_000, shift=1.0, seed=part).to_parquet(
+            production_dir / f"part-{part}.parquet"
+        )
+
+    drift_monitor.run_monitoring(
+        tmp_path / "reference.parquet", production_dir, sketch_path=sketch_path
+    )
+    assert "ALERT: drift share 0.67" in capsys.readouterr().out
+    mtime = sketch_path.stat().st_mtime_ns
+    report = drift_monitor.compute_drift_report(
+        tmp_path / "reference.parquet", production_dir, sketch_path=sketch_path
+    )
+    assert sketch_path.stat().st_mtime_ns == mtime
+    assert report["n_production_rows"] == 3_000
+    assert ReferenceSketch.load(sketch_path).n_rows == 5_000
+
+
+def test_reference_sketch_is_rebuilt_for_another_reference(tmp_path):
+    sketch_path = tmp_path / "sketch.json"
+    _frame(2_000).to_parquet(tmp_path / "reference.parquet")
+    _frame(3_000, seed=1).to_parquet(tmp_path / "other.parquet")
+
+    first = drift_monitor.load_or_build_reference(
+        tmp_path / "reference.parquet", sketch_path
+    )
+    assert first.source["path"] == str((tmp_path / "reference.parquet").resolve())
+    # The sketch is newer than other.parquet but was built from another file.
+    other = drift_monitor.load_or_build_reference(
+        tmp_path / "other.parquet", sketch_path
+    )
+    assert other.n_rows == 3_000
+    assert ReferenceSketch.load(sketch_path).source == other.source
+
+    _frame(4_000).to_parquet(tmp_path / "other.parquet")
+    rewritten = drift_monitor.load_or_build_reference(
+        tmp_path / "other.parquet", sketch_path
+    )
+    assert rewritten.n_rows == 4_000
+
+
+def test_update_rejects_batches_without_the_reference_columns():
+    monitor = DriftMonitor(ReferenceSketch.from_frame(_frame(1_000)))
+    renamed = _frame(100).rename(columns={"income": "f0", "age": "f1"})
+    with pytest.raises(ValueError, match="lacks 2 of the 3 reference columns"):
+        monitor.update(renamed)
+    with pytest.raises(ValueError, match="has 2 columns"):
+        monitor.update(np.zeros((10, 2)))
+    assert monitor.n_rows == 0
+    # Extra columns (model version, scores...) are ignored.
+    monitor.update(_frame(100).assign(probability=0.5))
+    assert monitor.n_rows == 100
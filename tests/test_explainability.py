@@ -0,0 +1,67 @@
+import json
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+import shap
+from lightgbm import LGBMClassifier
+
+from Src.models.explainability import (
+    compute_shap,
+    run_explainability,
+    start_explainability,
+    stratified_sample,
+)
+from Src.models.params import explainability_params
+
+
+def test_stratified_sample_covers_every_score_band():
+    proba = np.random.default_rng(0).beta(1, 20, 1000)  # skewed like default scores
+    indices = stratified_sample(proba, n_samples=100, n_bands=5)
+    assert len(indices) == len(set(indices)) == 100
+    ranks = np.argsort(np.argsort(proba))
+    np.testing.assert_array_equal(np.bincount(ranks[indices] * 5 // 1000), [20] * 5)
+    np.testing.assert_array_equal(
+        stratified_sample(proba[:30], n_samples=100), np.arange(30)
+    )
+
+
+def test_parallel_shap_matches_serial_tree_explainer(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 6))
+    y = (X[:, 0] + rng.normal(scale=0.5, size=400) > 0).astype(int)
+    model = LGBMClassifier(n_estimators=30, verbose=-1).fit(X, y)
+    model_path = tmp_path / "model.joblib"
+    joblib.dump(model, model_path)
+
+    values, base_value = compute_shap(model_path, X[:90], n_jobs=2, chunk_rows=25)
+    explainer = shap.TreeExplainer(model)
+    expected = explainer.shap_values(X[:90])
+    np.testing.assert_allclose(
+        values, expected[1] if isinstance(expected, list) else expected, atol=1e-10
+    )
+    assert base_value == pytest.approx(np.ravel(explainer.expected_value)[-1])
+
+    settings = {
+        **explainability_params({}),
+        "n_samples": 60,
+        "n_jobs": 1,
+        "summary_plot": False,
+    }
+    proba = model.predict_proba(X)[:, 1]
+    paths = start_explainability(
+        model_path, X, proba, None, tmp_path / "explain", settings
+    ).result()
+    meta = json.loads(paths["meta"].read_text())
+    importance = pd.read_csv(paths["global_importance"])
+    assert np.load(paths["shap_values"]).shape == (60, 6)
+    np.testing.assert_array_equal(np.load(paths["shap_sample"]), X[meta["row_indices"]])
+    assert importance["feature"].iloc[0] == "f0"
+    assert importance["mean_abs_shap"].is_monotonic_decreasing
+    assert (
+        run_explainability(
+            model_path, X, proba, None, tmp_path / "again", settings
+        ).keys()
+        == paths.keys()
+    )
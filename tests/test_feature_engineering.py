@@ -0,0 +1,162 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from scipy import sparse
+
+from Src.features import feature_engineering
+from Src.features.chunked_transform import transform_in_chunks
+from Src.models import train_model
+
+
+def _frame(n_rows=400, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(
+        {
+            "income": rng.lognormal(10, 0.5, n_rows),
+            "age": rng.integers(18, 80, n_rows).astype(float),
+            "merchant": rng.integers(0, 150, n_rows).astype(str),
+            "target": rng.integers(0, 2, n_rows),
+            "client_id": np.arange(n_rows),
+        },
+    )
+    frame.loc[::13, "income"] = np.nan
+    return frame
+
+
+def _materialize(tmp_path, monkeypatch, sparse_output):
+    monkeypatch.setattr(feature_engineering, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(
+        feature_engineering, "PREPROCESSOR_PATH", tmp_path / "preprocessor.joblib"
+    )
+    monkeypatch.setattr(train_model, "FEATURES_DIR", tmp_path)
+    train, valid, test = feature_engineering.split_data(_frame())
+    preprocessor = feature_engineering.build_feature_pipeline(
+        ["merchant"], ["income", "age"], sparse_output
+    )
+    feature_engineering.materialize_datasets(
+        preprocessor,
+        {"train": train, "valid": valid, "test": test},
+        sparse_output=sparse_output,
+    )
+    return {
+        split: train_model.load_matrix(split) for split in ("train", "valid", "test")
+    }
+
+
+def test_sparse_features_match_dense_features(tmp_path, monkeypatch):
+    dense = _materialize(tmp_path, monkeypatch, sparse_output=False)
+    sparse_splits = _materialize(tmp_path, monkeypatch, sparse_output=True)
+    for split, (X_sparse, y_sparse) in sparse_splits.items():
+        X_dense, y_dense = dense[split]
+        assert sparse.isspmatrix_csr(X_sparse)
+        # Kept for the drift monitor, which reads the dense Parquet features.
+        np.testing.assert_array_equal(
+            pd.read_parquet(tmp_path / f"X_{split}.parquet").to_numpy(), X_dense
+        )
+        np.testing.assert_allclose(X_sparse.toarray(), X_dense)
+        np.testing.assert_array_equal(y_sparse, y_dense)
+
+
+def test_chunked_transform_matches_in_memory_transform(tmp_path, monkeypatch):
+    (tmp_path / "dense").mkdir()
+    _materialize(tmp_path / "dense", monkeypatch, sparse_output=False)
+    frame = _frame(seed=1)
+    frame.to_parquet(tmp_path / "scoring.parquet", index=False)
+    preprocessor = joblib.load(tmp_path / "dense" / "preprocessor.joblib")
+    expected = preprocessor.transform(frame)
+    expected = expected.toarray() if sparse.issparse(expected) else expected
+
+    for n_jobs in (1, 2):
+        output = tmp_path / f"scored_{n_jobs}.parquet"
+        shape = transform_in_chunks(
+            tmp_path / "scoring.parquet",
+            output,
+            preprocessor_path=tmp_path / "dense" / "preprocessor.joblib",
+            chunk_rows=64,
+            n_jobs=n_jobs,
+            passthrough=["client_id"],
+        )
+        result = pd.read_parquet(output)
+        assert shape == expected.shape
+        assert pq.ParquetFile(output).num_row_groups == 7
+        np.testing.assert_array_equal(result["client_id"], frame["client_id"])
+        np.testing.assert_allclose(
+            result.drop(columns="client_id").to_numpy(), expected
+        )
+
+
+def test_materialize_with_chunked_splits_matches_in_memory(tmp_path, monkeypatch):
+    in_memory = _materialize(tmp_path, monkeypatch, sparse_output=False)
+    train, valid, test = feature_engineering.split_data(_frame())
+    preprocessor = feature_engineering.build_feature_pipeline(
+        ["merchant"], ["income", "age"]
+    )
+    feature_engineering.materialize_datasets(
+        preprocessor,
+        {"train": train, "valid": valid, "test": test},
+        chunk_rows=16,
+        n_jobs=2,
+    )
+    for split, (X_expected, y_expected) in in_memory.items():
+        X_chunked, y_chunked = train_model.load_matrix(split)
+        np.testing.assert_allclose(X_chunked, X_expected)
+        np.testing.assert_array_equal(y_chunked, y_expected)
+
+    feature_engineering.materialize_datasets(
+        preprocessor,
+        {"train": train, "valid": valid, "test": test},
+        chunk_rows=16,
+        n_jobs=2,
+        npy_output=True,
+    )
+    for split in ("valid", "test"):
+        assert train_model.load_matrix(split)[0].dtype == np.float32
+        np.testing.assert_allclose(
+            pd.read_parquet(tmp_path / f"X_{split}.parquet").to_numpy(),
+            in_memory[split][0],
+        )
+
+
+def test_npy_features_are_memory_mapped_float32(tmp_path, monkeypatch):
+    dense = _materialize(tmp_path, monkeypatch, sparse_output=False)
+    feature_engineering.export_npy("valid")
+    assert (tmp_path / "X_valid.parquet").exists()
+    np.testing.assert_allclose(
+        train_model.load_matrix("valid")[0], dense["valid"][0], rtol=1e-6
+    )
+
+    train, valid, test = feature_engineering.split_data(_frame())
+    preprocessor = feature_engineering.build_feature_pipeline(
+        ["merchant"], ["income", "age"]
+    )
+    feature_engineering.materialize_datasets(
+        preprocessor,
+        {"train": train, "valid": valid, "test": test},
+        npy_output=True,
+    )
+    assert not list(tmp_path.glob("X_*.npz"))
+    for split, (X_expected, y_expected) in dense.items():
+        np.testing.assert_array_equal(
+            pd.read_parquet(tmp_path / f"X_{split}.parquet").to_numpy(), X_expected
+        )
+        X_mapped, y_mapped = train_model.load_matrix(split)
+        assert (
+            isinstance(X_mapped, np.memmap)
+            and X_mapped.dtype == np.float32
+            and X_mapped.flags.c_contiguous
+        )
+        np.testing.assert_allclose(X_mapped, X_expected, rtol=1e-6)
+        np.testing.assert_array_equal(y_mapped, y_expected)
+
+
+def test_predict_positive_scores_blocks_in_order():
+    class Model:
+        def predict_proba(self, X):
+            return np.column_stack([1 - X[:, 0], X[:, 0]])
+
+    first, second = np.random.default_rng(0).random((2, 25, 3))
+    expected = np.concatenate([first[:, 0], second[:, 0]])
+    np.testing.assert_array_equal(
+        train_model.predict_positive(Model(), first, second, chunk_rows=7), expected
+    )
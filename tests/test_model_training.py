@@ -1,10 +1,28 @@
 from pathlib import Path
 
+import joblib
+import lightgbm as lgb
 import mlflow
+import numpy as np
+import pandas as pd
 import pytest
+from lightgbm import LGBMClassifier
+from sklearn.metrics import roc_auc_score
 
 from Src.features.feature_engineering import run_feature_engineering
-from Src.models.train_model import train
+from Src.inference.tree_engine import compile_model
+from Src.models.binned_dataset import (
+    BinnedLGBMSearch,
+    classifier_from_booster,
+    features_digest,
+)
+from Src.models.params import load_params, modeling_params
+from Src.models.train_model import (
+    build_estimator,
+    search_timings,
+    serving_estimator,
+    train,
+)
 from Src.pipelines.join_datasets import assemble_dataset
 
 
@@ -18,3 +36,138 @@ def test_train_produces_metrics(tmp_path, monkeypatch):
     mlflow.set_tracking_uri(tracking_uri)
     train()
     assert Path("artifacts/models/gradient_boosting.joblib").exists()
+
+
+@pytest.mark.parametrize(
+    "algorithm", ["HistGradientBoostingClassifier", "LGBMClassifier"]
+)
+def test_halving_search_reports_timings_per_configuration(algorithm):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 5))
+    y = (X[:, 0] + rng.normal(scale=0.5, size=600) > 0).astype(int)
+    modeling = modeling_params(load_params())
+    modeling.update(
+        algorithm=algorithm, search="halving", cv_folds=2, estimator_params={}
+    )
+    modeling["search_space"] = {
+        "learning_rate": [0.05, 0.1, 0.2],
+        "max_depth": [2, 3, 4],
+    }
+
+    search = build_estimator(modeling)
+    search.fit(X, y, sample_weight=np.ones(len(y)))
+    timings = search_timings(search, total_seconds=1.0)
+
+    assert timings["n_candidates_evaluated"] == len(search.cv_results_["params"]) > 9
+    assert max(entry["iteration"] for entry in timings["configs"]) >= 1
+    assert all(entry["fit_seconds"] > 0 for entry in timings["configs"])
+    assert roc_auc_score(y, search.best_estimator_.predict_proba(X)[:, 1]) > 0.8
+
+
+def test_flat_search_space_is_rejected_instead_of_ignored():
+    params = {
+        "modeling": {
+            "algorithm": "GradientBoostingClassifier",
+            "search_space": {"n_estimators": [100, 200], "max_depth": [3, 4]},
+        }
+    }
+    with pytest.raises(ValueError, match=r"\['max_depth', 'n_estimators'\]"):
+        modeling_params(params)
+    params["modeling"]["search_space"] = {
+        "GradientBoostingClassifier": {"n_estimators": [100, 200]}
+    }
+    assert modeling_params(params)["search_space"] == {"n_estimators": [100, 200]}
+
+
+def test_binned_search_reuses_cached_dataset(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(800, 6))
+    y = (X[:, 0] + rng.normal(scale=0.5, size=800) > 0).astype(int)
+    features = tmp_path / "X_train.parquet"
+    pd.DataFrame(X).rename(columns=str).to_parquet(features)
+    key = features_digest([features])[:16]
+    grid = {"learning_rate": [0.1, 0.2], "num_leaves": [7, 15], "n_estimators": [60]}
+
+    first = BinnedLGBMSearch(
+        grid,
+        cv=3,
+        early_stopping_rounds=10,
+        cache_key=key,
+        cache_dir=tmp_path / "binned",
+    )
+    first.fit(X, y, sample_weight=np.ones(len(y)))
+    cached = tmp_path / "binned" / f"{key}.bin"
+    assert cached.exists()
+    mtime = cached.stat().st_mtime_ns
+
+    second = BinnedLGBMSearch(
+        grid,
+        cv=3,
+        early_stopping_rounds=10,
+        cache_key=key,
+        cache_dir=tmp_path / "binned",
+    )
+    second.fit(X, y, sample_weight=np.ones(len(y)))
+    assert cached.stat().st_mtime_ns == mtime
+    np.testing.assert_allclose(
+        second.cv_results_["mean_test_score"], first.cv_results_["mean_test_score"]
+    )
+    assert second.best_params_ == first.best_params_
+    assert second.best_params_["n_estimators"] <= 60
+    assert search_timings(second, 1.0)["n_candidates_evaluated"] == 4
+    assert roc_auc_score(y, second.best_estimator_.predict_proba(X)[:, 1]) > 0.8
+
+    # Refit on the cached Dataset: the wrapped booster serves like a fitted classifier.
+    model = second.best_estimator_
+    proba = model.predict_proba(X)[:, 1]
+    assert model.booster_.num_trees() == second.best_params_["n_estimators"]
+    assert model.n_features_in_ == X.shape[1]
+    np.testing.assert_allclose(proba, model.booster_.predict(X))
+    np.testing.assert_array_equal(model.predict(X), (proba > 0.5).astype(int))
+    joblib.dump(model, tmp_path / "model.pkl")
+    np.testing.assert_allclose(
+        joblib.load(tmp_path / "model.pkl").predict_proba(X)[:, 1], proba
+    )
+    np.testing.assert_allclose(compile_model(model).predict_proba(X)[:, 1], proba)
+
+    pd.DataFrame(X[::-1]).rename(columns=str).to_parquet(features)
+    assert features_digest([features])[:16] != key
+
+
+def test_wrapped_booster_has_the_fitted_state_of_lgbm_fit():
+    # classifier_from_booster mirrors private attributes of LGBMClassifier.fit:
+    # a LightGBM upgrade that changes them must fail here, not in serving.
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 3))
+    y = (X[:, 0] > 0).astype(int)
+    params = {"n_estimators": 5, "verbose": -1}
+    fitted = LGBMClassifier(**params).fit(X, y)
+    wrapped = classifier_from_booster(fitted.booster_, params, y)
+
+    assert set(vars(wrapped)) == set(vars(fitted)), lgb.__version__
+    for name in ("_classes", "_n_classes", "_objective", "_n_features"):
+        np.testing.assert_array_equal(getattr(wrapped, name), getattr(fitted, name))
+    for name, value in vars(fitted).items():
+        assert type(getattr(wrapped, name)) is type(value), name
+    np.testing.assert_allclose(wrapped.predict_proba(X), fitted.predict_proba(X))
+    assert wrapped.n_features_in_ == 3
+    assert wrapped.feature_name_ == fitted.feature_name_
+
+
+def test_search_only_n_jobs_is_not_kept_by_the_served_model():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 3))
+    y = (X[:, 0] > 0).astype(int)
+    modeling = modeling_params(load_params())
+    modeling.update(
+        algorithm="LGBMClassifier",
+        search="grid",
+        cv_folds=2,
+        estimator_params={"n_jobs": 1, "n_estimators": 10},
+    )
+    modeling["search_space"] = {"num_leaves": [7]}
+    search = build_estimator(modeling)
+    search.fit(X, y)
+    assert search.best_estimator_.n_jobs == 1
+    model = serving_estimator(search, modeling["estimator_params"])
+    assert model.n_jobs is None
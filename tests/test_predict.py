@@ -0,0 +1,187 @@
+import json
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+import shap
+
+from Src.inference import predict
+from Src.inference.batch_score import feature_matrix, score_portfolio
+from Src.inference.predict import ModelCache, predict_proba, predict_proba_batch
+from Src.inference.tree_engine import compile_model
+
+
+def test_model_cache_reloads_only_on_new_version():
+    versions = iter(["1", "1", "2"])
+    loads = []
+    cache = ModelCache(ttl=0)
+
+    def get():
+        return cache.get(
+            "Production",
+            lambda: next(versions),
+            lambda version: loads.append(version) or version,
+        )
+
+    assert [get(), get(), get()] == ["1", "1", "2"]
+    assert loads == ["1", "2"]
+
+
+def test_model_cache_keeps_serving_when_registry_is_down():
+    cache = ModelCache(ttl=0)
+    cache.get("Production", lambda: "3", lambda version: f"model-{version}")
+
+    def unreachable():
+        raise ConnectionError("registry down")
+
+    assert (
+        cache.get("Production", unreachable, lambda version: f"model-{version}")
+        == "model-3"
+    )
+
+
+def test_batch_prediction_with_compiled_model(tmp_path, monkeypatch):
+    model = joblib.load("models/lgbm_model_final.pkl")
+    compiled_path = tmp_path / "model.npz"
+    compile_model(model).save(compiled_path)
+    monkeypatch.setattr(predict, "THRESHOLD_PATH", tmp_path / "threshold.json")
+    (tmp_path / "threshold.json").write_text('{"threshold": 0.3}')
+    X = np.random.default_rng(0).normal(size=(4, model.n_features_in_))
+
+    scores = predict_proba_batch(X, compiled_path=compiled_path)
+    np.testing.assert_allclose(
+        scores["probability"], model.predict_proba(X)[:, 1], atol=1e-12
+    )
+    np.testing.assert_array_equal(
+        scores["decision"], (scores["probability"] >= 0.3).astype(int)
+    )
+    assert (
+        predict_proba(X[:1], compiled_path=compiled_path)["probability"]
+        == scores["probability"][0]
+    )
+
+
+def _portfolio(tmp_path, model, n_rows=250):
+    X = np.random.default_rng(1).normal(size=(n_rows, model.n_features_in_))
+    frame = pd.DataFrame(X, columns=model.feature_name_)
+    frame.insert(0, "client_id", np.arange(n_rows) + 1000)
+    path = tmp_path / "portfolio.parquet"
+    frame.to_parquet(path, index=False)
+    return path, X
+
+
+def test_batch_scoring_writes_parts_with_top_reasons(tmp_path):
+    model = joblib.load("models/lgbm_model_final.pkl")
+    input_path, X = _portfolio(tmp_path, model)
+    summary = score_portfolio(
+        input_path,
+        tmp_path / "scores",
+        threshold=0.3,
+        chunk_rows=100,
+        n_jobs=1,
+        top_k=3,
+    )
+    assert (summary.rows, summary.chunks, summary.skipped_chunks) == (250, 3, 0)
+    scored = pd.read_parquet(tmp_path / "scores")
+    assert len(list((tmp_path / "scores").glob("part-*.parquet"))) == 3
+    np.testing.assert_allclose(
+        scored["probability"], model.predict_proba(X)[:, 1], atol=1e-12
+    )
+    np.testing.assert_array_equal(
+        scored["decision"], (scored["probability"] >= 0.3).astype(int)
+    )
+    assert scored["client_id"].tolist() == list(range(1000, 1250))
+    shap_row = shap.TreeExplainer(model).shap_values(X[:1])
+    shap_row = np.asarray(shap_row[-1] if isinstance(shap_row, list) else shap_row)[0]
+    assert (
+        scored.loc[0, "reason_1"]
+        == model.feature_name_[int(np.argmax(np.abs(shap_row)))]
+    )
+    magnitudes = (
+        scored.loc[0, ["reason_1_shap", "reason_2_shap", "reason_3_shap"]]
+        .abs()
+        .tolist()
+    )
+    assert magnitudes == sorted(magnitudes, reverse=True)
+
+
+def test_batch_scoring_resumes_missing_parts_with_a_process_pool(tmp_path):
+    model = joblib.load("models/lgbm_model_final.pkl")
+    input_path, X = _portfolio(tmp_path, model)
+    compiled_path = tmp_path / "forest"
+    compile_model(model).save(compiled_path)
+    output_dir = tmp_path / "scores"
+    score_portfolio(
+        input_path,
+        output_dir,
+        model_path=compiled_path,
+        threshold=0.3,
+        chunk_rows=60,
+        n_jobs=2,
+    )
+    (output_dir / "part-00002.parquet").unlink()
+    (output_dir / "_SUCCESS").unlink()
+
+    summary = score_portfolio(
+        input_path,
+        output_dir,
+        model_path=compiled_path,
+        threshold=0.3,
+        chunk_rows=60,
+        n_jobs=2,
+    )
+    assert (summary.rows, summary.chunks, summary.skipped_chunks) == (60, 1, 4)
+    assert (output_dir / "_SUCCESS").exists()
+    scored = pd.read_parquet(output_dir)
+    np.testing.assert_allclose(
+        scored["probability"], model.predict_proba(X)[:, 1], atol=1e-12
+    )
+    with pytest.raises(ValueError, match="chunk_rows"):
+        score_portfolio(
+            input_path,
+            output_dir,
+            model_path=compiled_path,
+            threshold=0.3,
+            chunk_rows=50,
+            n_jobs=1,
+        )
+
+
+def test_batch_scoring_defaults_to_the_threshold_of_the_model(tmp_path):
+    model = joblib.load("models/lgbm_model_final.pkl")
+    input_path, _ = _portfolio(tmp_path, model, n_rows=40)
+    score_portfolio(input_path, tmp_path / "scores", n_jobs=1)
+    manifest = json.loads((tmp_path / "scores" / "_manifest.json").read_text())
+    assert manifest["threshold"] == pytest.approx(0.09)
+    scored = pd.read_parquet(tmp_path / "scores")
+    np.testing.assert_array_equal(
+        scored["decision"], (scored["probability"] >= manifest["threshold"]).astype(int)
+    )
+    with pytest.raises(FileNotFoundError, match="--threshold"):
+        score_portfolio(
+            input_path,
+            tmp_path / "other",
+            threshold_path=tmp_path / "missing.pkl",
+            n_jobs=1,
+        )
+
+
+def test_feature_matrix_selects_named_columns_and_rejects_mismatches():
+    frame = pd.DataFrame(
+        {"client_id": [1, 2], "b": [3.0, 4.0], "a": [1.0, 2.0], "extra": [0.0, 0.0]}
+    )
+    np.testing.assert_array_equal(
+        feature_matrix(frame, ["a", "b"], ["client_id"]), [[1.0, 3.0], [2.0, 4.0]]
+    )
+    # Same column count, other names: never scored positionally.
+    with pytest.raises(ValueError, match="missing from the input"):
+        feature_matrix(frame.drop(columns="a"), ["a", "b", "c"], ["client_id"])
+    # Positional order is only used for models fitted without names.
+    unnamed = frame.drop(columns="extra")
+    np.testing.assert_array_equal(
+        feature_matrix(unnamed, [], ["client_id"], n_features=2),
+        [[3.0, 1.0], [4.0, 2.0]],
+    )
+    with pytest.raises(ValueError, match="Expected 3 feature columns"):
+        feature_matrix(unnamed, [], ["client_id"], n_features=3)
@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import joblib
+import numpy as np
+from lightgbm import LGBMClassifier
+
+from Api.app.dependencies import ModelRegistry
+from Src.inference.tree_engine import (
+    CompiledForest,
+    compile_model,
+    export_model,
+    verify,
+)
+
+MODEL_PATH = Path("models/lgbm_model_final.pkl")
+
+
+def test_compiled_forest_matches_lightgbm(tmp_path):
+    output_path = tmp_path / "model.npz"
+    forest = export_model(MODEL_PATH, output_path, n_check=200)
+    model = joblib.load(MODEL_PATH)
+    X = np.random.default_rng(3).normal(size=(300, forest.n_features))
+    X[::7, 5] = np.nan
+    loaded = CompiledForest.load(output_path)
+    np.testing.assert_allclose(
+        loaded.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12
+    )
+    np.testing.assert_allclose(
+        loaded.predict_raw(X), model.predict(X, raw_score=True), rtol=0, atol=1e-10
+    )
+
+
+def test_compiled_forest_follows_missing_value_branches():
+    rng = np.random.default_rng(4)
+    X = rng.normal(size=(600, 4))
+    y = (X[:, 0] + rng.normal(scale=0.5, size=600) > 0).astype(int)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    X[rng.random(X.shape) < 0.1] = 0.0
+    model = LGBMClassifier(n_estimators=20, num_leaves=7, verbose=-1).fit(X, y)
+    forest = compile_model(model)
+    assert forest.missing_type.any()
+    assert verify(model, forest, X) < 1e-12
+
+
+def test_registry_serves_compiled_forest(tmp_path):
+    output_path = tmp_path / "model.npz"
+    compile_model(joblib.load(MODEL_PATH)).save(output_path)
+    bundle = ModelRegistry(output_path, tmp_path / "missing_threshold.pkl").current
+    reference = ModelRegistry(MODEL_PATH, tmp_path / "missing_threshold.pkl").current
+    X = np.random.default_rng(5).normal(size=(10, bundle.n_features))
+    assert isinstance(bundle.model, CompiledForest)
+    assert bundle.feature_names == reference.feature_names
+    np.testing.assert_allclose(
+        bundle.predict_proba(X), reference.predict_proba(X), atol=1e-12
+    )
+
+
+def test_forest_directory_is_memory_mapped_and_reloaded(tmp_path):
+    output_path = tmp_path / "forest"
+    model = joblib.load(MODEL_PATH)
+    compile_model(model).save(output_path)
+    loaded = CompiledForest.load(output_path)
+    assert isinstance(loaded.value.base, np.memmap)
+    assert not loaded.value.flags.writeable
+    X = np.random.default_rng(6).normal(size=(50, loaded.n_features))
+    np.testing.assert_allclose(
+        loaded.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12
+    )
+
+    registry = ModelRegistry(output_path, tmp_path / "missing_threshold.pkl")
+    first = registry.current
+    assert isinstance(first.model, CompiledForest)
+    assert not registry.reload_if_changed()
+    forest = compile_model(model)
+    shifted = CompiledForest(**{**forest.__dict__, "value": forest.value + 0.1})
+    shifted.save(output_path)
+    assert registry.reload_if_changed()
+    assert registry.current.version != first.version
+    assert np.all(registry.current.predict_proba(X) > first.predict_proba(X))